@@ -0,0 +1,512 @@
+"""Deterministic adapter generation for header versions that need no judgment.
+
+The engine applies the rules from ``prompt_text.SYSTEM_PROMPT`` directly:
+structs reachable from the root are diffed across versions, unchanged types
+are emitted once, changed structs get one variant per version plus a
+``_V_Gen`` superset, and the converters copy fields by name with the
+documented defaults. Anything that needs judgment (rename candidates, type
+conflicts, enum remaps, unsupported declarations) is reported as an
+``Ambiguity`` so callers can fall back to the LLM.
+"""
+import difflib
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from c_decls import Decl, Field, HeaderDecls, parse_header, type_deps
+from models import FileOut
+from parser_validator import format_file_blocks, parse_llm_files
+
+GEN = "Gen"
+RENAME_SIMILARITY = 0.90
+_STANDARD_TYPE_RE = re.compile(
+    r"^(?:u?int(?:_least|_fast)?(?:8|16|32|64)_t|u?int(?:ptr|max)_t|s?size_t|ptrdiff_t|wchar_t|bool)$"
+)
+
+
+class Ambiguity(Exception):
+    def __init__(self, reasons: Sequence[str]):
+        self.reasons = list(reasons)
+        super().__init__("; ".join(self.reasons))
+
+
+def suffix(label: str) -> str:
+    return f"V{label}" if label[:1].isdigit() else f"V_{label}"
+
+
+def variant_name(name: str, label: str) -> str:
+    return f"{name}_{suffix(label)}"
+
+
+def helper_name(name: str, src: str, dst: str) -> str:
+    return f"copy_{name}_{suffix(src)}_to_{suffix(dst)}"
+
+
+def converter_name(root: str, src: str, dst: str) -> str:
+    return f"convert_{root}_{suffix(src)}_to_{suffix(dst)}"
+
+
+def name_similarity(a: str, b: str) -> float:
+    norm_a = a.replace("_", "").lower()
+    norm_b = b.replace("_", "").lower()
+    return difflib.SequenceMatcher(None, norm_a, norm_b).ratio()
+
+
+def _decl_key(decl: Decl) -> str:
+    return decl.name if decl.is_typedef else f"{decl.kind} {decl.tag}"
+
+
+def _signature(decl: Decl) -> Tuple:
+    if decl.is_compound:
+        return (decl.kind, tuple((f.name, f.type, f.array, f.bits, " ".join(f.raw.split())) for f in decl.fields))
+    if decl.kind == "enum":
+        return ("enum", decl.enumerators)
+    return ("typedef", " ".join(decl.body.split()))
+
+
+@dataclass
+class TypeInfo:
+    key: str
+    decls: Dict[str, Decl] = field(default_factory=dict)
+    refs: Dict[str, Dict[str, Set[str]]] = field(default_factory=dict)
+
+    @property
+    def latest(self) -> Decl:
+        return list(self.decls.values())[-1]
+
+    @property
+    def deps(self) -> Set[str]:
+        return {key for per_label in self.refs.values() for keys in per_label.values() for key in keys}
+
+
+@dataclass
+class StructFragment:
+    """Type variants and static converter helpers for one versioned struct."""
+
+    name: str
+    types: str
+    helpers: str
+
+
+class AdapterPlan:
+    """Diff of every type reachable from ``root`` across an ordered list of header versions."""
+
+    def __init__(self, root: str, versions: Sequence[Tuple[str, str]]):
+        self.root = root
+        self.labels = [label for label, _ in versions]
+        self.headers: Dict[str, HeaderDecls] = {label: parse_header(text) for label, text in versions}
+        self.blockers: List[str] = []
+        self.issues: Dict[str, List[str]] = {}
+        self.types: "OrderedDict[str, TypeInfo]" = OrderedDict()
+        self.versioned: Set[str] = set()
+        self.gen_fields: Dict[str, List[Field]] = {}
+        self.order: List[str] = []
+        self._collect()
+        if not self.blockers:
+            self._classify()
+        if not self.blockers:
+            self._build_gen_fields()
+            self._find_renames()
+            self._order()
+
+    # -- analysis -----------------------------------------------------
+
+    def _collect(self) -> None:
+        for label in self.labels:
+            header = self.headers[label]
+            root = header.find_struct(self.root)
+            if root is None or not root.is_typedef or root.name != self.root:
+                self.blockers.append(f"typedef struct {self.root} not found in {label} header")
+                continue
+            pending = [root]
+            seen: Set[int] = set()
+            while pending:
+                decl = pending.pop()
+                if id(decl) in seen:
+                    continue
+                seen.add(id(decl))
+                info = self.types.setdefault(_decl_key(decl), TypeInfo(_decl_key(decl)))
+                previous = info.decls.get(label)
+                if previous is not None and previous is not decl:
+                    self.blockers.append(f"{info.key} is declared twice in {label} header")
+                info.decls[label] = decl
+                refs = info.refs.setdefault(label, {})
+                dep_lists = {f.name or f.raw: f.deps() for f in decl.fields} if decl.is_compound else {"": decl.deps}
+                for member, deps in dep_lists.items():
+                    for dep in deps:
+                        target = header.resolve(dep)
+                        if target is None or target is decl or _STANDARD_TYPE_RE.match(target.name):
+                            continue
+                        refs.setdefault(member, set()).add(_decl_key(target))
+                        pending.append(target)
+
+    def _classify(self) -> None:
+        changed: Set[str] = set()
+        for key, info in self.types.items():
+            kinds = {d.kind for d in info.decls.values()}
+            if len(kinds) > 1:
+                self.blockers.append(f"{key} changes kind between versions")
+                continue
+            if len({_signature(d) for d in info.decls.values()}) > 1:
+                changed.add(key)
+        changed.add(self.root)
+        pending = list(changed)
+        while pending:
+            key = pending.pop()
+            if key in self.versioned:
+                continue
+            decl = self.types[key].latest
+            if decl.kind == "enum":
+                self.blockers.append(f"enum {key} members differ; needs an explicit mapping")
+                continue
+            if decl.kind == "typedef":
+                self.blockers.append(f"typedef {key} changes or aliases a changed struct")
+                continue
+            if decl.kind == "union" or not decl.is_typedef:
+                self.blockers.append(f"{key} changed but only typedef'd structs can be versioned")
+                continue
+            self.versioned.add(key)
+            for other, info in self.types.items():
+                if other not in self.versioned and key in info.deps:
+                    pending.append(other)
+
+    def _refs(self, key: str, label: str, member: str) -> Set[str]:
+        return self.types[key].refs.get(label, {}).get(member, set())
+
+    def _retype(self, f: Field, header: HeaderDecls, label: str) -> Field:
+        if f.raw:
+            return f
+        type_text = f.type
+        for dep in type_deps(f.type):
+            target = header.resolve(dep)
+            if target is None or _decl_key(target) not in self.versioned:
+                continue
+            replacement = variant_name(_decl_key(target), label)
+            if dep.startswith("tag:"):
+                type_text = re.sub(rf"\b(?:struct|union)\s+{re.escape(dep[4:])}\b", replacement, type_text)
+            else:
+                type_text = re.sub(rf"\b{re.escape(dep)}\b", replacement, type_text)
+        return Field(name=f.name, type=type_text, array=f.array, bits=f.bits)
+
+    def _build_gen_fields(self) -> None:
+        for key in self.types:
+            if key not in self.versioned:
+                continue
+            issues = self.issues.setdefault(key, [])
+            merged: "OrderedDict[str, Field]" = OrderedDict()
+            for label, decl in self.types[key].decls.items():
+                for f in decl.fields:
+                    versioned_refs = self._refs(key, label, f.name or f.raw) & self.versioned
+                    if not f.name:
+                        issues.append(f"{key} has an unnamed member")
+                        continue
+                    if versioned_refs and (f.raw or f.is_pointer or f.array.count("[") > 1):
+                        issues.append(f"{key}.{f.name} refers to changed struct through a pointer or array")
+                    gen_field = self._retype(f, self.headers[label], GEN)
+                    existing = merged.get(f.name)
+                    if existing is None:
+                        merged[f.name] = gen_field
+                    elif existing != gen_field:
+                        issues.append(f"{key}.{f.name} type conflict: {existing.render()} vs {gen_field.render()}")
+            self.gen_fields[key] = list(merged.values())
+
+    def _find_renames(self) -> None:
+        for key in self.versioned:
+            decls = self.types[key].decls
+            present = [label for label in self.labels if label in decls]
+            for before, after in zip(present, present[1:]):
+                old_names = [f.name for f in decls[before].fields]
+                new_names = [f.name for f in decls[after].fields]
+                removed = [n for n in old_names if n not in new_names]
+                added = [n for n in new_names if n not in old_names]
+                for old in removed:
+                    for new in added:
+                        if name_similarity(old, new) >= RENAME_SIMILARITY:
+                            self.issues.setdefault(key, []).append(
+                                f"{key}.{old} -> {key}.{new} looks like a rename"
+                            )
+
+    def _order(self) -> None:
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(key: str) -> None:
+            if key in done or key in visiting:
+                return
+            visiting.add(key)
+            for dep in sorted(self.types[key].deps, key=lambda k: self.types[k].latest.order):
+                if dep in self.types:
+                    visit(dep)
+            visiting.discard(key)
+            done.add(key)
+            self.order.append(key)
+
+        visit(self.root)
+
+    # -- queries ------------------------------------------------------
+
+    @property
+    def ambiguities(self) -> List[str]:
+        return self.blockers + [issue for key in self.order for issue in self.issues.get(key, [])]
+
+    def ambiguous_structs(self) -> List[str]:
+        return [key for key in self.order if self.issues.get(key)]
+
+    def present_labels(self, key: str) -> List[str]:
+        return [label for label in self.labels if label in self.types[key].decls]
+
+    def versioned_deps(self, key: str) -> List[str]:
+        return [dep for dep in self.order if dep in self.types[key].deps and dep in self.versioned]
+
+    def shared_deps(self, key: str) -> List[Decl]:
+        return [self.types[dep].latest for dep in self.order if dep in self.types[key].deps and dep not in self.versioned]
+
+    def struct_signature(self, key: str) -> str:
+        """Stable hash of a versioned struct's definitions and the variant names it relies on."""
+        h = hashlib.sha256()
+        h.update(repr(self.labels).encode("utf-8"))
+        for label in self.present_labels(key):
+            h.update(repr((label, _signature(self.types[key].decls[label]))).encode("utf-8"))
+        h.update(repr((key, self.versioned_deps(key))).encode("utf-8"))
+        return h.hexdigest()
+
+    def changes(self, key: str) -> List[str]:
+        decls = self.types[key].decls
+        present = [label for label in self.labels if label in decls]
+        lines = []
+        for before, after in zip(present, present[1:]):
+            old_names = [f.name for f in decls[before].fields]
+            new_names = [f.name for f in decls[after].fields]
+            removed = [n for n in old_names if n not in new_names]
+            added = [n for n in new_names if n not in old_names]
+            parts = []
+            if removed:
+                parts.append("removed " + ", ".join(removed))
+            if added:
+                parts.append("added " + ", ".join(added))
+            if not parts:
+                parts.append("sub-structs changed" if _signature(decls[before]) != _signature(decls[after]) else "unchanged")
+            lines.append(f"{key} ({before} -> {after}): {'; '.join(parts)}")
+        return lines
+
+    # -- emission -----------------------------------------------------
+
+    def _enum_default(self, header: HeaderDecls, f: Field) -> Optional[str]:
+        if f.raw or f.is_pointer:
+            return None
+        for dep in type_deps(f.type):
+            target = header.resolve(dep)
+            while target is not None and target.kind == "typedef":
+                nxt = [header.resolve(d) for d in target.deps]
+                target = next((t for t in nxt if t is not None), None)
+            if target is not None and target.kind == "enum" and target.enumerators:
+                return target.enumerators[0].split("=", 1)[0].strip()
+        return None
+
+    def _struct_of(self, header: HeaderDecls, f: Field) -> Optional[Decl]:
+        if f.raw or f.is_pointer:
+            return None
+        for dep in type_deps(f.type):
+            target = header.resolve(dep)
+            if target is not None and target.kind == "typedef":
+                target = header.find_struct(target.name)
+            if target is not None and target.is_compound:
+                return target
+        return None
+
+    def _defaults(self, header: HeaderDecls, f: Field, lvalue: str, depth: int = 0) -> List[str]:
+        """Statements that set enum members under ``lvalue`` to their first enumerator."""
+        if f.array.count("[") > 1:
+            return []
+        index = f"i{depth}"
+        target = f"{lvalue}[{index}]" if f.array else lvalue
+        enum_default = self._enum_default(header, f)
+        if enum_default is not None:
+            body = [f"{target} = {enum_default};"]
+        else:
+            struct = self._struct_of(header, f)
+            if struct is None or struct.kind != "struct":
+                return []
+            body = []
+            for member in struct.fields:
+                body.extend(self._defaults(header, member, f"{target}.{member.name}", depth + 1))
+        if not body or not f.array:
+            return body
+        loop = f"for (size_t {index} = 0; {index} < sizeof({lvalue}) / sizeof({lvalue}[0]); ++{index}) {{"
+        return [loop] + ["    " + line for line in body] + ["}"]
+
+    def _render_struct(self, key: str, label: str) -> str:
+        name = variant_name(key, label)
+        if label == GEN:
+            fields = self.gen_fields[key]
+        else:
+            header = self.headers[label]
+            fields = [self._retype(f, header, label) for f in self.types[key].decls[label].fields]
+        lines = [f"typedef struct {name} {{"]
+        lines.extend(f"    {f.render()};" if not f.raw else f"    {f.raw}" for f in fields)
+        lines.append(f"}} {name};")
+        return "\n".join(lines)
+
+    def _copy_statement(self, key: str, src: str, dst: str, f: Field) -> List[str]:
+        refs = self._refs(key, src if src != GEN else dst, f.name) & self.versioned
+        if refs and not f.raw:
+            sub = next(iter(refs))
+            call = helper_name(sub, src, dst)
+            if f.array:
+                return [
+                    f"for (size_t i = 0; i < sizeof(dst->{f.name}) / sizeof(dst->{f.name}[0]); ++i) {{",
+                    f"    {call}(&src->{f.name}[i], &dst->{f.name}[i]);",
+                    "}",
+                ]
+            return [f"{call}(&src->{f.name}, &dst->{f.name});"]
+        if f.raw:
+            return [f"memcpy(&dst->{f.name}, &src->{f.name}, sizeof(dst->{f.name}));"]
+        if f.array:
+            return [f"memcpy(dst->{f.name}, src->{f.name}, sizeof(dst->{f.name}));"]
+        return [f"dst->{f.name} = src->{f.name};"]
+
+    def _render_helper(self, key: str, src: str, dst: str) -> str:
+        decls = self.types[key].decls
+        label = dst if src == GEN else src
+        version_fields = {f.name: f for f in decls[label].fields}
+        body: List[str] = []
+        if src == GEN:
+            for f in decls[dst].fields:
+                body.extend(self._copy_statement(key, src, dst, f))
+        else:
+            for f in self.gen_fields[key]:
+                original = version_fields.get(f.name)
+                if original is not None:
+                    body.extend(self._copy_statement(key, src, dst, original))
+                else:
+                    owner = next(lbl for lbl, d in decls.items() if any(m.name == f.name for m in d.fields))
+                    source_field = next(m for m in decls[owner].fields if m.name == f.name)
+                    body.extend(self._defaults(self.headers[owner], source_field, f"dst->{f.name}"))
+        if not body:
+            body = ["(void)src;", "(void)dst;"]
+        signature = (
+            f"static void {helper_name(key, src, dst)}"
+            f"(const {variant_name(key, src)}* src, {variant_name(key, dst)}* dst)"
+        )
+        return "\n".join([signature, "{"] + ["    " + line for line in body] + ["}"])
+
+    def fragment(self, key: str) -> StructFragment:
+        if self.issues.get(key):
+            raise Ambiguity(self.issues[key])
+        present = [label for label in self.labels if label in self.types[key].decls]
+        types = "\n\n".join(self._render_struct(key, label) for label in present + [GEN])
+        helpers = [self._render_helper(key, GEN, label) for label in present]
+        helpers += [self._render_helper(key, label, GEN) for label in present]
+        return StructFragment(name=key, types=types, helpers="\n\n".join(helpers))
+
+    def render(
+        self, fragment_for: Optional[Callable[["AdapterPlan", str], StructFragment]] = None
+    ) -> List[FileOut]:
+        """Emit the four output files; ``fragment_for`` overrides how versioned structs are built."""
+        if self.blockers:
+            raise Ambiguity(self.blockers)
+        build = fragment_for or AdapterPlan.fragment
+        fragments = {key: build(self, key) for key in self.order if key in self.versioned}
+        files = [
+            FileOut(name=f"{self.root}_versioned.h", language="c", content=self._versioned_header(fragments)),
+            FileOut(name=f"Converter_{self.root}.h", language="c", content=self._converter_header()),
+            FileOut(name=f"Converter_{self.root}.cpp", language="cpp", content=self._converter_source(fragments)),
+            FileOut(name="converters.cpp", language="cpp", content=self._converters_cpp()),
+        ]
+        # Round-trip through the LLM output protocol so native output is held to the same contract.
+        return parse_llm_files(format_file_blocks(files))
+
+    def _versioned_header(self, fragments: Dict[str, StructFragment]) -> str:
+        guard = f"{self.root.upper()}_VERSIONED_H"
+        history = [line for key in self.order if key in self.versioned for line in self.changes(key)]
+        lines = [f"#ifndef {guard}", f"#define {guard}", "", "/*", f" * {self.root} version history"]
+        lines += [f" *   {line}" for line in history]
+        lines += [" */", "", "#include <stdint.h>", "#include <stdbool.h>", ""]
+        blocks = []
+        for key in self.order:
+            if key in fragments:
+                blocks.append(fragments[key].types)
+            else:
+                blocks.append(self.types[key].latest.text)
+        lines.append("\n\n".join(blocks))
+        lines += ["", f"#endif /* {guard} */"]
+        return "\n".join(lines)
+
+    def _root_pairs(self) -> List[Tuple[str, str]]:
+        return [(GEN, label) for label in self.labels] + [(label, GEN) for label in self.labels]
+
+    def _converter_header(self) -> str:
+        guard = f"CONVERTER_{self.root.upper()}_H"
+        lines = [f"#ifndef {guard}", f"#define {guard}", "", f'#include "{self.root}_versioned.h"', ""]
+        lines += ["#ifdef __cplusplus", 'extern "C" {', "#endif", ""]
+        for src, dst in self._root_pairs():
+            lines.append(
+                f"int {converter_name(self.root, src, dst)}"
+                f"(const {variant_name(self.root, src)}* src, {variant_name(self.root, dst)}* dst);"
+            )
+        lines += ["", "/* Direct version-to-version conversions via the generic superset (converters.cpp). */"]
+        for src, dst in self._direct_pairs():
+            lines.append(
+                f"int {converter_name(self.root, src, dst)}"
+                f"(const {variant_name(self.root, src)}* src, {variant_name(self.root, dst)}* dst);"
+            )
+        lines += ["", "#ifdef __cplusplus", "}", "#endif", "", f"#endif /* {guard} */"]
+        return "\n".join(lines)
+
+    def _converter_source(self, fragments: Dict[str, StructFragment]) -> str:
+        lines = [f'#include "Converter_{self.root}.h"', "", "#include <stddef.h>", "#include <string.h>", ""]
+        blocks = [fragments[key].helpers for key in self.order if key in fragments]
+        for src, dst in self._root_pairs():
+            blocks.append(
+                "\n".join(
+                    [
+                        f"int {converter_name(self.root, src, dst)}"
+                        f"(const {variant_name(self.root, src)}* src, {variant_name(self.root, dst)}* dst)",
+                        "{",
+                        "    if (src == NULL || dst == NULL) {",
+                        "        return -1;",
+                        "    }",
+                        "    memset(dst, 0, sizeof(*dst));",
+                        f"    {helper_name(self.root, src, dst)}(src, dst);",
+                        "    return 0;",
+                        "}",
+                    ]
+                )
+            )
+        lines.append("\n\n".join(blocks))
+        return "\n".join(lines)
+
+    def _direct_pairs(self) -> List[Tuple[str, str]]:
+        return [(a, b) for a in self.labels for b in self.labels if a != b]
+
+    def _converters_cpp(self) -> str:
+        lines = [f'#include "Converter_{self.root}.h"', ""]
+        blocks = []
+        for src, dst in self._direct_pairs():
+            blocks.append(
+                "\n".join(
+                    [
+                        f"int {converter_name(self.root, src, dst)}"
+                        f"(const {variant_name(self.root, src)}* src, {variant_name(self.root, dst)}* dst)",
+                        "{",
+                        f"    {variant_name(self.root, GEN)} gen;",
+                        f"    if ({converter_name(self.root, src, GEN)}(src, &gen) != 0) {{",
+                        "        return -1;",
+                        "    }",
+                        f"    return {converter_name(self.root, GEN, dst)}(&gen, dst);",
+                        "}",
+                    ]
+                )
+            )
+        lines.append("\n\n".join(blocks))
+        return "\n".join(lines)
+
+
+def generate_native(root: str, old_header: str, new_header: str) -> List[FileOut]:
+    """Build the adapter without the LLM or raise ``Ambiguity`` when judgment is required."""
+    plan = AdapterPlan(root, [("OLD", old_header), ("NEW", new_header)])
+    if plan.ambiguities:
+        raise Ambiguity(plan.ambiguities)
+    return plan.render()
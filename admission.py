@@ -0,0 +1,275 @@
+"""Adaptive admission control in front of the backends.
+
+Each backend gets a concurrency limit that adapts AIMD-style: it grows by
+about one slot per limit's worth of successful calls made while saturated,
+and halves on overload errors (rate limits, busy pools, timeouts) or when a
+call takes several times the recent median latency. Calls over the limit
+wait in a bounded priority queue where interactive callers go ahead of batch
+traffic; a full queue or an interactive wait past the queue timeout fails
+fast with ``Overloaded`` so clients back off instead of piling onto the
+backend. Batch callers have nobody waiting on them and by default queue for as
+long as it takes.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from llm_backends import LOCAL_BACKEND_NAMES, BackendBusy
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+# Priority of the calls made on behalf of the current request.
+request_priority: ContextVar[str] = ContextVar("request_priority", default="interactive")
+
+MIN_LATENCY_SAMPLES = 8
+OVERLOAD_STATUS_CODES = {429, 503, 504}
+
+
+class Overloaded(BackendBusy):
+    """Admission refused; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Whether ``exc`` means the backend is over capacity rather than the request being bad."""
+    while exc is not None:
+        if isinstance(exc, (BackendBusy, TimeoutError, asyncio.TimeoutError)):
+            return True
+        if getattr(exc, "status_code", None) in OVERLOAD_STATUS_CODES or "Timeout" in type(exc).__name__:
+            return True
+        exc = exc.__cause__
+    return False
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        queue_size: int = 64,
+        queue_timeout: float = 10.0,
+        batch_queue_timeout: Optional[float] = None,
+        latency_tolerance: float = 3.0,
+        window: int = 64,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.batch_queue_timeout = batch_queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        # Calls finished since the last decrease; starts at a full round so the first overload counts.
+        self._since_decrease = int(self.limit)
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.overloads = 0
+        self.slow = 0
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead to drain at the current limit, in whole seconds; call with the lock held.
+        typical = statistics.median(self._latencies) if self._latencies else 1.0
+        return max(1, math.ceil(typical * (len(self._queue) + 1) / max(1, int(self.limit))))
+
+    async def acquire(self, priority: int = 0) -> None:
+        loop = asyncio.get_running_loop()
+        evicted = None
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._queue:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if len(self._queue) >= self.queue_size:
+                worst = max(self._queue)
+                self.rejected += 1
+                if worst[0] <= priority:
+                    raise Overloaded(f"{self.name} queue is full", self._retry_after())
+                # A higher-priority caller displaces the newest lowest-priority waiter.
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                evicted = (worst[2], Overloaded(f"{self.name} queue is full", self._retry_after()))
+            fut: "asyncio.Future[None]" = loop.create_future()
+            entry = (priority, next(self._seq), fut)
+            heapq.heappush(self._queue, entry)
+            self.queued += 1
+        if evicted is not None:
+            self._settle(*evicted)
+        timeout = self.queue_timeout if priority == PRIORITIES["interactive"] else self.batch_queue_timeout
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+                self._drop(entry)
+                retry_after = self._retry_after()
+            raise Overloaded(f"timed out waiting for {self.name}", retry_after)
+        except asyncio.CancelledError:
+            with self._lock:
+                self._drop(entry)
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self.release(None)
+            raise
+
+    def _drop(self, entry: Tuple[int, int, "asyncio.Future[None]"]) -> None:
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+
+    def _settle(self, fut: "asyncio.Future[None]", error: Optional[BaseException] = None) -> None:
+        def settle() -> None:
+            if fut.done():
+                # The waiter gave up before its slot arrived.
+                if error is None:
+                    self.release(None)
+            elif error is None:
+                fut.set_result(None)
+            else:
+                fut.set_exception(error)
+
+        try:
+            fut.get_loop().call_soon_threadsafe(settle)
+        except RuntimeError:  # the waiter's event loop is gone
+            if error is None:
+                self.release(None)
+
+    def release(self, seconds: Optional[float], overloaded: bool = False) -> None:
+        """Return a slot; ``seconds`` is the call's latency when it succeeded."""
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self._since_decrease += 1
+            slow = False
+            if seconds is not None:
+                if len(self._latencies) >= MIN_LATENCY_SAMPLES:
+                    slow = seconds > self.latency_tolerance * statistics.median(self._latencies)
+                self._latencies.append(seconds)
+            if overloaded or slow:
+                self.overloads += int(overloaded)
+                self.slow += int(slow)
+                # Halve at most once per round of calls so one burst does not collapse the limit.
+                if self._since_decrease >= int(self.limit):
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._since_decrease = 0
+            elif seconds is not None and saturated:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            granted = []
+            while self._queue and self.in_flight < int(self.limit):
+                _, _, fut = heapq.heappop(self._queue)
+                self.in_flight += 1
+                self.admitted += 1
+                granted.append(fut)
+        for fut in granted:
+            self._settle(fut)
+
+    def typical_latency(self) -> Optional[float]:
+        with self._lock:
+            return statistics.median(self._latencies) if self._latencies else None
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a slot for the body; waiting longer than ``timeout`` raises ``asyncio.TimeoutError``."""
+        acquire = self.acquire(PRIORITIES[priority or request_priority.get()])
+        if timeout is None:
+            await acquire
+        else:
+            await asyncio.wait_for(acquire, max(0.0, timeout))
+        started = time.perf_counter()
+        seconds = None
+        overloaded = False
+        try:
+            yield
+            seconds = time.perf_counter() - started
+        except BaseException as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            self.release(seconds, overloaded)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._queue),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "overloads": self.overloads,
+                "slow": self.slow,
+                "latency_p50_seconds": statistics.median(self._latencies) if self._latencies else 0.0,
+            }
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+class Admission:
+    """One ``AdaptiveLimiter`` per backend name, configured from the environment."""
+
+    def __init__(self) -> None:
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, backend: str) -> AdaptiveLimiter:
+        name = "local" if backend in LOCAL_BACKEND_NAMES else backend
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                limiter = self._limiters[name] = self._build(name)
+            return limiter
+
+    def _build(self, name: str) -> AdaptiveLimiter:
+        max_limit = _env_int("ADMISSION_MAX_LIMIT", 32)
+        if name == "local":
+            # llama.cpp decodes one prompt per process; more concurrency only thrashes the cores.
+            max_limit = max(1, _env_int("LLAMA_POOL_WORKERS", 1))
+        max_limit = _env_int(f"{name.upper().replace('-', '_')}_MAX_CONCURRENCY", max_limit)
+        batch_timeout = os.getenv("ADMISSION_BATCH_QUEUE_TIMEOUT")
+        return AdaptiveLimiter(
+            name,
+            initial=_env_int("ADMISSION_INITIAL_LIMIT", 4),
+            min_limit=_env_int("ADMISSION_MIN_LIMIT", 1),
+            max_limit=max_limit,
+            queue_size=_env_int("ADMISSION_QUEUE_SIZE", 64),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+            batch_queue_timeout=float(batch_timeout) if batch_timeout else None,
+            latency_tolerance=float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "3.0")),
+        )
+
+    def slot(self, backend: str, priority: Optional[str] = None, timeout: Optional[float] = None):
+        return self.limiter(backend).slot(priority, timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+admission = Admission()
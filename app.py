@@ -1,42 +1,734 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-from llm_backends import get_backend, LLMError
-from models import GenerateRequest, GenerateResponse
-from parser_validator import parse_llm_files, zip_base64
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+
+from adapter_engine import AdapterPlan, Ambiguity, generate_native
+from admission import PRIORITIES, admission, request_priority
+from c_decls import normalize_header, prune_header
+from deadlines import cancel_stats, request_budget, run_bounded
+from header_store import header_digest, header_store
+from hedging import hedge_stats
+from http_pool import offline_pool
+from incremental import fragment_cache, generate_incremental
+from jobs import JobStore, JobWorkers, job_status
+from llama_pool import pool_stats
+from llm_backends import BackendBusy, backend_identity, get_backend, known_backend, LLMClient, LLMError, LOCAL_BACKEND_NAMES, registry
+from metrics import record_usage, render_metrics, stage, start_request
+from models import (
+    BatchJob,
+    BatchRequest,
+    ChainRequest,
+    FileOut,
+    GenerateRequest,
+    GenerateResponse,
+    HeaderStats,
+    JobStatus,
+)
+from parser_validator import FILE_ROLES, FileBlockParser, iter_zip, salvage_llm_files, zip_base64
 from prompt_text import SYSTEM_PROMPT, build_user_prompt
+from repair import generate_with_repair, repair_files
+from request_bodies import DecompressMiddleware, parse_form
+from result_cache import cache_key, is_cacheable, result_cache, result_id, result_store
+from routing import check_prompt, route_stats
+from singleflight import generation_flight
+from warmup import WarmUp
 
-app = FastAPI()
 
-MAX_HEADER_LEN = 100_000
+async def _run_job(req: GenerateRequest) -> GenerateResponse:
+    request_priority.set("batch")
+    return await _generate(req, {})
 
 
-@app.post("/generate", response_model=GenerateResponse)
-def generate(req: GenerateRequest) -> GenerateResponse:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store = JobStore(os.getenv("JOB_DB_PATH", "gia_jobs.sqlite3"))
+    retention = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    workers = JobWorkers(
+        store,
+        _run_job,
+        workers=int(os.getenv("JOB_WORKERS", "2")),
+        retention_seconds=retention or None,
+        sweep_seconds=float(os.getenv("JOB_SWEEP_SECONDS", "600")),
+    )
+    await workers.start()
+    app.state.jobs = workers
+    # Warm-up runs in the background: /health answers at once, /ready once it is done.
+    warmup = app.state.warmup = WarmUp.from_env()
+    warming = asyncio.create_task(warmup.run())
+    try:
+        yield
+    finally:
+        warming.cancel()
+        await asyncio.gather(warming, return_exceptions=True)
+        app.state.jobs = None
+        await workers.stop()
+        store.close()
+
+
+MAX_HEADER_LEN = int(os.getenv("MAX_HEADER_LEN", "200000"))
+MAX_RAW_HEADER_LEN = int(os.getenv("MAX_RAW_HEADER_LEN", "4000000"))
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(16 * 1024 * 1024)))
+ENGINES = {"auto", "llm", "native", "incremental"}
+# The whole-adapter prompt covers exactly two versions, so chains are built natively or per struct.
+CHAIN_ENGINES = {"auto", "native", "incremental"}
+MAX_CHAIN_VERSIONS = int(os.getenv("MAX_CHAIN_VERSIONS", "32"))
+STREAM_PROGRESS_CHARS = 1024
+MAX_BATCH_JOBS = 1000
+BATCH_CONCURRENCY_PER_BACKEND = int(os.getenv("BATCH_CONCURRENCY_PER_BACKEND", "4"))
+BUSY_RETRY_AFTER = os.getenv("BUSY_RETRY_AFTER", "1")
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(DecompressMiddleware, max_size=MAX_REQUEST_BODY_BYTES)
+
+
+def _normalized(text: str) -> str:
+    if len(text) > MAX_RAW_HEADER_LEN:
+        raise HTTPException(status_code=400, detail="input too large")
+    return normalize_header(text)
+
+
+def _stored_header(ref: str) -> str:
+    # Stored headers are already normalized.
+    text = header_store.get(ref)
+    if text is None:
+        raise HTTPException(status_code=400, detail=f"unknown header ref: {ref}")
+    return text
+
+
+def _header_text(req: GenerateRequest, side: str) -> str:
+    ref = getattr(req, f"{side}_header_ref")
+    if ref is None:
+        return _normalized(getattr(req, f"{side}_header"))
+    return _stored_header(ref)
+
+
+def _validate(req: GenerateRequest) -> GenerateRequest:
+    """Check ``req`` and return it with both headers resolved and normalized."""
+    # The size limit applies to what reaches the engines and the prompt, not to comments and line markers.
+    req = req.model_copy(
+        update={
+            "old_header": _header_text(req, "old"),
+            "new_header": _header_text(req, "new"),
+            "old_header_ref": None,
+            "new_header_ref": None,
+        }
+    )
     if not req.root or not req.old_header or not req.new_header:
         raise HTTPException(status_code=400, detail="missing input")
     if len(req.old_header) > MAX_HEADER_LEN or len(req.new_header) > MAX_HEADER_LEN:
         raise HTTPException(status_code=400, detail="input too large")
+    if req.engine not in ENGINES:
+        raise HTTPException(status_code=400, detail="unknown engine")
+    if not known_backend(req.backend):
+        raise HTTPException(status_code=400, detail="unknown backend")
+    return req
 
+
+def _validate_chain(req: ChainRequest) -> List[str]:
+    """Check ``req`` and return its normalized headers, oldest first."""
+    if req.headers and req.header_refs:
+        raise HTTPException(status_code=400, detail="give either headers or header_refs")
+    if req.header_refs:
+        texts = [_stored_header(ref) for ref in req.header_refs]
+    else:
+        texts = [_normalized(text) for text in req.headers]
+    if not req.root or len(texts) < 2 or not all(texts):
+        raise HTTPException(status_code=400, detail="missing input: a chain needs at least two headers")
+    if len(texts) > MAX_CHAIN_VERSIONS:
+        raise HTTPException(status_code=400, detail=f"too many versions (at most {MAX_CHAIN_VERSIONS})")
+    if any(len(text) > MAX_HEADER_LEN for text in texts):
+        raise HTTPException(status_code=400, detail="input too large")
+    if req.engine not in CHAIN_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine {req.engine} cannot build version chains")
+    if not known_backend(req.backend):
+        raise HTTPException(status_code=400, detail="unknown backend")
+    return texts
+
+
+def _set_priority(request: Request) -> None:
+    priority = request.headers.get("x-priority", "interactive")
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"unknown priority: {priority}")
+    request_priority.set(priority)
+
+
+def _busy(e: BackendBusy) -> HTTPException:
+    retry_after = getattr(e, "retry_after", None) or BUSY_RETRY_AFTER
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
+
+
+async def _backend_for(req: Union[GenerateRequest, ChainRequest]) -> LLMClient:
+    # A registry miss may load a model for a long time; keep it off the event loop.
     try:
-        backend = get_backend(req.backend, req.model, req.temperature)
+        return await run_in_threadpool(get_backend, req.backend, req.model, req.temperature)
     except LLMError as e:
         raise HTTPException(status_code=424, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    system_prompt = SYSTEM_PROMPT
-    user_prompt = build_user_prompt(req.root, req.old_header, req.new_header)
+
+async def _respond(
+    req: Union[GenerateRequest, ChainRequest], files: List[FileOut], engine: str, header_stats: Optional[HeaderStats] = None
+) -> GenerateResponse:
+    zip_str = None
+    if req.return_zip:
+        with stage("zip"):
+            zip_str = await run_in_threadpool(zip_base64, files)
+    rid = result_id(files)
+    result_store.put(rid, files)
+    return GenerateResponse(
+        root=req.root,
+        files=files,
+        zip_base64=zip_str,
+        header_stats=header_stats,
+        engine=engine,
+        result_id=rid,
+    )
+
+
+def _zip_response(root: str, rid: str, files: List[FileOut], level: Optional[int], headers: Dict[str, str]):
+    headers = {
+        **headers,
+        "Content-Disposition": f'attachment; filename="{root}.zip"',
+        "X-Result-Id": rid,
+    }
+    return StreamingResponse(iter_zip(files, level), media_type="application/zip", headers=headers)
+
+
+def _prompt_headers(req: GenerateRequest) -> Tuple[str, str, HeaderStats]:
+    old_text, new_text = req.old_header, req.new_header
+    pruned = False
+    if req.prune_headers:
+        old_pruned = prune_header(old_text, req.root)
+        new_pruned = prune_header(new_text, req.root)
+        # Without the root in both headers the model has to auto-discover it from the full text.
+        if old_pruned is not None and new_pruned is not None:
+            old_text, new_text, pruned = old_pruned, new_pruned, True
+    stats = HeaderStats(
+        pruned=pruned,
+        old_original=len(req.old_header),
+        old_pruned=len(old_text),
+        new_original=len(req.new_header),
+        new_pruned=len(new_text),
+    )
+    return old_text, new_text, stats
+
+
+async def _incremental(
+    req: Union[GenerateRequest, ChainRequest], plan: AdapterPlan, headers: Dict[str, str]
+) -> GenerateResponse:
+    backends: List[LLMClient] = []
+
+    async def llm():
+        if not backends:
+            backends.append(await _backend_for(req))
+        return _llm_call(backends[0], req.backend)
+
     try:
-        text = backend.generate(system_prompt, user_prompt)
+        with stage("incremental"):
+            files, stats = await generate_incremental(
+                plan,
+                llm,
+                f"{backend_identity(req.backend, req.model)!r}:{req.temperature}",
+                cache_llm=is_cacheable(req.temperature),
+            )
+    except HTTPException:
+        raise
+    except BackendBusy as e:
+        raise _busy(e)
     except Exception as e:  # backend failure
         raise HTTPException(status_code=424, detail=str(e))
+    headers["X-Fragments"] = stats.header_value()
+    return await _respond(req, files, "incremental")
+
+
+async def _local_result(req: GenerateRequest, headers: Dict[str, str]) -> Optional[GenerateResponse]:
+    """Serve the request without the whole-adapter prompt when the engine allows it."""
+    if req.engine == "incremental":
+        # Parsing and diffing the headers is CPU work; keep it off the event loop like the rest of the engine.
+        plan = await run_in_threadpool(AdapterPlan, req.root, [("OLD", req.old_header), ("NEW", req.new_header)])
+        # Global blockers (missing root, enum remaps) need the whole-adapter prompt.
+        if plan.blockers:
+            return None
+        return await _incremental(req, plan, headers)
+    if req.engine != "llm":
+        try:
+            with stage("native"):
+                files = await run_in_threadpool(generate_native, req.root, req.old_header, req.new_header)
+        except Ambiguity as e:
+            if req.engine == "native":
+                raise HTTPException(status_code=422, detail=f"native generation not possible: {e}")
+            return None
+        return await _respond(req, files, "native")
+    return None
+
+
+def _llm_prompt(req: GenerateRequest) -> Tuple[str, str, Optional[str], HeaderStats]:
+    with stage("prompt"):
+        old_text, new_text, header_stats = _prompt_headers(req)
+        user_prompt = build_user_prompt(req.root, old_text, new_text)
+    key = None
+    if is_cacheable(req.temperature):
+        key = cache_key(SYSTEM_PROMPT, user_prompt, req.backend, req.model, req.temperature)
+    return SYSTEM_PROMPT, user_prompt, key, header_stats
+
+
+def _check_prompt(req: GenerateRequest, system_prompt: str, user_prompt: str, headers: Dict[str, str]) -> None:
+    # Rejecting an oversized prompt here takes milliseconds; the backend would fail only after generating.
+    with stage("route"):
+        headers["X-Prompt-Tokens"] = str(check_prompt(req.backend, system_prompt, user_prompt))
+
+
+def _cached(key: Optional[str], headers: Dict[str, str]) -> Optional[List[FileOut]]:
+    with stage("cache"):
+        files = result_cache.get(key) if key else None
+    headers["X-Cache"] = "HIT" if files is not None else ("MISS" if key else "BYPASS")
+    return files
+
+
+def _slot(backend: LLMClient, name: str, timeout: Optional[float] = None):
+    # Composite backends take a slot from the backend that actually serves each call.
+    if backend.composite:
+        return nullcontext()
+    return admission.slot(name, timeout=timeout)
+
+
+def _record_cancelled(backend: LLMClient, name: str, started: Optional[float]) -> None:
+    # Calls cancelled while still queued for admission never used the backend.
+    if started is not None:
+        typical = None if backend.composite else admission.limiter(name).typical_latency()
+        cancel_stats.backend_call(name, time.perf_counter() - started, typical)
+
+
+def _llm_call(backend: LLMClient, name: str) -> Callable[[str, str], Awaitable[str]]:
+    """``backend.agenerate`` behind admission control, with usage recorded and failures mapped to 424 (503 when busy)."""
+
+    async def call(system: str, user: str) -> str:
+        started = None
+        try:
+            async with _slot(backend, name):
+                started = time.perf_counter()
+                text = await backend.agenerate(system, user)
+        except asyncio.CancelledError:
+            _record_cancelled(backend, name, started)
+            raise
+        except BackendBusy as e:
+            raise _busy(e)
+        except Exception as e:  # backend failure
+            raise HTTPException(status_code=424, detail=str(e))
+        record_usage(backend.last_usage)
+        return text
+
+    return call
+
+
+async def _generate(req: GenerateRequest, headers: Dict[str, str]) -> GenerateResponse:
+    timings = start_request(req.backend, req.model)
+    with stage("total"):
+        result = await _generate_stages(req, headers)
+    headers["Server-Timing"] = timings.header_value()
+    return result
+
+
+async def _generate_stages(req: GenerateRequest, headers: Dict[str, str]) -> GenerateResponse:
+    with stage("validate"):
+        req = await run_in_threadpool(_validate, req)
+    local = await _local_result(req, headers)
+    if local is not None:
+        return local
+
+    system_prompt, user_prompt, key, header_stats = await run_in_threadpool(_llm_prompt, req)
+    files = _cached(key, headers)
+    if files is not None:
+        return await _respond(req, files, "llm", header_stats)
+    _check_prompt(req, system_prompt, user_prompt, headers)
+
+    async def call() -> Tuple[List[FileOut], Dict[str, str]]:
+        call_headers: Dict[str, str] = {}
+        with stage("backend"):
+            backend = await _backend_for(req)
+        files, repairs = await generate_with_repair(_llm_call(backend, req.backend), system_prompt, user_prompt, req.root)
+        if "prefix_tokens_saved" in backend.last_usage:
+            call_headers["X-Prefix-Tokens-Saved"] = str(backend.last_usage["prefix_tokens_saved"])
+        if repairs:
+            call_headers["X-Repairs"] = str(repairs)
+        if getattr(backend, "routed", None):
+            call_headers["X-Routed-Backend"] = backend.routed
+        if key:
+            result_cache.put(key, files)
+        return files, call_headers
+
+    # Concurrent identical requests share one backend call, whatever the temperature, and its headers.
+    flight_key = key or cache_key(system_prompt, user_prompt, req.backend, req.model, req.temperature)
+    files, call_headers = await generation_flight.do(flight_key, call)
+    headers.update(call_headers)
+    return await _respond(req, files, "llm", header_stats)
+
+
+@app.post("/generate", response_model=GenerateResponse)
+async def generate(
+    req: GenerateRequest,
+    request: Request,
+    response: Response,
+    level: Optional[int] = Query(None, ge=0, le=9),
+):
+    return await _generate_or_zip(req, request, response, level)
+
 
+async def _generate_or_zip(
+    req: Union[GenerateRequest, ChainRequest],
+    request: Request,
+    response: Response,
+    level: Optional[int],
+    run: Callable[..., Awaitable[GenerateResponse]] = _generate,
+):
+    _set_priority(request)
+    budget = request_budget(request)
+    if "application/zip" in request.headers.get("accept", ""):
+        headers: Dict[str, str] = {}
+        result = await run_bounded(request, budget, lambda: run(req.model_copy(update={"return_zip": False}), headers))
+        return _zip_response(result.root, result.result_id, result.files, level, headers)
+    return await run_bounded(request, budget, lambda: run(req, response.headers))
+
+
+async def _generate_chain(req: ChainRequest, headers: Dict[str, str]) -> GenerateResponse:
+    timings = start_request(req.backend, req.model)
+    with stage("total"):
+        with stage("validate"):
+            texts = await run_in_threadpool(_validate_chain, req)
+        # One plan diffs every version at once: each header is parsed once and each struct analysed once.
+        plan = await run_in_threadpool(AdapterPlan, req.root, [(str(i), text) for i, text in enumerate(texts, 1)])
+        if plan.blockers:
+            raise HTTPException(status_code=422, detail=f"version chain not possible: {Ambiguity(plan.blockers)}")
+        if req.engine == "incremental" or (req.engine == "auto" and plan.ambiguous_structs()):
+            # Only the structs that need judgment reach the backend, each once for all versions.
+            result = await _incremental(req, plan, headers)
+        else:
+            try:
+                with stage("native"):
+                    files = await run_in_threadpool(plan.render)
+            except Ambiguity as e:
+                raise HTTPException(status_code=422, detail=f"native generation not possible: {e}")
+            result = await _respond(req, files, "native")
+    headers["X-Versions"] = str(len(texts))
+    headers["Server-Timing"] = timings.header_value()
+    return result
+
+
+@app.post("/generate/chain", response_model=GenerateResponse)
+async def generate_chain(
+    req: ChainRequest,
+    request: Request,
+    response: Response,
+    level: Optional[int] = Query(None, ge=0, le=9),
+):
+    """One adapter for ``N`` versions of ``root``: a single ``_V_Gen`` superset and converters for every version."""
+    return await _generate_or_zip(req, request, response, level, run=_generate_chain)
+
+
+@app.post("/generate/upload", response_model=GenerateResponse)
+async def generate_upload(request: Request, response: Response, level: Optional[int] = Query(None, ge=0, le=9)):
+    """``/generate`` with the request fields, headers included, sent as ``multipart/form-data``."""
+    fields = await run_in_threadpool(parse_form, request.headers.get("content-type", ""), await request.body())
     try:
-        files = parse_llm_files(text)
+        req = GenerateRequest.model_validate(fields)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    return await _generate_or_zip(req, request, response, level)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_result(result: GenerateResponse) -> Iterable[str]:
+    events = [_sse("file", f.model_dump()) for f in result.files]
+    events.append(_sse("done", result.model_dump()))
+    return events
+
+
+async def _sse_generation(
+    req: GenerateRequest,
+    backend: LLMClient,
+    system_prompt: str,
+    user_prompt: str,
+    key: Optional[str],
+    header_stats: HeaderStats,
+    budget: float,
+) -> AsyncIterator[str]:
+    parser = FileBlockParser()
+    reported = 0
+    chunks = backend.astream(system_prompt, user_prompt)
+    deadline = time.monotonic() + budget
+    started = None
+    expired = False
+    try:
+        try:
+            async with _slot(backend, req.backend, timeout=deadline - time.monotonic()):
+                started = time.perf_counter()
+                with stage("generate"):
+                    while True:
+                        # A stalled backend must not hold the stream open past the deadline.
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            expired = True
+                            break
+                        for f in parser.feed(chunk):
+                            yield _sse("file", f.model_dump())
+                        if len(parser.text) - reported >= STREAM_PROGRESS_CHARS:
+                            reported = len(parser.text)
+                            yield _sse("progress", {"chars": reported})
+        except asyncio.TimeoutError:
+            if started is not None:
+                raise
+            expired = True  # still queued for a slot when the deadline passed
+        if expired:
+            # ``chunks`` is closed below, which stops the backend.
+            cancel_stats.request("deadline")
+            raise HTTPException(status_code=504, detail=f"deadline of {budget:g}s exceeded")
+        files = parser.close()
     except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=422, detail=str(e))
+        found = salvage_llm_files(parser.text) if e.status_code == 422 else {}
+        if not found:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+            return
+        files = None
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away; closing ``chunks`` below stops the backend.
+        cancel_stats.request("disconnect")
+        _record_cancelled(backend, req.backend, started)
+        raise
+    except BackendBusy as e:
+        yield _sse("error", {"status": 503, "detail": str(e), "retry_after": getattr(e, "retry_after", None)})
+        return
+    except Exception as e:  # backend failure
+        yield _sse("error", {"status": 424, "detail": str(e)})
+        return
+    finally:
+        await chunks.aclose()
+    if files is None:
+        # Keep the blocks that did arrive and ask only for the rest.
+        yield _sse("repair", {"missing": [r for r in FILE_ROLES if r not in found]})
+        try:
+            files, _ = await repair_files(_llm_call(backend, req.backend), req.root, user_prompt, found)
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+            return
+        sent = {f.name for f in parser.files}
+        for f in files:
+            if f.name not in sent:
+                yield _sse("file", f.model_dump())
+    if key:
+        result_cache.put(key, files)
+    yield _sse("done", (await _respond(req, files, "llm", header_stats)).model_dump())
+
+
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest, request: Request) -> StreamingResponse:
+    _set_priority(request)
+    budget = request_budget(request)
+    start_request(req.backend, req.model)
+    with stage("validate"):
+        req = await run_in_threadpool(_validate, req)
+    headers: Dict[str, str] = {}
+    local = await _local_result(req, headers)
+    if local is not None:
+        return StreamingResponse(_sse_result(local), media_type="text/event-stream", headers=headers)
+
+    system_prompt, user_prompt, key, header_stats = await run_in_threadpool(_llm_prompt, req)
+    files = _cached(key, headers)
+    if files is not None:
+        result = await _respond(req, files, "llm", header_stats)
+        return StreamingResponse(_sse_result(result), media_type="text/event-stream", headers=headers)
+    _check_prompt(req, system_prompt, user_prompt, headers)
+
+    with stage("backend"):
+        backend = await _backend_for(req)
+    events = _sse_generation(req, backend, system_prompt, user_prompt, key, header_stats, budget)
+    return StreamingResponse(events, media_type="text/event-stream", headers=headers)
+
+
+def _resolve_job(job: BatchJob, headers: Dict[str, str]) -> GenerateRequest:
+    fields = job.model_dump()
+    for side in ("old", "new"):
+        ref = getattr(job, f"{side}_header_ref")
+        # Refs missing from the batch table are looked up in the header store by _validate.
+        if ref is not None and ref in headers:
+            fields[f"{side}_header"] = headers[ref]
+            fields[f"{side}_header_ref"] = None
+        elif ref is not None and header_store.get(ref) is None:
+            raise HTTPException(status_code=400, detail=f"unknown header ref: {ref}")
+    return GenerateRequest(**fields)
+
+
+def _ndjson(data: dict) -> str:
+    return json.dumps(data, separators=(",", ":")) + "\n"
+
+
+async def _batch_results(batch: BatchRequest) -> AsyncIterator[str]:
+    semaphores: Dict[str, asyncio.Semaphore] = {}
+    shared: Dict[str, "asyncio.Task[Tuple[int, dict]]"] = {}
+
+    async def run(req: GenerateRequest) -> Tuple[int, dict]:
+        request_priority.set("batch")
+        backend = "local" if req.backend in LOCAL_BACKEND_NAMES else req.backend
+        semaphore = semaphores.setdefault(backend, asyncio.Semaphore(BATCH_CONCURRENCY_PER_BACKEND))
+        async with semaphore:
+            try:
+                result = await _generate(req, {})
+            except HTTPException as e:
+                return e.status_code, {"detail": e.detail}
+            except Exception as e:  # one broken job must not take the batch down
+                return 500, {"detail": str(e)}
+        return 200, {"result": result.model_dump()}
+
+    async def job(index: int, item: BatchJob) -> dict:
+        try:
+            req = await run_in_threadpool(_resolve_job, item, batch.headers)
+        except HTTPException as e:
+            return {"index": index, "root": item.root, "status": e.status_code, "detail": e.detail}
+        # Identical jobs (after header refs are resolved) are generated once.
+        key = json.dumps(req.model_dump(), sort_keys=True)
+        if key not in shared:
+            shared[key] = asyncio.create_task(run(req))
+        status, body = await asyncio.shield(shared[key])
+        return {"index": index, "root": req.root, "status": status, **body}
+
+    tasks = [asyncio.create_task(job(i, item)) for i, item in enumerate(batch.jobs)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield _ndjson(await finished)
+    finally:
+        for task in tasks + list(shared.values()):
+            task.cancel()
+
+
+@app.post("/generate/batch")
+async def generate_batch(batch: BatchRequest) -> StreamingResponse:
+    if not batch.jobs:
+        raise HTTPException(status_code=400, detail="missing input")
+    if len(batch.jobs) > MAX_BATCH_JOBS:
+        raise HTTPException(status_code=400, detail="too many jobs")
+    return StreamingResponse(_batch_results(batch), media_type="application/x-ndjson")
+
+
+@app.put("/headers")
+async def put_header(request: Request) -> dict:
+    """Store a header (raw request body) under the SHA-256 of its bytes, for ``*_header_ref``."""
+    body = await request.body()
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="header is not UTF-8 text")
+    normalized = await run_in_threadpool(_normalized, text)
+    if not normalized:
+        raise HTTPException(status_code=400, detail="missing input")
+    if len(normalized) > MAX_HEADER_LEN:
+        raise HTTPException(status_code=400, detail="input too large")
+    ref = header_digest(body)
+    await run_in_threadpool(header_store.put, ref, normalized)
+    return {"ref": ref, "bytes": len(body), "normalized_bytes": len(normalized.encode("utf-8"))}
+
+
+@app.get("/headers/{ref}")
+async def get_header(ref: str) -> dict:
+    text = await run_in_threadpool(header_store.get, ref)
+    if text is None:
+        raise HTTPException(status_code=404, detail="unknown header ref")
+    return {"ref": ref, "normalized_bytes": len(text.encode("utf-8"))}
+
+
+@app.get("/results/{rid}.zip")
+async def download_result(rid: str, level: Optional[int] = Query(None, ge=0, le=9)) -> StreamingResponse:
+    files = result_store.get(rid)
+    if files is None:
+        raise HTTPException(status_code=404, detail="unknown result")
+    return _zip_response(rid, rid, files, level, {})
+
+
+def _jobs() -> JobWorkers:
+    workers = getattr(app.state, "jobs", None)
+    if workers is None:
+        raise HTTPException(status_code=503, detail="job queue not running")
+    return workers
+
+
+@app.post("/jobs", status_code=202, response_model=JobStatus)
+async def submit_job(req: GenerateRequest, response: Response) -> JobStatus:
+    req = await run_in_threadpool(_validate, req)
+    workers = _jobs()
+    row = await workers.submit(req)
+    response.headers["Location"] = f"/jobs/{row['id']}"
+    return job_status(row)
+
+
+def _job_status(workers: JobWorkers, job_id: str) -> Optional[JobStatus]:
+    # SQLite reads and result parsing block; callers run this in the thread pool.
+    row = workers.store.get(job_id)
+    return job_status(row) if row is not None else None
+
+
+@app.get("/jobs/stats")
+async def job_stats() -> dict:
+    return await _jobs().stats()
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str) -> JobStatus:
+    status = await run_in_threadpool(_job_status, _jobs(), job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return status
+
+
+@app.get("/health")
+async def health() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    warmup = getattr(app.state, "warmup", None)
+    if warmup is None:
+        return JSONResponse({"ready": False, "state": "starting", "backends": {}}, status_code=503)
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/backends/stats")
+def backend_stats() -> dict:
+    return {
+        **registry.stats(),
+        "offline_http": offline_pool.stats(),
+        "hedge": hedge_stats.stats(),
+        "local_pools": pool_stats(),
+        "routing": route_stats.stats(),
+        "admission": admission.stats(),
+        "cancellation": cancel_stats.stats(),
+    }
+
 
-    zip_str = zip_base64(files) if req.return_zip else None
-    return GenerateResponse(root=req.root, files=files, zip_base64=zip_str)
+@app.get("/cache/stats")
+def cache_stats() -> dict:
+    return {
+        "results": result_cache.stats(),
+        "fragments": fragment_cache.stats(),
+        "in_flight": generation_flight.stats(),
+        "headers": header_store.stats(),
+    }
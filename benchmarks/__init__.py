@@ -0,0 +1 @@
+"""Offline load and latency benchmarks for the generator service."""
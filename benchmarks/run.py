@@ -0,0 +1,199 @@
+"""Drive /generate at a fixed concurrency and write machine-readable results.
+
+Runs fully offline: requests go through the ASGI app in-process (or to
+``--url``) against the simulated backend, with synthetic header pairs.
+
+    python -m benchmarks.run --requests 200 --concurrency 16 --out bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+from app import MAX_HEADER_LEN, app
+from benchmarks import simulated
+from benchmarks.synthetic import synthetic_headers
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile.
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "max": max(values) if values else 0.0,
+    }
+
+
+def _server_timing(value: str) -> Dict[str, float]:
+    stages = {}
+    for part in value.split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if name and dur:
+            stages[name] = float(dur)
+    return stages
+
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+async def run_benchmark(
+    requests: int = 100,
+    concurrency: int = 8,
+    distinct: Optional[int] = None,
+    structs: int = 20,
+    depth: int = 3,
+    fields: int = 8,
+    change_rate: float = 0.1,
+    ambiguous: bool = False,
+    engine: str = "llm",
+    latency: float = 0.05,
+    output_bytes: int = 4096,
+    temperature: float = 0.0,
+    url: Optional[str] = None,
+) -> Dict[str, Any]:
+    config = dict(locals())
+    peak_rss: Dict[str, int] = {"start": _peak_rss_kb()}
+    distinct = distinct or requests
+
+    pairs = [
+        synthetic_headers(structs, depth, fields, change_rate, ambiguous, seed=i, max_len=MAX_HEADER_LEN)
+        for i in range(distinct)
+    ]
+    peak_rss["headers"] = _peak_rss_kb()
+    simulated.install(latency=latency, output_bytes=output_bytes)
+
+    payloads = [
+        {
+            "root": root,
+            "old_header": old,
+            "new_header": new,
+            "backend": "simulated",
+            "model": "simulated",
+            "temperature": temperature,
+            "engine": engine,
+            "return_zip": True,
+        }
+        for root, old, new in (pairs[i % distinct] for i in range(requests))
+    ]
+
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    statuses: Counter = Counter()
+    engines: Counter = Counter()
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    transport = None if url else httpx.ASGITransport(app=app)
+    base_url = url or "http://bench"
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            payload = queue.get_nowait()
+            started = time.perf_counter()
+            resp = await client.post("/generate", json=payload)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[resp.status_code] += 1
+            if resp.status_code == 200:
+                engines[resp.json().get("engine", "unknown")] += 1
+            for name, ms in _server_timing(resp.headers.get("Server-Timing", "")).items():
+                stages.setdefault(name, []).append(ms)
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+    peak_rss["load"] = _peak_rss_kb()
+
+    return {
+        "commit": _commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": config,
+        "results": {
+            "requests": requests,
+            "errors": requests - statuses.get(200, 0),
+            "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+            "engines": dict(engines),
+            "duration_s": duration,
+            "throughput_rps": requests / duration if duration else 0.0,
+            "latency_ms": _summary(latencies),
+            "stages_ms": {name: _summary(values) for name, values in sorted(stages.items())},
+            "peak_rss_kb": peak_rss,
+        },
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Offline load benchmark for /generate")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=None, help="distinct header pairs (default: one per request)")
+    parser.add_argument("--structs", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--change-rate", type=float, default=0.1)
+    parser.add_argument("--ambiguous", action="store_true", help="include changes that need the LLM")
+    parser.add_argument("--engine", default="llm", choices=["auto", "llm", "native"])
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated backend latency in seconds")
+    parser.add_argument("--output-bytes", type=int, default=4096, help="simulated backend output size")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--url", default=None, help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--out", type=Path, default=None, help="write the JSON results here")
+    return parser
+
+
+def _report(data: Dict[str, Any]) -> Iterable[str]:
+    results = data["results"]
+    latency = results["latency_ms"]
+    yield f"requests: {results['requests']}  errors: {results['errors']}  throughput: {results['throughput_rps']:.1f}/s"
+    yield f"latency ms: p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}"
+    for name, stats in results["stages_ms"].items():
+        yield f"  {name:<12} p50 {stats['p50']:.1f}  p95 {stats['p95']:.1f}  p99 {stats['p99']:.1f}"
+    yield "peak RSS KiB: " + ", ".join(f"{k} {v}" for k, v in results["peak_rss_kb"].items())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = vars(build_parser().parse_args(argv))
+    out = args.pop("out")
+    data = asyncio.run(run_benchmark(**args))
+    for line in _report(data):
+        print(line)
+    if out is not None:
+        out.write_text(json.dumps(data, indent=2))
+        print(f"Wrote results to {out}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - exercised via CLI usage
+    raise SystemExit(main())
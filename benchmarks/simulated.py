@@ -0,0 +1,66 @@
+"""A latency-tunable stand-in for a real LLM backend."""
+import asyncio
+import re
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+from llm_backends import LLMClient, register_backend, registry
+
+ROOT_RE = re.compile(r"Root struct name: (\w+)")
+
+
+class SimulatedLLM(LLMClient):
+    """Answers whole-adapter prompts with four well-formed files after ``latency`` seconds.
+
+    ``output_bytes`` pads the files to roughly that total size; streaming
+    spreads the latency over ``chunks`` pieces.
+    """
+
+    def __init__(
+        self, model: Optional[str] = None, latency: float = 0.05, output_bytes: int = 4096, chunks: int = 32
+    ):
+        super().__init__(model or "simulated")
+        self.latency = latency
+        self.output_bytes = output_bytes
+        self.chunks = chunks
+
+    def _output(self, user: str) -> str:
+        match = ROOT_RE.search(user)
+        root = match.group(1) if match else "Root"
+        names = [f"{root}_versioned.h", f"Converter_{root}.h", f"Converter_{root}.cpp", "converters.cpp"]
+        filler = "/* " + "x" * max(0, self.output_bytes // len(names) - 6) + " */"
+        blocks = []
+        for name in names:
+            lang = "cpp" if name.endswith(".cpp") else "c"
+            blocks.append(f"// FILE: {name}\n```{lang}\n{filler}\n```")
+        return "\n".join(blocks)
+
+    def _pieces(self, text: str) -> Iterator[str]:
+        size = max(1, len(text) // self.chunks + 1)
+        for start in range(0, len(text), size):
+            yield text[start : start + size]
+
+    def generate(self, system: str, user: str) -> str:
+        time.sleep(self.latency)
+        return self._output(user)
+
+    async def agenerate(self, system: str, user: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._output(user)
+
+    def stream(self, system: str, user: str) -> Iterator[str]:
+        for piece in self._pieces(self._output(user)):
+            time.sleep(self.latency / self.chunks)
+            yield piece
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[str]:
+        for piece in self._pieces(self._output(user)):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield piece
+
+
+def install(latency: float = 0.05, output_bytes: int = 4096, name: str = "simulated") -> None:
+    """Register (or reconfigure) the simulated backend under ``name``."""
+    register_backend(name, lambda model: SimulatedLLM(model, latency=latency, output_bytes=output_bytes))
+    # Drop instances built with a previous configuration.
+    registry.clear()
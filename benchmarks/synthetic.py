@@ -0,0 +1,101 @@
+"""Synthetic preprocessed header pairs of configurable size, nesting and change rate."""
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+ROOT = "BenchRoot"
+SCALARS = ["int", "unsigned int", "short", "long", "float", "double", "unsigned char", "uint32_t"]
+MECHANICAL_CHANGES = ["add", "remove"]
+# Type conflicts and renames need judgment: the native engine hands these to the LLM.
+AMBIGUOUS_CHANGES = ["resize", "retype", "rename"]
+
+
+@dataclass
+class _Struct:
+    name: str
+    level: int
+    fields: List[Tuple[str, str, Optional[int]]] = field(default_factory=list)  # (type, name, array)
+    children: List[str] = field(default_factory=list)
+
+
+def _render(structs: List[_Struct], fields_of: Dict[str, List[Tuple[str, str, Optional[int]]]]) -> str:
+    out = [
+        '# 1 "bench.h"',
+        '# 1 "<built-in>" 1',
+        "typedef unsigned int uint32_t;",
+        "",
+    ]
+    # Children are emitted before their parents, as a C compiler requires.
+    for s in sorted(structs, key=lambda s: -s.level):
+        out.append("typedef struct {")
+        for type_, name, array in fields_of[s.name]:
+            out.append(f"    {type_} {name}{f'[{array}]' if array else ''};")
+        out.append(f"}} {s.name};")
+        out.append("")
+    return "\n".join(out)
+
+
+def _changed(
+    rng: random.Random, fields: List[Tuple[str, str, Optional[int]]], change_rate: float, ambiguous: bool
+) -> List[Tuple[str, str, Optional[int]]]:
+    result: List[Tuple[str, str, Optional[int]]] = []
+    added = 0
+    for type_, name, array in fields:
+        if type_[0].isupper() or rng.random() >= change_rate:
+            result.append((type_, name, array))
+            continue
+        change = rng.choice(MECHANICAL_CHANGES + (AMBIGUOUS_CHANGES if ambiguous else []))
+        if change == "add":
+            result.append((type_, name, array))
+            result.append((rng.choice(SCALARS), f"{name}_added{added}", None))
+            added += 1
+        elif change == "resize":
+            result.append((type_, name, (array or 1) + rng.randint(1, 4)))
+        elif change == "retype":
+            result.append((rng.choice([t for t in SCALARS if t != type_]), name, array))
+        elif change == "rename":
+            result.append((type_, f"{name}_renamed", array))
+        # "remove" drops the field.
+    return result
+
+
+def synthetic_headers(
+    structs: int = 20,
+    depth: int = 3,
+    fields: int = 8,
+    change_rate: float = 0.1,
+    ambiguous: bool = False,
+    seed: int = 0,
+    max_len: int = 100_000,
+) -> Tuple[str, str, str]:
+    """Return ``(root, old_header, new_header)``.
+
+    ``structs`` structs are spread over ``depth`` nesting levels below the
+    root, each with ``fields`` scalar/array fields; about ``change_rate`` of
+    the scalar fields change in the new header. Only additions and removals
+    are made unless ``ambiguous`` also allows resizes, retypes and renames,
+    which send the pair to the LLM under ``engine=auto``. The struct count is
+    reduced until both headers fit in ``max_len`` characters.
+    """
+    while True:
+        rng = random.Random(seed)
+        tree = [_Struct(ROOT, 0)]
+        for i in range(1, max(1, structs)):
+            level = 1 + (i - 1) % max(1, depth)
+            parents = [s for s in tree if s.level == level - 1] or [tree[0]]
+            child = _Struct(f"Bench{i}", level)
+            rng.choice(parents).children.append(child.name)
+            tree.append(child)
+        old_fields: Dict[str, List[Tuple[str, str, Optional[int]]]] = {}
+        for s in tree:
+            own = [
+                (rng.choice(SCALARS), f"f{k}", rng.choice([None, None, None, rng.randint(2, 16)]))
+                for k in range(fields)
+            ]
+            own += [(child, child.lower(), None) for child in s.children]
+            old_fields[s.name] = own
+        new_fields = {name: _changed(rng, own, change_rate, ambiguous) for name, own in old_fields.items()}
+        old, new = _render(tree, old_fields), _render(tree, new_fields)
+        if max(len(old), len(new)) <= max_len or structs <= 1:
+            return ROOT, old, new
+        structs = max(1, int(structs * 0.9))
@@ -0,0 +1,452 @@
+"""Lightweight extractor for top-level C declarations in preprocessed headers.
+
+Only the subset needed to reason about plain data types is understood:
+structs, unions, enums and typedefs. Everything else (prototypes, inline
+functions, variables) is recognised just well enough to be skipped.
+"""
+import functools
+import re
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+IDENT_RE = re.compile(r"[A-Za-z_]\w*")
+_TAG_REF_RE = re.compile(r"\b(?:struct|union|enum)\s+([A-Za-z_]\w*)")
+_COMPOUND_RE = re.compile(r"^(struct|union|enum)\b\s*([A-Za-z_]\w*)?\s*\{", re.DOTALL)
+_FUNC_PTR_RE = re.compile(r"\(\s*\*\s*([A-Za-z_]\w*)\s*\)")
+_DECLARATOR_RE = re.compile(
+    r"^(?P<stars>[\s*]*)(?P<quals>(?:\b(?:const|volatile|restrict)\b\s*)*)"
+    r"(?P<name>[A-Za-z_]\w*)\s*(?P<array>(?:\[[^\]]*\]\s*)*)(?::\s*(?P<bits>.+))?$",
+    re.DOTALL,
+)
+
+C_KEYWORDS = frozenset(
+    """auto break case char const continue default do double else enum extern float for goto if
+    inline int long register restrict return short signed sizeof static struct switch typedef union
+    unsigned void volatile while _Bool _Complex _Atomic bool __restrict __inline __const
+    __signed__ __volatile__""".split()
+)
+
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    type: str
+    array: str = ""
+    bits: str = ""
+    raw: str = ""
+
+    @property
+    def is_pointer(self) -> bool:
+        return "*" in self.type
+
+    @property
+    def is_raw(self) -> bool:
+        return bool(self.raw)
+
+    def type_names(self) -> Set[str]:
+        return {tok for tok in IDENT_RE.findall(self.type) if tok not in C_KEYWORDS}
+
+    def deps(self) -> Tuple[str, ...]:
+        if self.raw:
+            return tuple(d for d in type_deps(self.raw) if d != self.name)
+        return type_deps(f"{self.type} {self.array} {self.bits}")
+
+    def render(self, type_text: Optional[str] = None) -> str:
+        if self.raw:
+            return self.raw
+        type_text = self.type if type_text is None else type_text
+        sep = "" if type_text.endswith("*") else " "
+        text = f"{type_text}{sep}{self.name}{self.array}"
+        if self.bits:
+            text += f" : {self.bits}"
+        return text
+
+
+@dataclass
+class Decl:
+    kind: str
+    name: str
+    text: str
+    order: int
+    tag: Optional[str] = None
+    is_typedef: bool = False
+    body: str = ""
+    fields: Tuple[Field, ...] = ()
+    enumerators: Tuple[str, ...] = ()
+    deps: Tuple[str, ...] = ()
+
+    @property
+    def is_compound(self) -> bool:
+        return self.kind in {"struct", "union"}
+
+
+@dataclass
+class HeaderDecls:
+    ordered: List[Decl] = field(default_factory=list)
+    by_name: Dict[str, Decl] = field(default_factory=dict)
+    by_tag: Dict[str, Decl] = field(default_factory=dict)
+    by_enumerator: Dict[str, Decl] = field(default_factory=dict)
+
+    def resolve(self, ident: str) -> Optional[Decl]:
+        if ident.startswith("tag:"):
+            return self.by_tag.get(ident[4:])
+        return self.by_name.get(ident) or self.by_enumerator.get(ident) or self.by_tag.get(ident)
+
+    def find_struct(self, name: str) -> Optional[Decl]:
+        decl = self.by_name.get(name) or self.by_tag.get(name)
+        if decl is not None and decl.kind == "typedef":
+            decl = self._follow_alias(decl)
+        if decl is None or not decl.is_compound:
+            return None
+        return decl
+
+    def _follow_alias(self, decl: Decl) -> Optional[Decl]:
+        seen = set()
+        while decl is not None and decl.kind == "typedef" and decl.name not in seen:
+            seen.add(decl.name)
+            target = next((self.resolve(dep) for dep in decl.deps if self.resolve(dep)), None)
+            if target is None:
+                return decl
+            decl = target
+        return decl
+
+    def closure(self, root: str) -> List[Decl]:
+        start = self.by_name.get(root) or self.by_tag.get(root)
+        if start is None:
+            return []
+        seen = {id(start): start}
+        pending = [start]
+        while pending:
+            decl = pending.pop()
+            for dep in decl.deps:
+                target = self.resolve(dep)
+                if target is not None and id(target) not in seen:
+                    seen[id(target)] = target
+                    pending.append(target)
+        return sorted(seen.values(), key=lambda d: d.order)
+
+
+def strip_comments(text: str) -> str:
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\"'":
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i : j + 1])
+            i = j + 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            out.append(" ")
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def strip_directives(text: str) -> str:
+    lines = []
+    continuing = False
+    for line in text.split("\n"):
+        if continuing or line.lstrip().startswith("#"):
+            continuing = line.rstrip().endswith("\\")
+            lines.append("")
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _strip_balanced(text: str, keyword: str) -> str:
+    while True:
+        idx = text.find(keyword)
+        if idx < 0:
+            return text
+        j = idx + len(keyword)
+        while j < len(text) and text[j].isspace():
+            j += 1
+        if j >= len(text) or text[j] != "(":
+            text = text[:idx] + text[j:]
+            continue
+        depth = 0
+        k = j
+        while k < len(text):
+            if text[k] == "(":
+                depth += 1
+            elif text[k] == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            k += 1
+        text = text[:idx] + " " + text[k + 1 :]
+
+
+def _clean(text: str) -> str:
+    for keyword in ("__attribute__", "__declspec", "__asm__", "__asm"):
+        text = _strip_balanced(text, keyword)
+    text = re.sub(r'\bextern\s+"C(?:\+\+)?"\s*\{', " ", text)
+    return re.sub(r"\b__extension__\b", " ", text)
+
+
+def split_statements(text: str) -> List[str]:
+    """Split cleaned source into top-level statements (terminated by ``;`` or a function body)."""
+    statements = []
+    buf: List[str] = []
+    depth = 0
+    for ch in text:
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            if depth == 0:
+                continue  # closing brace of an extern "C" block
+            depth -= 1
+            if depth == 0:
+                buf.append(ch)
+                head = "".join(buf).split("{", 1)[0].rstrip()
+                if head.endswith(")"):
+                    statements.append("".join(buf).strip())
+                    buf = []
+                continue
+        elif ch == ";" and depth == 0:
+            buf.append(ch)
+            stmt = "".join(buf).strip()
+            if stmt != ";":
+                statements.append(stmt)
+            buf = []
+            continue
+        buf.append(ch)
+    tail = "".join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def _normalize_type(base: str, stars: int = 0, quals: str = "") -> str:
+    text = " ".join(base.split())
+    if stars:
+        text += " " + "*" * stars
+    if quals.strip():
+        text += " " + " ".join(quals.split())
+    return text
+
+
+def _split_top(text: str, sep: str) -> List[str]:
+    parts, buf, depth = [], [], 0
+    for ch in text:
+        if ch in "({[":
+            depth += 1
+        elif ch in ")}]":
+            depth -= 1
+        if ch == sep and depth == 0:
+            parts.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+    parts.append("".join(buf))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _close_brace(text: str, open_idx: int) -> int:
+    depth = 0
+    for idx in range(open_idx, len(text)):
+        if text[idx] == "{":
+            depth += 1
+        elif text[idx] == "}":
+            depth -= 1
+            if depth == 0:
+                return idx
+    return len(text)
+
+
+def _idents(text: str) -> List[str]:
+    return [tok for tok in IDENT_RE.findall(text) if tok not in C_KEYWORDS]
+
+
+def type_deps(text: str) -> Tuple[str, ...]:
+    """Identifiers a declaration depends on; tag references are prefixed with ``tag:``."""
+    tags = [f"tag:{tag}" for tag in _TAG_REF_RE.findall(text)]
+    return tuple(dict.fromkeys(tags + _idents(_TAG_REF_RE.sub(" ", text))))
+
+
+def _parse_member(stmt: str) -> List[Field]:
+    stmt = " ".join(stmt.split())
+    if "{" in stmt:
+        close = _close_brace(stmt, stmt.index("{"))
+        name = IDENT_RE.findall(stmt[close + 1 :])
+        return [Field(name=name[0] if name else "", type="", raw=stmt + ";")]
+    func = _FUNC_PTR_RE.search(stmt)
+    if func:
+        return [Field(name=func.group(1), type="", raw=stmt + ";")]
+    declarators = _split_top(stmt, ",")
+    if not declarators:
+        return []
+    first = declarators[0]
+    match = re.search(r"([\s*]*)([A-Za-z_]\w*)\s*((?:\[[^\]]*\]\s*)*)(?::\s*(.+))?$", first)
+    if match is None:
+        return [Field(name="", type="", raw=stmt + ";")]
+    base = first[: match.start()].strip()
+    if not base:
+        return [Field(name="", type="", raw=stmt + ";")]
+    out = []
+    rest = [first[match.start() :]] + declarators[1:]
+    for declarator in rest:
+        parsed = _DECLARATOR_RE.match(declarator.strip())
+        if parsed is None:
+            return [Field(name="", type="", raw=stmt + ";")]
+        stars = parsed.group("stars").count("*")
+        type_text = _normalize_type(base, stars, parsed.group("quals"))
+        out.append(
+            Field(
+                name=parsed.group("name"),
+                type=type_text,
+                array="".join(parsed.group("array").split()),
+                bits=(parsed.group("bits") or "").strip(),
+            )
+        )
+    return out
+
+
+def _parse_fields(body: str) -> Tuple[Field, ...]:
+    fields: List[Field] = []
+    for stmt in _split_top(body, ";"):
+        fields.extend(_parse_member(stmt))
+    return tuple(fields)
+
+
+def _parse_compound(stmt: str, typedef: bool, order: int) -> List[Decl]:
+    inner = stmt[len("typedef") :].lstrip() if typedef else stmt
+    match = _COMPOUND_RE.match(inner)
+    if match is None:
+        return []
+    kind, tag = match.group(1), match.group(2)
+    open_idx = match.end() - 1
+    close = _close_brace(inner, open_idx)
+    body = inner[open_idx + 1 : close]
+    trailer = inner[close + 1 :].rstrip(";").strip()
+    if kind == "enum":
+        enumerators = tuple(" ".join(e.split()) for e in _split_top(body, ","))
+        fields: Tuple[Field, ...] = ()
+        deps = type_deps(" ".join(e.split("=", 1)[1] for e in enumerators if "=" in e))
+    else:
+        enumerators = ()
+        fields = _parse_fields(body)
+        deps = tuple(dict.fromkeys(dep for f in fields for dep in f.deps()))
+    names = []
+    if typedef:
+        for declarator in _split_top(trailer, ","):
+            if "*" in declarator or "[" in declarator:
+                continue
+            ids = IDENT_RE.findall(declarator)
+            if ids:
+                names.append(ids[-1])
+    text = stmt if stmt.endswith(";") else stmt + ";"
+    name = names[0] if names else tag
+    if name is None:
+        return []
+    decl = Decl(
+        kind=kind,
+        name=name,
+        text=text,
+        order=order,
+        tag=tag,
+        is_typedef=bool(names),
+        body=body,
+        fields=fields,
+        enumerators=enumerators,
+        deps=tuple(d for d in deps if d not in {name, f"tag:{tag}"}),
+    )
+    return [decl]
+
+
+def _parse_alias(stmt: str, order: int) -> Optional[Decl]:
+    body = stmt[len("typedef") :].rstrip(";").strip()
+    func = _FUNC_PTR_RE.search(body)
+    if func:
+        name = func.group(1)
+        type_text = body[: func.start(1)] + body[func.end(1) :]
+    else:
+        matches = list(IDENT_RE.finditer(re.sub(r"\[[^\]]*\]", lambda m: " " * len(m.group()), body)))
+        if not matches:
+            return None
+        name = matches[-1].group()
+        type_text = body[: matches[-1].start()] + body[matches[-1].end() :]
+    deps = type_deps(type_text)
+    return Decl(kind="typedef", name=name, text=stmt, order=order, is_typedef=True, body=body, deps=deps)
+
+
+# Parsed headers that someone (e.g. the header store) keeps alive, beyond the LRU below.
+_retained: "weakref.WeakValueDictionary[str, HeaderDecls]" = weakref.WeakValueDictionary()
+
+
+def parse_header(text: str) -> HeaderDecls:
+    """Parse ``text`` once; results are shared between callers and must not be mutated."""
+    header = _retained.get(text)
+    return header if header is not None else _parse_header(text)
+
+
+def retain_parsed(text: str) -> HeaderDecls:
+    """Parse ``text`` and keep serving that result for as long as the caller holds it."""
+    header = _retained[text] = parse_header(text)
+    return header
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_header(text: str) -> HeaderDecls:
+    cleaned = _clean(strip_directives(strip_comments(text)))
+    header = HeaderDecls()
+    for stmt in split_statements(cleaned):
+        stmt = "\n".join(line.rstrip() for line in stmt.split("\n") if line.strip())
+        if stmt.startswith("typedef"):
+            inner = stmt[len("typedef") :].lstrip()
+            if _COMPOUND_RE.match(inner):
+                decls = _parse_compound(stmt, True, len(header.ordered))
+            else:
+                alias = _parse_alias(stmt, len(header.ordered))
+                decls = [alias] if alias is not None else []
+        elif _COMPOUND_RE.match(stmt):
+            decls = _parse_compound(stmt, False, len(header.ordered))
+        else:
+            decls = []
+        for decl in decls:
+            header.ordered.append(decl)
+            if decl.is_typedef:
+                header.by_name[decl.name] = decl
+            if decl.tag:
+                header.by_tag[decl.tag] = decl
+            for enumerator in decl.enumerators:
+                header.by_enumerator[enumerator.split("=", 1)[0].strip()] = decl
+    return header
+
+
+def render_decls(decls: Iterable[Decl]) -> str:
+    return "\n\n".join(decl.text for decl in decls) + "\n"
+
+
+def prune_header(text: str, root: str) -> Optional[str]:
+    """Return only the declarations reachable from ``root`` or ``None`` when it is absent."""
+    header = parse_header(text)
+    if header.find_struct(root) is None:
+        return None
+    return render_decls(header.closure(root))
+
+
+_LITERAL_OR_COMMENT_RE = re.compile(
+    r"(\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*')|/\*.*?(?:\*/|\Z)|//[^\n]*", re.DOTALL
+)
+_LINE_MARKER_RE = re.compile(r"^[ \t]*#[ \t]*(?:line[ \t]+)?\d+\b[^\n]*$", re.MULTILINE)
+_LITERAL_OR_SPACE_RE = re.compile(r"(\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*')|[ \t\f\v\r]+")
+
+
+def normalize_header(text: str) -> str:
+    """Drop comments, line markers, blank lines and redundant whitespace; string literals are kept."""
+    text = _LITERAL_OR_COMMENT_RE.sub(lambda m: m.group(1) or " ", text)
+    text = _LINE_MARKER_RE.sub("", text)
+    text = _LITERAL_OR_SPACE_RE.sub(lambda m: m.group(1) or " ", text)
+    lines = [line for line in (line.strip() for line in text.split("\n")) if line]
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,99 @@
+"""Per-request deadlines and cancellation of generations nobody is waiting for.
+
+A request's budget is the client's ``X-Request-Timeout`` header (seconds),
+capped by ``REQUEST_TIMEOUT_MAX``. While a generation runs the client
+connection is polled; when the client disconnects or the budget runs out the
+generation task is cancelled, which aborts HTTP calls to remote backends and
+stops llama.cpp decoding at the next token.
+"""
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "x-request-timeout"
+MAX_REQUEST_SECONDS = float(os.getenv("REQUEST_TIMEOUT_MAX", "600"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+# Not an official status code; the convention for "client closed the request".
+CLIENT_CLOSED_REQUEST = 499
+
+
+class CancelStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.requests: Dict[str, int] = {}
+            self.backend_calls: Dict[str, int] = {}
+            self.spent_seconds = 0.0
+            self.reclaimed_seconds = 0.0
+
+    def request(self, reason: str) -> None:
+        with self._lock:
+            self.requests[reason] = self.requests.get(reason, 0) + 1
+
+    def backend_call(self, backend: str, elapsed: float, typical: Optional[float]) -> None:
+        """Record a cancelled call that ran ``elapsed`` seconds; calls usually take ``typical``."""
+        with self._lock:
+            self.backend_calls[backend] = self.backend_calls.get(backend, 0) + 1
+            self.spent_seconds += elapsed
+            if typical is not None:
+                self.reclaimed_seconds += max(0.0, typical - elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cancelled_requests": dict(self.requests),
+                "cancelled_backend_calls": dict(self.backend_calls),
+                "spent_seconds": self.spent_seconds,
+                "reclaimed_seconds_estimate": self.reclaimed_seconds,
+            }
+
+
+cancel_stats = CancelStats()
+
+
+def request_budget(request: Request) -> float:
+    value = request.headers.get(DEADLINE_HEADER)
+    if value is None:
+        return MAX_REQUEST_SECONDS
+    try:
+        budget = float(value)
+    except ValueError:
+        budget = -1.0
+    if not budget > 0:
+        raise HTTPException(status_code=400, detail=f"invalid {DEADLINE_HEADER} header")
+    return min(budget, MAX_REQUEST_SECONDS)
+
+
+async def run_bounded(request: Request, budget: float, fn: Callable[[], Awaitable[T]]) -> T:
+    """Await ``fn()`` unless the client disconnects (499) or ``budget`` seconds pass (504) first."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    task = asyncio.ensure_future(fn())
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, min(DISCONNECT_POLL_SECONDS, remaining)))
+            if done:
+                return task.result()
+            if loop.time() >= deadline:
+                reason = "deadline"
+                break
+            if await request.is_disconnected():
+                reason = "disconnect"
+                break
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    cancel_stats.request(reason)
+    if reason == "deadline":
+        raise HTTPException(status_code=504, detail=f"deadline of {budget:g}s exceeded")
+    raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="client closed request")
@@ -0,0 +1,81 @@
+"""Content-addressed store of uploaded headers (``PUT /headers``).
+
+Headers are kept normalized, in memory (LRU by size) and optionally on disk,
+keyed by the SHA-256 of the uploaded bytes so clients can compute the ref
+themselves and skip uploads the server already has. The most recently used
+headers also keep their parsed declarations alive, so repeated requests
+against them skip parsing.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from c_decls import HeaderDecls, retain_parsed
+from result_cache import ResultCache
+
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def header_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class HeaderStore(ResultCache):
+    SUFFIX = ".h"
+    _encode = staticmethod(lambda text: text.encode("utf-8"))
+    _decode = staticmethod(lambda data: data.decode("utf-8"))
+
+    def __init__(self, *args: Any, parsed_entries: int = 32, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.parsed_entries = parsed_entries
+        self._parsed: "OrderedDict[str, Tuple[str, HeaderDecls]]" = OrderedDict()
+        self._parsed_lock = threading.Lock()
+
+    def get(self, ref: str) -> Optional[str]:
+        """Normalized text for ``ref``; the same object is returned while it stays hot."""
+        if not _DIGEST_RE.fullmatch(ref):
+            return None
+        with self._parsed_lock:
+            entry = self._parsed.get(ref)
+            if entry is not None:
+                self._parsed.move_to_end(ref)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry[0]
+        text = super().get(ref)
+        return self._hold(ref, text) if text is not None else None
+
+    def put(self, ref: str, text: str) -> None:
+        super().put(ref, text)
+        self._hold(ref, text)
+
+    def _hold(self, ref: str, text: str) -> str:
+        parsed = retain_parsed(text)
+        with self._parsed_lock:
+            self._parsed[ref] = (text, parsed)
+            self._parsed.move_to_end(ref)
+            while len(self._parsed) > self.parsed_entries:
+                self._parsed.popitem(last=False)
+        return text
+
+    def clear(self) -> None:
+        super().clear()
+        with self._parsed_lock:
+            self._parsed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._parsed_lock:
+            parsed = len(self._parsed)
+        return {**super().stats(), "parsed": parsed}
+
+
+header_store = HeaderStore(
+    max_bytes=int(os.getenv("HEADER_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+    disk_dir=os.getenv("HEADER_STORE_DIR") or None,
+    disk_max_bytes=int(os.getenv("HEADER_STORE_DISK_MAX_BYTES", str(2 * 1024 * 1024 * 1024))),
+    parsed_entries=int(os.getenv("HEADER_STORE_PARSED_ENTRIES", "32")),
+)
@@ -0,0 +1,207 @@
+"""Composite backend that hedges a slow primary with a secondary backend.
+
+The request goes to the primary; if it has not answered after the hedge
+delay (fixed, or the primary's observed p95) the same request also goes to
+the secondary. The first answer that passes validation wins and the loser is
+cancelled; the latency saved is estimated from the loser's median latency.
+"""
+import statistics
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from admission import admission
+from llm_backends import LLMClient, LLMError, backend_identity, get_backend, parse_target, register_backend
+from parser_validator import parse_llm_files
+from prompt_text import SYSTEM_PROMPT
+
+P95_MIN_SAMPLES = 20
+
+
+class HedgeStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.hedged = 0
+            self.wins: Dict[str, int] = {}
+            self.failures: Dict[str, int] = {}
+            self.latency_saved = 0.0
+            self.saved_samples = 0
+            self.cancelled = 0
+            self._latencies: Dict[str, Deque[float]] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=256)).append(seconds)
+
+    def p95(self, name: str) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._latencies.get(name, ()))
+        if len(values) < P95_MIN_SAMPLES:
+            return None
+        return values[int(0.95 * (len(values) - 1))]
+
+    def median(self, name: str) -> Optional[float]:
+        with self._lock:
+            values = list(self._latencies.get(name, ()))
+        return statistics.median(values) if values else None
+
+    def win(self, name: str, hedged: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.hedged += int(hedged)
+            self.wins[name] = self.wins.get(name, 0) + 1
+
+    def fail(self, name: str) -> None:
+        with self._lock:
+            self.failures[name] = self.failures.get(name, 0) + 1
+
+    def saved(self, seconds: Optional[float]) -> None:
+        """Record a cancelled loser; ``seconds`` is the estimated saving, if there is one."""
+        with self._lock:
+            self.cancelled += 1
+            if seconds is not None:
+                self.latency_saved += seconds
+                self.saved_samples += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.wins.values())
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "wins": dict(self.wins),
+                "win_rates": {name: n / total for name, n in self.wins.items()} if total else {},
+                "failures": dict(self.failures),
+                "losers_cancelled": self.cancelled,
+                "latency_saved_seconds": self.latency_saved,
+                "latency_saved_avg_seconds": self.latency_saved / self.saved_samples if self.saved_samples else 0.0,
+            }
+
+
+hedge_stats = HedgeStats()
+
+
+class HedgedLLM(LLMClient):
+    composite = True
+
+    def __init__(
+        self,
+        primary: str,
+        secondary: str,
+        delay: Optional[float] = None,
+        fallback_delay: float = 2.0,
+        stats: HedgeStats = hedge_stats,
+    ):
+        super().__init__("hedged")
+        self.primary = parse_target(primary)
+        self.secondary = parse_target(secondary)
+        self.delay = delay
+        self.fallback_delay = fallback_delay
+        self.stats = stats
+
+    def hedge_delay(self) -> float:
+        if self.delay is not None:
+            return self.delay
+        p95 = self.stats.p95(self.primary[0])
+        return p95 if p95 is not None else self.fallback_delay
+
+    def _valid(self, system: str, text: str) -> bool:
+        # Fragment prompts have their own format; only whole-adapter answers are checked.
+        if system != SYSTEM_PROMPT:
+            return bool(text and text.strip())
+        try:
+            parse_llm_files(text)
+        except HTTPException as e:
+            # "No common root" is a deterministic answer, not a failed attempt; pass it through.
+            return e.status_code == 409
+        except Exception:
+            return False
+        return True
+
+    async def _attempt(self, target: Tuple[str, Optional[str]], system: str, user: str) -> Tuple[str, float]:
+        started = time.perf_counter()
+        backend = await asyncio.get_running_loop().run_in_executor(
+            None, get_backend, target[0], target[1], self.temperature
+        )
+        async with admission.slot(target[0]):
+            text = await backend.agenerate(system, user)
+        elapsed = time.perf_counter() - started
+        self.stats.observe(target[0], elapsed)
+        if not self._valid(system, text):
+            raise LLMError(f"{target[0]} returned output that does not parse")
+        return text, elapsed
+
+    async def agenerate(self, system: str, user: str) -> str:
+        names = {}
+        started = {}
+        primary = asyncio.ensure_future(self._attempt(self.primary, system, user))
+        names[primary], started[primary] = self.primary[0], time.perf_counter()
+        pending = {primary}
+        errors: List[BaseException] = []
+        hedged = False
+
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            while True:
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        text, _ = task.result()
+                        self.stats.win(names[task], hedged)
+                        for loser in pending:
+                            self.stats.saved(self._estimated_saving(names[loser], started[loser]))
+                        return text
+                    self.stats.fail(names[task])
+                    errors.append(task.exception())
+                if not hedged:
+                    # The primary is slow or failed: race the secondary against it.
+                    hedged = True
+                    secondary = asyncio.ensure_future(self._attempt(self.secondary, system, user))
+                    names[secondary], started[secondary] = self.secondary[0], time.perf_counter()
+                    pending.add(secondary)
+                if not pending:
+                    raise LLMError("; ".join(str(e) for e in errors))
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Losers, and every attempt when the caller is cancelled, stop using their backend.
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _estimated_saving(self, name: str, started: float) -> Optional[float]:
+        typical = self.stats.median(name)
+        if typical is None:
+            return None
+        return max(0.0, started + typical - time.perf_counter())
+
+    def generate(self, system: str, user: str) -> str:
+        return asyncio.run(self.agenerate(system, user))
+
+
+def _hedged_from_env(model: Optional[str]) -> HedgedLLM:
+    delay = os.getenv("HEDGE_DELAY", "p95")
+    return HedgedLLM(
+        primary=os.getenv("HEDGE_PRIMARY", "openai"),
+        secondary=os.getenv("HEDGE_SECONDARY", "local"),
+        delay=None if delay == "p95" else float(delay),
+        fallback_delay=float(os.getenv("HEDGE_FALLBACK_DELAY", "2.0")),
+    )
+
+
+def _hedged_identity(model: Optional[str]) -> Tuple[Any, ...]:
+    targets = (os.getenv("HEDGE_PRIMARY", "openai"), os.getenv("HEDGE_SECONDARY", "local"))
+    return tuple(backend_identity(*parse_target(spec)) for spec in targets)
+
+
+register_backend("hedged", _hedged_from_env, identity=_hedged_identity)
@@ -0,0 +1,214 @@
+"""Shared keep-alive HTTP transport with retries for JSON inference endpoints."""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class _Attempt:
+    """Outcome of one try: a response, or the error to raise if no retry is left."""
+
+    def __init__(self, response: Any = None, error: Optional[BaseException] = None, retry: bool = False):
+        self.response = response
+        self.error = error
+        self.retry = retry
+
+
+class HTTPPool:
+    """Pooled sync (requests) and async (httpx) clients sharing one set of limits.
+
+    Both libraries are imported on first use, so a deployment that never calls
+    an HTTP backend does not pay for them at startup.
+
+    Connection failures (including keep-alive connections the server already
+    closed) and 429/502/503/504 responses are retried with jittered
+    exponential backoff; a numeric ``Retry-After`` is honoured up to
+    ``backoff_max``. Other failures are raised immediately.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+    ):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session: Optional[requests.Session] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated = 0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def session(self) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                # pool_block makes callers wait for a free connection instead of opening extras.
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def async_client(self) -> "httpx.AsyncClient":
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size, max_keepalive_connections=self.pool_size
+                    ),
+                )
+            return client
+
+    def backoff(self, attempt: int, response: Any = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _enter(self) -> None:
+        with self._lock:
+            if self.in_flight >= self.pool_size:
+                self.saturated += 1
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _exit(self, ok: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if not ok:
+                self.failures += 1
+
+    def _classify(self, response: Any = None, error: Optional[BaseException] = None) -> _Attempt:
+        if error is not None:
+            import httpx
+            import requests
+
+            # Read timeouts are not retried: the server may still be generating.
+            retry = isinstance(
+                error,
+                (requests.ConnectionError, httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError),
+            )
+            return _Attempt(error=error, retry=retry)
+        if response.status_code in RETRY_STATUSES:
+            return _Attempt(response=response, retry=True)
+        return _Attempt(response=response)
+
+    def _should_retry(self, attempt: _Attempt, tries: int) -> bool:
+        if not attempt.retry or tries >= self.max_retries:
+            return False
+        with self._lock:
+            self.retries += 1
+        return True
+
+    def post_json(self, url: str, payload: Dict[str, Any]) -> Any:
+        import requests
+
+        self._enter()
+        ok = False
+        try:
+            tries = 0
+            while True:
+                try:
+                    attempt = self._classify(
+                        response=self.session.post(
+                            url, json=payload, timeout=(self.connect_timeout, self.read_timeout)
+                        )
+                    )
+                except requests.RequestException as e:
+                    attempt = self._classify(error=e)
+                if not self._should_retry(attempt, tries):
+                    break
+                time.sleep(self.backoff(tries, attempt.response))
+                tries += 1
+            if attempt.error is not None:
+                raise attempt.error
+            attempt.response.raise_for_status()
+            data = attempt.response.json()
+            ok = True
+            return data
+        finally:
+            self._exit(ok)
+
+    async def apost_json(self, url: str, payload: Dict[str, Any]) -> Any:
+        import httpx
+
+        self._enter()
+        ok = False
+        try:
+            tries = 0
+            while True:
+                try:
+                    attempt = self._classify(response=await self.async_client().post(url, json=payload))
+                except httpx.HTTPError as e:
+                    attempt = self._classify(error=e)
+                if not self._should_retry(attempt, tries):
+                    break
+                await asyncio.sleep(self.backoff(tries, attempt.response))
+                tries += 1
+            if attempt.error is not None:
+                raise attempt.error
+            attempt.response.raise_for_status()
+            data = attempt.response.json()
+            ok = True
+            return data
+        finally:
+            self._exit(ok)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "requests": self.requests,
+                "saturated": self.saturated,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+offline_pool = HTTPPool(
+    pool_size=int(os.getenv("OFFLINE_LLM_POOL_SIZE", "10")),
+    connect_timeout=float(os.getenv("OFFLINE_LLM_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("OFFLINE_LLM_READ_TIMEOUT", "60")),
+    max_retries=int(os.getenv("OFFLINE_LLM_MAX_RETRIES", "3")),
+    backoff_base=float(os.getenv("OFFLINE_LLM_BACKOFF_BASE", "0.5")),
+    backoff_max=float(os.getenv("OFFLINE_LLM_BACKOFF_MAX", "8")),
+)
@@ -0,0 +1,136 @@
+"""Struct-level adapter generation with memoised per-struct fragments.
+
+Only structs that need judgment are sent to the backend, one small prompt
+each; everything else is built by ``adapter_engine``. Fragments are cached by
+the hash of their per-version definitions so a struct that was already seen
+(in any root) is never generated twice.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from adapter_engine import GEN, AdapterPlan, StructFragment, helper_name, variant_name
+from models import FileOut
+from parser_validator import parse_fragment_files
+from prompt_text import FRAGMENT_SYSTEM_PROMPT, build_fragment_prompt
+
+LLMCall = Callable[[str, str], Awaitable[str]]
+
+
+class FragmentCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, StructFragment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[StructFragment]:
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def put(self, key: str, fragment: StructFragment) -> None:
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+fragment_cache = FragmentCache(max_entries=int(os.getenv("FRAGMENT_CACHE_SIZE", "1024")))
+
+
+@dataclass
+class IncrementalStats:
+    native: int = 0
+    llm: int = 0
+    cached: int = 0
+
+    def header_value(self) -> str:
+        return f"native={self.native};llm={self.llm};cached={self.cached}"
+
+
+def fragment_request(plan: AdapterPlan, key: str) -> Tuple[str, List[str], List[str]]:
+    """User prompt plus the type and helper names the backend must return for ``key``."""
+    labels = plan.present_labels(key)
+    versions = {label: plan.types[key].decls[label].text for label in labels}
+    context = [decl.text for decl in plan.shared_deps(key)]
+    prompt = build_fragment_prompt(key, versions, plan.versioned_deps(key), context)
+    type_names = [variant_name(key, label) for label in labels + [GEN]]
+    helpers = [helper_name(key, GEN, label) for label in labels]
+    helpers += [helper_name(key, label, GEN) for label in labels]
+    return prompt, type_names, helpers
+
+
+async def generate_incremental(
+    plan: AdapterPlan,
+    llm: Callable[[], Awaitable[LLMCall]],
+    llm_tag: str,
+    cache_llm: bool = True,
+    cache: FragmentCache = fragment_cache,
+) -> Tuple[List[FileOut], IncrementalStats]:
+    """Render ``plan`` building only the ambiguous structs through ``llm``.
+
+    ``llm`` is awaited lazily so requests that need no backend never construct
+    one; ``llm_tag`` identifies backend/model/temperature in cache keys. The
+    ambiguous structs are requested concurrently.
+    """
+    stats = IncrementalStats()
+    fragments: Dict[str, StructFragment] = {}
+
+    def key_for(key: str, tag: str) -> str:
+        return hashlib.sha256(f"{tag}\0{plan.struct_signature(key)}".encode("utf-8")).hexdigest()
+
+    async def from_llm(key: str) -> None:
+        prompt, type_names, helpers = fragment_request(plan, key)
+        text = await (await llm())(FRAGMENT_SYSTEM_PROMPT, prompt)
+        types, helper_text = parse_fragment_files(text, key, type_names, helpers)
+        fragments[key] = StructFragment(name=key, types=types, helpers=helper_text)
+        stats.llm += 1
+        if cache_llm:
+            cache.put(key_for(key, llm_tag), fragments[key])
+
+    pending = []
+    for key in plan.ambiguous_structs():
+        cached = cache.get(key_for(key, llm_tag))
+        if cached is not None:
+            fragments[key] = cached
+            stats.cached += 1
+        else:
+            pending.append(from_llm(key))
+    await asyncio.gather(*pending)
+
+    def build(current: AdapterPlan, key: str) -> StructFragment:
+        if key in fragments:
+            return fragments[key]
+        cache_key = key_for(key, "native")
+        fragment = cache.get(cache_key)
+        if fragment is not None:
+            stats.cached += 1
+            return fragment
+        fragment = current.fragment(key)
+        stats.native += 1
+        cache.put(cache_key, fragment)
+        return fragment
+
+    # Rendering builds every native fragment; keep that CPU work off the event loop.
+    return await asyncio.to_thread(plan.render, fragment_for=build), stats
@@ -0,0 +1,230 @@
+"""Persistent job queue for long-running generations.
+
+Jobs live in a SQLite database so queued work survives restarts; a pool of
+asyncio workers claims them oldest-first and runs them through the same path
+as ``/generate``. Finished jobs are deleted once they are older than the
+retention period. Store calls block on SQLite, so the workers make them from
+the thread pool.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from models import GenerateRequest, GenerateResponse, JobStatus
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    status_code INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def create(self, req: GenerateRequest) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, created) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, req.model_dump_json(), time.time()),
+            )
+        return job_id
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """Mark the oldest queued job as running and return it."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            started = time.time()
+            self._conn.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, started, row["id"]))
+        return row
+
+    def finish(self, job_id: str, result: GenerateResponse) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, status_code = 200, finished = ? WHERE id = ?",
+                (DONE, result.model_dump_json(), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, status_code: int, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, status_code = ?, finished = ? WHERE id = ?",
+                (FAILED, error, status_code, time.time(), job_id),
+            )
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a shutdown back in the queue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING)
+            )
+        return cursor.rowcount
+
+    def purge_finished(self, before: float) -> int:
+        """Delete done and failed jobs that finished before ``before``."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, before)
+            )
+        return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({status: n for status, n in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def job_status(row: sqlite3.Row) -> JobStatus:
+    return JobStatus(
+        id=row["id"],
+        status=row["status"],
+        created=row["created"],
+        started=row["started"],
+        finished=row["finished"],
+        status_code=row["status_code"],
+        error=row["error"],
+        result=GenerateResponse.model_validate_json(row["result"]) if row["result"] else None,
+    )
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class JobWorkers:
+    """Asyncio workers draining a ``JobStore`` through ``run``."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        run: Callable[[GenerateRequest], Awaitable[GenerateResponse]],
+        workers: int = 2,
+        poll_seconds: float = 1.0,
+        retention_seconds: Optional[float] = 7 * 24 * 3600,
+        sweep_seconds: float = 600.0,
+    ):
+        self.store = store
+        self.run = run
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.sweep_seconds = sweep_seconds
+        self.purged = 0
+        self._wake = asyncio.Event()
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._waits: Deque[float] = deque(maxlen=1024)
+        self._runs: Deque[float] = deque(maxlen=1024)
+        self.busy = 0
+
+    async def start(self) -> None:
+        await run_in_threadpool(self.store.requeue_running)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.retention_seconds is not None:
+            self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Whatever was interrupted runs again on the next start.
+        await run_in_threadpool(self.store.requeue_running)
+
+    async def submit(self, req: GenerateRequest) -> sqlite3.Row:
+        """Queue ``req`` and return its row as queued, before a worker can claim it."""
+
+        def create() -> sqlite3.Row:
+            return self.store.get(self.store.create(req))
+
+        row = await run_in_threadpool(create)
+        self._wake.set()
+        return row
+
+    async def _sweep(self) -> None:
+        while True:
+            self.purged += await run_in_threadpool(self.store.purge_finished, time.time() - self.retention_seconds)
+            await asyncio.sleep(self.sweep_seconds)
+
+    async def _work(self) -> None:
+        while True:
+            self._wake.clear()
+            row = await run_in_threadpool(self.store.claim)
+            if row is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._waits.append(time.time() - row["created"])
+            self.busy += 1
+            started = time.perf_counter()
+            try:
+                result = await self.run(GenerateRequest.model_validate_json(row["request"]))
+            except HTTPException as e:
+                await run_in_threadpool(self.store.fail, row["id"], e.status_code, str(e.detail))
+            except Exception as e:  # keep the worker alive
+                await run_in_threadpool(self.store.fail, row["id"], 500, str(e))
+            else:
+                await run_in_threadpool(self.store.finish, row["id"], result)
+            finally:
+                self.busy -= 1
+                self._runs.append(time.perf_counter() - started)
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = await run_in_threadpool(self.store.counts)
+        waits, runs = list(self._waits), list(self._runs)
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queue_depth": counts[QUEUED],
+            "jobs": counts,
+            "purged": self.purged,
+            "wait_seconds_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_seconds_p95": _percentile(waits, 0.95),
+            "run_seconds_avg": sum(runs) / len(runs) if runs else 0.0,
+            "run_seconds_p95": _percentile(runs, 0.95),
+        }
@@ -0,0 +1,470 @@
+"""Multi-process pool of local model instances.
+
+llama.cpp contexts cannot be shared between concurrent generations, so one
+in-process model serialises all local requests. The pool runs several worker
+processes, each with its own loaded model, its own thread count and (on Linux)
+its own slice of CPUs. Jobs go through one shared queue so any idle worker
+picks up the next one; workers that die are restarted and the job they were
+running fails with ``LLMError``. When every worker is busy and the queue is
+full, new jobs are rejected with ``BackendBusy`` instead of piling up.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llm_backends import BackendBusy, LLMClient, LLMError, LocalLlamaLLM, local_model_path
+
+_NO_JOB = -1
+
+_pools: "weakref.WeakSet[LLMProcessPool]" = weakref.WeakSet()
+
+
+def cpu_slices(workers: int, cpus: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Split the usable CPUs into ``workers`` contiguous slices.
+
+    Adjacent CPU ids usually share a core complex and NUMA node, so contiguous
+    slices keep each worker's threads and memory close together.
+    """
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+    cpus = list(cpus)
+    per = max(1, len(cpus) // workers)
+    return [cpus[(i * per) % len(cpus) :][:per] for i in range(workers)]
+
+
+def llama_worker(model_path: str, n_threads: Optional[int]) -> LLMClient:
+    return LocalLlamaLLM(model_path, n_threads=n_threads)
+
+
+def _worker_main(
+    index: int,
+    factory: Callable[..., LLMClient],
+    args: Tuple[Any, ...],
+    cpus: Optional[List[int]],
+    tasks: "multiprocessing.Queue[Any]",
+    results: "multiprocessing.Queue[Any]",
+    current: Any,
+    cancel: Any,
+) -> None:
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    try:
+        llm = factory(*args)
+        llm.warm()
+    except Exception as e:
+        results.put((_NO_JOB, "fatal", index, str(e)))
+        return
+    results.put((_NO_JOB, "ready", index, os.getpid()))
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, kind, system, user, temperature = task
+        # Shared memory rather than a message: it is visible even if the process dies right after.
+        current.value = job_id
+        results.put((job_id, "start", index, None))
+        view = llm.with_temperature(temperature)
+        try:
+            if kind == "stream":
+                for chunk in view.stream(system, user):
+                    if cancel.value == job_id:
+                        break
+                    results.put((job_id, "chunk", index, chunk))
+            else:
+                text = view.generate_until(system, user, lambda: cancel.value == job_id)
+                results.put((job_id, "text", index, text))
+            results.put((job_id, "done", index, view.last_usage))
+        except Exception as e:
+            results.put((job_id, "error", index, str(e)))
+        current.value = _NO_JOB
+
+
+class _Job:
+    """Delivers a job's messages to a blocking or an asyncio consumer."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.messages: Any = asyncio.Queue() if loop is not None else queue.Queue()
+        self.worker: Optional[int] = None
+        self.abandoned = False
+
+    def put(self, message: Tuple[str, Any]) -> None:
+        if self.loop is None:
+            self.messages.put(message)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.messages.put_nowait, message)
+        except RuntimeError:  # the consumer's loop is gone
+            pass
+
+
+class LLMProcessPool:
+    """``workers`` processes each running ``factory(*args)``; see the module docstring."""
+
+    def __init__(
+        self,
+        factory: Callable[..., LLMClient],
+        args: Tuple[Any, ...] = (),
+        workers: int = 2,
+        max_queue: int = 16,
+        pin: bool = True,
+    ):
+        self.factory = factory
+        self.args = args
+        self.workers = workers
+        self.max_queue = max_queue
+        self._ctx = multiprocessing.get_context("spawn")  # fork would copy loaded models and held locks
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._slices: List[Optional[List[int]]] = cpu_slices(workers) if pin else [None] * workers
+        self._current = [self._ctx.Value("q", _NO_JOB, lock=False) for _ in range(workers)]
+        self._cancel = [self._ctx.Value("q", _NO_JOB, lock=False) for _ in range(workers)]
+        self._procs: List[Any] = [None] * workers
+        self._ready = [False] * workers
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, _Job] = {}
+        self._ids = itertools.count()
+        self._closing = False
+        self.error: Optional[str] = None
+        self.restarts = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.completion_tokens = 0
+        self._first_job: Optional[float] = None
+        self._last_done: Optional[float] = None
+        self._changed = threading.Condition(self._lock)
+        for index in range(workers):
+            self._spawn(index)
+        self._reader = threading.Thread(target=self._read, name="llm-pool-reader", daemon=True)
+        self._reader.start()
+        _pools.add(self)
+
+    def _spawn(self, index: int) -> None:
+        self._ready[index] = False
+        self._current[index].value = _NO_JOB
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self.factory,
+                self.args,
+                self._slices[index],
+                self._tasks,
+                self._results,
+                self._current[index],
+                self._cancel[index],
+            ),
+            name=f"llm-pool-{index}",
+            daemon=True,
+        )
+        proc.start()
+        self._procs[index] = proc
+
+    def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """Block until every worker has loaded its model; raise ``LLMError`` if loading failed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not all(self._ready) and self.error is None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise LLMError("timed out waiting for pool workers to load")
+                self._changed.wait(remaining)
+            if self.error is not None:
+                raise LLMError(self.error)
+
+    def _read(self) -> None:
+        while True:
+            try:
+                job_id, kind, index, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                return
+            else:
+                self._dispatch(job_id, kind, index, payload)
+            if self._closing:
+                return
+            self._check_workers()
+
+    def _dispatch(self, job_id: int, kind: str, index: int, payload: Any) -> None:
+        with self._changed:
+            if kind in ("ready", "fatal"):
+                if kind == "ready":
+                    self._ready[index] = True
+                else:
+                    self.error = f"pool worker failed to start: {payload}"
+                self._changed.notify_all()
+                return
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if kind == "start":
+                job.worker = index
+                if job.abandoned:
+                    self._cancel[index].value = job_id
+                return
+            if kind in ("done", "error"):
+                del self._jobs[job_id]
+                self._changed.notify_all()
+                self._last_done = time.monotonic()
+                if kind == "done":
+                    self.completed += 1
+                    self.completion_tokens += (payload or {}).get("completion_tokens", 0)
+                else:
+                    self.failed += 1
+        job.put((kind, payload))
+
+    def _check_workers(self) -> None:
+        for index, proc in enumerate(self._procs):
+            if proc.is_alive() or self._closing:
+                continue
+            with self._changed:
+                if self.error is not None:
+                    continue
+                if not self._ready[index]:
+                    # Dying while loading would only repeat on every restart.
+                    self.error = f"pool worker {index} exited during startup (code {proc.exitcode})"
+                    self._changed.notify_all()
+                    continue
+                job = self._jobs.pop(self._current[index].value, None)
+                self.failed += job is not None
+                self.restarts += 1
+                self._changed.notify_all()
+            if job is not None:
+                job.put(("error", f"pool worker {index} exited (code {proc.exitcode})"))
+            self._spawn(index)
+
+    def submit(self, kind: str, system: str, user: str, temperature: float, loop=None) -> Tuple[int, _Job]:
+        job = _Job(loop)
+        with self._lock:
+            if self.error is not None:
+                raise LLMError(self.error)
+            if self._closing:
+                raise LLMError("pool is closed")
+            if len(self._jobs) >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise BackendBusy("local inference pool is full")
+            job_id = next(self._ids)
+            self._jobs[job_id] = job
+            if self._first_job is None:
+                self._first_job = time.monotonic()
+        self._tasks.put((job_id, kind, system, user, temperature))
+        return job_id, job
+
+    def abandon(self, job_id: int) -> None:
+        """Stop a stream nobody reads any more; queued jobs are cancelled when a worker picks them up."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.abandoned = True
+            if job.worker is not None:
+                self._cancel[job.worker].value = job_id
+
+    def generate(self, system: str, user: str, temperature: float) -> Tuple[str, Dict[str, int]]:
+        _, job = self.submit("generate", system, user, temperature)
+        text = ""
+        while True:
+            kind, payload = job.messages.get()
+            if kind == "text":
+                text = payload
+            elif kind == "done":
+                return text, payload or {}
+            else:
+                raise LLMError(payload)
+
+    def stream(self, system: str, user: str, temperature: float) -> Iterator[str]:
+        job_id, job = self.submit("stream", system, user, temperature)
+        finished = False
+        try:
+            while True:
+                kind, payload = job.messages.get()
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    raise LLMError(payload)
+        finally:
+            if not finished:
+                self.abandon(job_id)
+
+    async def agenerate(self, system: str, user: str, temperature: float) -> Tuple[str, Dict[str, int]]:
+        job_id, job = self.submit("generate", system, user, temperature, asyncio.get_running_loop())
+        text = ""
+        try:
+            while True:
+                kind, payload = await job.messages.get()
+                if kind == "text":
+                    text = payload
+                elif kind == "done":
+                    return text, payload or {}
+                else:
+                    raise LLMError(payload)
+        except asyncio.CancelledError:
+            self.abandon(job_id)
+            raise
+
+    async def astream(self, system: str, user: str, temperature: float) -> AsyncIterator[str]:
+        job_id, job = self.submit("stream", system, user, temperature, asyncio.get_running_loop())
+        finished = False
+        try:
+            while True:
+                kind, payload = await job.messages.get()
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    raise LLMError(payload)
+        finally:
+            if not finished:
+                self.abandon(job_id)
+
+    def close_when_idle(self) -> None:
+        """Close once the jobs already submitted have finished, without blocking the caller."""
+
+        def drain() -> None:
+            with self._changed:
+                self._changed.wait_for(lambda: not self._jobs or self._closing)
+            self.close()
+
+        threading.Thread(target=drain, name="llm-pool-drain", daemon=True).start()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            pending = list(self._jobs.values())
+            self._jobs.clear()
+        for job in pending:
+            job.put(("error", "pool is closed"))
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._reader.join(timeout=2)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busy = sum(1 for job in self._jobs.values() if job.worker is not None)
+            active = (self._last_done or 0.0) - (self._first_job or 0.0)
+            return {
+                "workers": self.workers,
+                "alive": sum(1 for proc in self._procs if proc.is_alive()),
+                "ready": sum(self._ready),
+                "busy": busy,
+                "queued": len(self._jobs) - busy,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "completion_tokens": self.completion_tokens,
+                "tokens_per_second": self.completion_tokens / active if active > 0 else 0.0,
+                "error": self.error,
+            }
+
+
+class LlamaPoolLLM(LLMClient):
+    """Local backend served by an ``LLMProcessPool`` of llama.cpp workers."""
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        temperature: float = 0.0,
+        workers: int = 2,
+        threads: Optional[int] = None,
+        max_queue: int = 16,
+        pin: bool = True,
+        factory: Callable[..., LLMClient] = llama_worker,
+    ):
+        super().__init__(model=model, temperature=temperature)
+        if factory is llama_worker:
+            self.model = str(local_model_path(model))
+        self.workers = workers
+        self.threads = threads
+        self.max_queue = max_queue
+        self.pin = pin
+        self.factory = factory
+        # Shared with per-request views, which are shallow copies.
+        self._shared: Dict[str, Any] = {}
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model: Optional[str]) -> "LlamaPoolLLM":
+        threads = os.getenv("LLAMA_POOL_THREADS")
+        return cls(
+            model,
+            workers=int(os.getenv("LLAMA_POOL_WORKERS", "2")),
+            threads=int(threads) if threads else None,
+            max_queue=int(os.getenv("LLAMA_POOL_QUEUE", "16")),
+            pin=os.getenv("LLAMA_POOL_PIN", "1") != "0",
+        )
+
+    @property
+    def pool(self) -> LLMProcessPool:
+        with self._pool_lock:
+            if self._shared.get("retired"):
+                # Views outlive their registry entry; they may use the draining pool but never start a new one.
+                pool = self._shared.get("pool")
+                if pool is None or pool._closing:
+                    raise BackendBusy("local model was unloaded; retry")
+                return pool
+            if "pool" not in self._shared:
+                # Without an explicit count each worker gets one thread per CPU in its slice.
+                threads = self.threads or len(cpu_slices(self.workers)[0])
+                args = (self.model, threads) if self.factory is llama_worker else (self.model,)
+                self._shared["pool"] = LLMProcessPool(self.factory, args, self.workers, self.max_queue, self.pin)
+            return self._shared["pool"]
+
+    def warm(self) -> None:
+        self.pool.wait_ready()
+
+    def generate(self, system: str, user: str) -> str:
+        text, self.last_usage = self.pool.generate(system, user, self.temperature)
+        return text
+
+    def stream(self, system: str, user: str) -> Iterator[str]:
+        return self.pool.stream(system, user, self.temperature)
+
+    async def agenerate(self, system: str, user: str) -> str:
+        text, self.last_usage = await self.pool.agenerate(system, user, self.temperature)
+        return text
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[str]:
+        async for chunk in self.pool.astream(system, user, self.temperature):
+            yield chunk
+
+    def close(self) -> None:
+        with self._pool_lock:
+            self._shared["retired"] = True
+            pool = self._shared.pop("pool", None)
+        if pool is not None:
+            pool.close()
+
+    def retire(self) -> None:
+        # Views handed out before the eviction may still be running jobs; let them finish.
+        with self._pool_lock:
+            self._shared["retired"] = True
+            pool = self._shared.get("pool")
+        if pool is not None:
+            pool.close_when_idle()
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    return [pool.stats() for pool in list(_pools) if not pool._closing]
@@ -1,42 +1,241 @@
+import asyncio
+import copy
+import hashlib
 import os
+import pickle
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
 
-import requests
-from openai import OpenAI
+from http_pool import offline_pool
 
 
 class LLMError(Exception):
     pass
 
 
+class BackendBusy(LLMError):
+    """The backend is at capacity; the caller should retry later."""
+
+
+class GenerationCancelled(LLMError):
+    """The caller went away, so the generation was stopped before it finished."""
+
+
+class _LoopLocal:
+    """One lazily created async client per event loop; async clients cannot cross loops."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = self._factory()
+        return client
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+async def stream_in_thread(
+    executor: Optional[Executor], produce: Callable[[], Iterator[str]], window: int = 4
+) -> AsyncIterator[str]:
+    """Drive a blocking chunk iterator on ``executor`` and yield its chunks asynchronously.
+
+    The whole iteration runs as one executor task, so backends that hold a lock
+    for the duration of a generation never interleave with other requests. The
+    producer stays at most ``window`` chunks ahead of the consumer, so a consumer
+    that stops early also stops the generation.
+    """
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    stop = threading.Event()
+    credits = threading.Semaphore(window)
+    done = object()
+
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:  # loop already closed; nobody is listening
+            stop.set()
+
+    def pump() -> None:
+        try:
+            iterator = produce()
+            try:
+                for chunk in iterator:
+                    while not credits.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    put(chunk)
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+        except BaseException as exc:
+            put(_Failure(exc))
+        finally:
+            put(done)
+
+    loop.run_in_executor(executor, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, _Failure):
+                raise item.exc
+            credits.release()
+            yield item
+    finally:
+        stop.set()
+        credits.release()
+
+
+async def run_cancellable(
+    executor: Optional[Executor], generate: Callable[[str, str, Callable[[], bool]], str], system: str, user: str
+) -> str:
+    """Run a blocking ``generate_until`` on ``executor``; cancelling the caller stops the generation too."""
+    loop = asyncio.get_running_loop()
+    cancel = threading.Event()
+    try:
+        return await loop.run_in_executor(executor, generate, system, user, cancel.is_set)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+
+
 class LLMClient(ABC):
+    # Composite backends (``auto``, ``hedged``) forward each call to other backends, which admit it themselves.
+    composite = False
+
     def __init__(self, model: Optional[str] = None, temperature: float = 0.0):
         self.model = model
         self.temperature = temperature
+        # Usage details of the last call made through this view (e.g. prefix tokens reused).
+        self.last_usage: Dict[str, int] = {}
 
     @abstractmethod
     def generate(self, system: str, user: str) -> str:
         raise NotImplementedError
 
+    def stream(self, system: str, user: str) -> Iterator[str]:
+        """Yield the completion in chunks; backends without streaming yield it whole."""
+        yield self.generate(system, user)
+
+    def generate_until(self, system: str, user: str, cancelled: Callable[[], bool]) -> str:
+        """``generate`` that gives up once ``cancelled()`` is true; backends that can stop early override it."""
+        return self.generate(system, user)
+
+    async def agenerate(self, system: str, user: str) -> str:
+        """Async counterpart of ``generate``; blocking backends run in the default executor."""
+        return await run_cancellable(None, self.generate_until, system, user)
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[str]:
+        yield await self.agenerate(system, user)
+
+    def warm(self) -> None:
+        """Load heavy resources eagerly so shared instances are ready to serve."""
+
+    def close(self) -> None:
+        """Release resources that outlive garbage collection (e.g. worker processes)."""
+
+    def retire(self) -> None:
+        """``close`` once work already started through per-request views has finished."""
+        self.close()
+
+    def with_temperature(self, temperature: float) -> "LLMClient":
+        """Return a per-request view that shares clients and loaded models."""
+        clone = copy.copy(self)
+        clone.temperature = temperature
+        clone.last_usage = {}
+        return clone
+
 
 class CloudLLM(LLMClient):
     def __init__(self, model: str = "gpt-5", temperature: float = 0.0):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise LLMError("missing OPENAI_API_KEY")
+        try:
+            from openai import AsyncOpenAI, OpenAI
+        except ImportError as exc:
+            raise LLMError("openai is not installed; install it to use the openai backend") from exc
         super().__init__(model, temperature)
         self.client = OpenAI(api_key=api_key)
+        self._async_clients = _LoopLocal(lambda: AsyncOpenAI(api_key=api_key))
+
+    def _messages(self, system: str, user: str) -> list:
+        return [{"role": "system", "content": system}, {"role": "user", "content": user}]
 
     def generate(self, system: str, user: str) -> str:
         resp = self.client.chat.completions.create(
             model=self.model,
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            messages=self._messages(system, user),
             temperature=self.temperature,
         )
+        self._record_usage(resp)
         return resp.choices[0].message.content
 
+    async def agenerate(self, system: str, user: str) -> str:
+        resp = await self._async_clients.get().chat.completions.create(
+            model=self.model,
+            messages=self._messages(system, user),
+            temperature=self.temperature,
+        )
+        self._record_usage(resp)
+        return resp.choices[0].message.content
+
+    def _record_usage(self, resp: Any) -> None:
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            self.last_usage = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+            }
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[str]:
+        resp = await self._async_clients.get().chat.completions.create(
+            model=self.model,
+            messages=self._messages(system, user),
+            temperature=self.temperature,
+            stream=True,
+        )
+        try:
+            async for chunk in resp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await resp.close()
+
+    def stream(self, system: str, user: str) -> Iterator[str]:
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system, user),
+            temperature=self.temperature,
+            stream=True,
+        )
+        try:
+            for chunk in resp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            resp.close()
+
 
 class OfflineLLM(LLMClient):
     def __init__(self, model: str = "gpt-5", temperature: float = 0.0):
@@ -46,15 +245,25 @@ class OfflineLLM(LLMClient):
         super().__init__(model, temperature)
         self.endpoint = endpoint
 
-    def generate(self, system: str, user: str) -> str:
-        payload = {
+    def _payload(self, system: str, user: str) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "temperature": self.temperature,
             "prompt": f"{system}\n{user}",
         }
-        r = requests.post(self.endpoint, json=payload, timeout=60)
-        r.raise_for_status()
-        data = r.json()
+
+    def generate(self, system: str, user: str) -> str:
+        return self._content(offline_pool.post_json(self.endpoint, self._payload(system, user)))
+
+    async def agenerate(self, system: str, user: str) -> str:
+        return self._content(await offline_pool.apost_json(self.endpoint, self._payload(system, user)))
+
+    def _content(self, data: Any) -> str:
+        usage = data.get("usage") if isinstance(data, dict) else None
+        if isinstance(usage, dict):
+            self.last_usage = {
+                k: usage[k] for k in ("prompt_tokens", "completion_tokens") if isinstance(usage.get(k), int)
+            }
         if isinstance(data, dict):
             return (
                 data.get("content")
@@ -64,22 +273,109 @@ class OfflineLLM(LLMClient):
         return str(data)
 
 
+def _common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class _PrefixStates:
+    """Saved llama.cpp states for the token prefix shared by prompts with one system prompt.
+
+    The prefix is learned from the first two prompts seen for a system prompt
+    (their longest common token prefix), evaluated once and saved; later
+    requests restore it instead of re-evaluating the system prompt. With a
+    directory the states are also pickled to disk for faster cold starts.
+    """
+
+    def __init__(self, disk_dir: Optional[str], min_tokens: int, max_entries: int = 4):
+        self.disk_dir = Path(disk_dir).expanduser() if disk_dir else None
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.states: "OrderedDict[str, Tuple[List[int], Any]]" = OrderedDict()
+        self.observed: Dict[str, List[int]] = {}
+        self.restores = 0
+        self.tokens_saved = 0
+
+    def get(self, key: str) -> Optional[Tuple[List[int], Any]]:
+        entry = self.states.get(key)
+        if entry is None and self.disk_dir is not None:
+            try:
+                with open(self.disk_dir / f"{key}.state", "rb") as fh:
+                    entry = pickle.load(fh)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None
+            self._remember(key, entry)
+        return entry
+
+    def learn(self, client: Any, key: str, prompt: List[int]) -> None:
+        if key in self.states:
+            return
+        seen = self.observed.get(key)
+        self.observed[key] = prompt
+        if seen is None:
+            return
+        prefix = prompt[: _common_prefix(seen, prompt)]
+        if len(prefix) < self.min_tokens:
+            return
+        client.reset()
+        client.eval(prefix)
+        entry = (prefix, client.save_state())
+        self._remember(key, entry)
+        del self.observed[key]
+        if self.disk_dir is not None:
+            try:
+                self.disk_dir.mkdir(parents=True, exist_ok=True)
+                tmp = self.disk_dir / f"{key}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as fh:
+                    pickle.dump(entry, fh)
+                os.replace(tmp, self.disk_dir / f"{key}.state")
+            except OSError:
+                pass
+
+    def _remember(self, key: str, entry: Tuple[List[int], Any]) -> None:
+        self.states[key] = entry
+        self.states.move_to_end(key)
+        while len(self.states) > self.max_entries:
+            self.states.popitem(last=False)
+
+
+def local_model_path(model: Optional[str]) -> Path:
+    candidate = model
+    if not candidate or candidate == "gpt-5":
+        candidate = os.getenv("LLAMA_MODEL_PATH")
+    if not candidate:
+        raise LLMError("missing LLAMA_MODEL_PATH or model path override")
+    model_path = Path(candidate).expanduser()
+    if not model_path.exists():
+        raise LLMError(f"local model not found: {model_path}")
+    return model_path
+
+
+def llama_context_tokens() -> int:
+    return int(os.getenv("LLAMA_N_CTX", "8192"))
+
+
 class LocalLlamaLLM(LLMClient):
     """LLM backend that runs llama.cpp locally on a downloaded checkpoint."""
 
-    def __init__(self, model: Optional[str] = None, temperature: float = 0.0):
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.0, n_threads: Optional[int] = None):
         super().__init__(model=model, temperature=temperature)
-        candidate = model
-        if not candidate or candidate == "gpt-5":
-            candidate = os.getenv("LLAMA_MODEL_PATH")
-        if not candidate:
-            raise LLMError("missing LLAMA_MODEL_PATH or model path override")
-        model_path = Path(candidate).expanduser()
-        if not model_path.exists():
-            raise LLMError(f"local model not found: {model_path}")
-        self.model_path = model_path
-        self.model = str(model_path)
+        self.model_path = local_model_path(model)
+        self.model = str(self.model_path)
+        self.n_threads = n_threads
         self._client = None
+        # llama.cpp contexts are not thread-safe; the lock is shared by per-request views.
+        self._lock = threading.Lock()
+        self._prefixes: Optional[_PrefixStates] = None
+        if os.getenv("LLAMA_PREFIX_CACHE", "1") != "0":
+            self._prefixes = _PrefixStates(
+                os.getenv("LLAMA_PREFIX_CACHE_DIR") or None,
+                min_tokens=int(os.getenv("LLAMA_PREFIX_MIN_TOKENS", "64")),
+            )
 
     def _ensure_client(self):
         if self._client is not None:
@@ -91,13 +387,74 @@ class LocalLlamaLLM(LLMClient):
                 "llama-cpp-python is not installed; install it to use the local backend"
             ) from exc
         try:
-            self._client = Llama(model_path=str(self.model_path))
+            kwargs = {"n_threads": self.n_threads} if self.n_threads else {}
+            self._client = Llama(model_path=str(self.model_path), n_ctx=llama_context_tokens(), **kwargs)
         except Exception as exc:  # pragma: no cover - surface informative error
             raise LLMError(f"failed to initialise llama.cpp backend: {exc}") from exc
 
+    def warm(self) -> None:
+        with self._lock:
+            self._ensure_client()
+
+    async def agenerate(self, system: str, user: str) -> str:
+        return await run_cancellable(llama_executor(), self.generate_until, system, user)
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[str]:
+        async for chunk in stream_in_thread(llama_executor(), lambda: self.stream(system, user)):
+            yield chunk
+
     def generate(self, system: str, user: str) -> str:
+        with self._lock:
+            return self._generate(system, user)
+
+    def generate_until(self, system: str, user: str, cancelled: Callable[[], bool]) -> str:
+        with self._lock:
+            # The caller may have gone while this call waited for the model.
+            if cancelled():
+                raise GenerationCancelled("generation cancelled before it started")
+            return self._generate(system, user, cancelled)
+
+    def _prefix_key(self, system: str) -> str:
+        st = self.model_path.stat()
+        ident = f"{self.model_path}\0{st.st_size}\0{st.st_mtime_ns}\0{system}"
+        return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+    def _restore_prefix(self, key: str) -> List[int]:
+        """Load the saved system prefix unless the context already starts with it.
+
+        Returns the tokens in the context before the call; llama.cpp skips
+        evaluating the part of the prompt that matches them.
+        """
+        current = list(getattr(self._client, "_input_ids", []))
+        entry = self._prefixes.get(key) if self._prefixes is not None else None
+        if entry is not None:
+            tokens, state = entry
+            if _common_prefix(current, tokens) < len(tokens):
+                self._client.load_state(state)
+                self._prefixes.restores += 1
+                current = list(tokens)
+        return current
+
+    def _record_usage(self, before: List[int], prompt: List[int], completion_tokens: Optional[int]) -> None:
+        saved = _common_prefix(before, prompt)
+        if self._prefixes is not None:
+            self._prefixes.tokens_saved += saved
+        self.last_usage = {"prompt_tokens": len(prompt), "prefix_tokens_saved": saved}
+        if completion_tokens is not None:
+            self.last_usage["completion_tokens"] = completion_tokens
+
+    def _generate(self, system: str, user: str, cancelled: Optional[Callable[[], bool]] = None) -> str:
         self._ensure_client()
         assert self._client is not None  # for type checkers
+        key = self._prefix_key(system)
+        before = self._restore_prefix(key)
+        options: Dict[str, Any] = {}
+        if cancelled is not None:
+            from llama_cpp import StoppingCriteriaList  # type: ignore
+
+            # Stopping criteria are checked in the Python decode loop after every token. Logits processors
+            # run inside a ctypes sampler callback that swallows exceptions, so they cannot stop decoding.
+            options["stopping_criteria"] = StoppingCriteriaList([lambda input_ids, logits: cancelled()])
         try:
             response = self._client.create_chat_completion(
                 messages=[
@@ -105,9 +462,12 @@ class LocalLlamaLLM(LLMClient):
                     {"role": "user", "content": user},
                 ],
                 temperature=self.temperature,
+                **options,
             )
         except Exception as exc:  # pragma: no cover - runtime error surfaced to caller
             raise LLMError(f"llama.cpp generation failed: {exc}") from exc
+        if cancelled is not None and cancelled():
+            raise GenerationCancelled("generation cancelled")
 
         if hasattr(response, "model_dump"):
             response = response.model_dump()
@@ -115,6 +475,13 @@ class LocalLlamaLLM(LLMClient):
             response = response.dict()
         if not isinstance(response, dict):
             raise LLMError("unexpected response from llama.cpp")
+        usage = response.get("usage") or {}
+        n_prompt = usage.get("prompt_tokens")
+        if n_prompt:
+            prompt = list(getattr(self._client, "_input_ids", []))[:n_prompt]
+            self._record_usage(before, prompt, usage.get("completion_tokens"))
+            if self._prefixes is not None:
+                self._prefixes.learn(self._client, key, prompt)
         choices = response.get("choices") or []
         if not choices:
             raise LLMError("llama.cpp returned no choices")
@@ -130,13 +497,238 @@ class LocalLlamaLLM(LLMClient):
             raise LLMError("llama.cpp returned empty content")
         return content
 
+    def stream(self, system: str, user: str) -> Iterator[str]:
+        with self._lock:
+            yield from self._stream(system, user)
 
-def get_backend(name: str, model: Optional[str], temperature: float) -> LLMClient:
-    name = name or "openai"
+    def _stream(self, system: str, user: str) -> Iterator[str]:
+        self._ensure_client()
+        assert self._client is not None  # for type checkers
+        # Streams restore the prefix too, but do not learn it: usage is not reported per chunk.
+        self._restore_prefix(self._prefix_key(system))
+        try:
+            chunks = self._client.create_chat_completion(
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                temperature=self.temperature,
+                stream=True,
+            )
+        except Exception as exc:  # pragma: no cover - runtime error surfaced to caller
+            raise LLMError(f"llama.cpp generation failed: {exc}") from exc
+        try:
+            for chunk in chunks:
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}) if choices else {}
+                content = delta.get("content")
+                if content:
+                    yield content
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+
+_llama_executor: Optional[ThreadPoolExecutor] = None
+_llama_executor_lock = threading.Lock()
+
+
+def llama_executor() -> ThreadPoolExecutor:
+    """Dedicated threads for local inference so it never starves the default executor."""
+    global _llama_executor
+    with _llama_executor_lock:
+        if _llama_executor is None:
+            _llama_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("LLAMA_EXECUTOR_WORKERS", "2")),
+                thread_name_prefix="llama",
+            )
+        return _llama_executor
+
+
+LOCAL_BACKEND_NAMES = {"local", "local-llama", "llama"}
+_CUSTOM_BACKENDS: Dict[str, Callable[[Optional[str]], LLMClient]] = {}
+_CUSTOM_IDENTITIES: Dict[str, Callable[[Optional[str]], Hashable]] = {}
+
+
+def register_backend(
+    name: str,
+    factory: Callable[[Optional[str]], LLMClient],
+    identity: Optional[Callable[[Optional[str]], Hashable]] = None,
+) -> None:
+    """Make ``factory(model)`` selectable as backend ``name``; instances are shared per model.
+
+    ``identity(model)`` names what actually answers for ``backend_identity``;
+    backends that forward to others should pass it.
+    """
+    if name in {"openai", "offline"} | LOCAL_BACKEND_NAMES:
+        raise ValueError(f"backend name is reserved: {name}")
+    _CUSTOM_BACKENDS[name] = factory
+    if identity is not None:
+        _CUSTOM_IDENTITIES[name] = identity
+    else:
+        _CUSTOM_IDENTITIES.pop(name, None)
+
+
+def _fingerprint(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def _backend_key(name: str, model: Optional[str]) -> Tuple[Hashable, ...]:
+    if name in _CUSTOM_BACKENDS:
+        return ("custom", name, model)
     if name == "openai":
-        return CloudLLM(model=model or "gpt-5", temperature=temperature)
+        return ("openai", model or "gpt-5", _fingerprint(os.getenv("OPENAI_API_KEY")))
     if name == "offline":
-        return OfflineLLM(model=model or "gpt-5", temperature=temperature)
-    if name in {"local", "local-llama", "llama"}:
-        return LocalLlamaLLM(model=model, temperature=temperature)
+        return ("offline", model or "gpt-5", os.getenv("OFFLINE_LLM_ENDPOINT"))
+    if name in LOCAL_BACKEND_NAMES:
+        candidate = model
+        if not candidate or candidate == "gpt-5":
+            candidate = os.getenv("LLAMA_MODEL_PATH")
+        resolved = str(Path(candidate).expanduser()) if candidate else None
+        return ("local", resolved)
     raise ValueError("unknown backend")
+
+
+def backend_identity(name: Optional[str], model: Optional[str]) -> Tuple[Hashable, ...]:
+    """What determines a backend's output, for keying cached results: the resolved model, not credentials."""
+    name = name or "openai"
+    if name in _CUSTOM_IDENTITIES:
+        return ("custom", name, _CUSTOM_IDENTITIES[name](model))
+    key = _backend_key(name, model)
+    if key[0] == "openai":
+        return key[:2]
+    if key[0] == "local" and key[1] is not None:
+        # Replacing the checkpoint in place must not serve the old model's results.
+        try:
+            st = Path(key[1]).stat()
+        except OSError:
+            return key
+        return key + (st.st_size, st.st_mtime_ns)
+    return key
+
+
+def known_backend(name: Optional[str]) -> bool:
+    return (name or "openai") in {"openai", "offline"} | LOCAL_BACKEND_NAMES | _CUSTOM_BACKENDS.keys()
+
+
+def _build_backend(name: str, model: Optional[str]) -> LLMClient:
+    if name in _CUSTOM_BACKENDS:
+        return _CUSTOM_BACKENDS[name](model)
+    if name == "openai":
+        return CloudLLM(model=model or "gpt-5")
+    if name == "offline":
+        return OfflineLLM(model=model or "gpt-5")
+    if int(os.getenv("LLAMA_POOL_WORKERS", "0")) > 0:
+        from llama_pool import LlamaPoolLLM
+
+        return LlamaPoolLLM.from_env(model)
+    return LocalLlamaLLM(model=model)
+
+
+class BackendRegistry:
+    """Process-wide LRU of warm backend instances keyed by temperature-independent settings."""
+
+    def __init__(
+        self,
+        max_resident: int = 4,
+        factory: Callable[[str, Optional[str]], LLMClient] = _build_backend,
+    ):
+        if max_resident < 1:
+            raise ValueError("max_resident must be at least 1")
+        self.max_resident = max_resident
+        self._factory = factory
+        self._entries: "OrderedDict[Tuple[Hashable, ...], LLMClient]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[Hashable, ...], threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def get(self, name: str, model: Optional[str], temperature: float) -> LLMClient:
+        key = _backend_key(name, model)
+        with self._lock:
+            instance = self._lookup(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        if instance is None:
+            # Serialise loads per key so a burst of cold requests loads the model once.
+            with key_lock:
+                with self._lock:
+                    instance = self._lookup(key)
+                if instance is None:
+                    try:
+                        instance = self._load(key, name, model)
+                    except BaseException:
+                        # Keys come from client input; keep no lock for one that never loaded.
+                        with self._lock:
+                            if key not in self._entries and self._key_locks.get(key) is key_lock:
+                                del self._key_locks[key]
+                        raise
+        return instance.with_temperature(temperature)
+
+    def _lookup(self, key: Tuple[Hashable, ...]) -> Optional[LLMClient]:
+        instance = self._entries.get(key)
+        if instance is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return instance
+
+    def _load(self, key: Tuple[Hashable, ...], name: str, model: Optional[str]) -> LLMClient:
+        started = time.perf_counter()
+        instance = self._factory(name, model)
+        instance.warm()
+        elapsed = time.perf_counter() - started
+        evicted_instances = []
+        with self._lock:
+            self.misses += 1
+            self.loads += 1
+            self.load_seconds += elapsed
+            self._entries[key] = instance
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_resident:
+                evicted, old = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+                evicted_instances.append(old)
+                self.evictions += 1
+        for old in evicted_instances:
+            old.retire()
+        return instance
+
+    def clear(self) -> None:
+        with self._lock:
+            instances = list(self._entries.values())
+            self._entries.clear()
+            self._key_locks.clear()
+            self.hits = self.misses = self.evictions = self.loads = 0
+            self.load_seconds = 0.0
+        for instance in instances:
+            instance.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident": len(self._entries),
+                "max_resident": self.max_resident,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 6),
+            }
+
+
+registry = BackendRegistry(max_resident=int(os.getenv("LLM_MAX_RESIDENT_BACKENDS", "4")))
+
+
+def get_backend(name: str, model: Optional[str], temperature: float) -> LLMClient:
+    return registry.get(name or "openai", model, temperature)
+
+
+def parse_target(spec: str) -> Tuple[str, Optional[str]]:
+    """``backend`` or ``backend:model``."""
+    name, _, model = spec.strip().partition(":")
+    return name, model or None
@@ -0,0 +1,161 @@
+"""In-process metrics in the Prometheus text format, plus per-request stage timings."""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llm_backends import LOCAL_BACKEND_NAMES, known_backend
+
+# Models reported under their own name; any other client-supplied model is labelled "other".
+METRICS_MODELS = {m.strip() for m in os.getenv("METRICS_MODELS", "gpt-5,gpt-5-mini,gpt-4.1").split(",") if m.strip()}
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            # Per-bucket counts, then sum and count.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, values in series:
+            for bound, count in zip(self.buckets, values):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {int(count)}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {int(values[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {values[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {int(values[-1])}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str]):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in series]
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+stage_seconds = Histogram(
+    "gia_stage_seconds", "Time spent in each stage of a generation request.", ("stage", "backend", "model")
+)
+tokens_total = Counter("gia_tokens_total", "Tokens reported by the backend.", ("kind", "backend", "model"))
+METRICS = [stage_seconds, tokens_total]
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def clear_metrics() -> None:
+    for metric in METRICS:
+        metric.clear()
+
+
+class RequestTimings:
+    def __init__(self, backend: str, model: str):
+        self.backend = backend
+        self.model = model
+        self.stages: List[Tuple[str, float]] = []
+
+    def header_value(self) -> str:
+        """``Server-Timing`` value; repeated stages are summed."""
+        totals: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("gia_request_timings", default=None)
+
+
+def metric_labels(backend: str, model: str) -> Tuple[str, str]:
+    """Bounded ``backend``/``model`` labels for client-supplied values."""
+    if backend in LOCAL_BACKEND_NAMES:
+        backend = "local"
+    elif not known_backend(backend):
+        backend = "other"
+    return backend, model if model in METRICS_MODELS else "other"
+
+
+def start_request(backend: str, model: str) -> RequestTimings:
+    timings = RequestTimings(*metric_labels(backend, model))
+    _current.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        if timings is not None:
+            timings.stages.append((name, seconds))
+            stage_seconds.observe(seconds, stage=name, backend=timings.backend, model=timings.model)
+
+
+def record_usage(usage: Dict[str, int]) -> None:
+    timings = _current.get()
+    if timings is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens", "prefix_tokens_saved"):
+        if kind in usage:
+            tokens_total.inc(usage[kind], kind=kind.replace("_tokens", ""), backend=timings.backend, model=timings.model)
@@ -1,15 +1,20 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, model_serializer
 
 
 class GenerateRequest(BaseModel):
     root: str
-    old_header: str
-    new_header: str
+    old_header: str = ""
+    new_header: str = ""
+    # Digests from PUT /headers, used in place of the inline texts.
+    old_header_ref: Optional[str] = None
+    new_header_ref: Optional[str] = None
     backend: str = "openai"
     model: str = "gpt-5"
     temperature: float = 0.0
     return_zip: bool = True
+    prune_headers: bool = True
+    engine: str = "auto"
 
 
 class FileOut(BaseModel):
@@ -18,7 +23,60 @@ class FileOut(BaseModel):
     content: str
 
 
+class HeaderStats(BaseModel):
+    pruned: bool
+    old_original: int
+    old_pruned: int
+    new_original: int
+    new_pruned: int
+
+
 class GenerateResponse(BaseModel):
     root: str
     files: List[FileOut]
-    zip_base64: Optional[str]
+    zip_base64: Optional[str] = None
+    header_stats: Optional[HeaderStats] = None
+    engine: str = "llm"
+    result_id: Optional[str] = None
+
+    @model_serializer(mode="wrap")
+    def _omit_unrequested_zip(self, handler):
+        # The archive duplicates ``files``; leave the field out unless it was requested.
+        data = handler(self)
+        if data.get("zip_base64") is None:
+            data.pop("zip_base64", None)
+        return data
+
+
+class ChainRequest(BaseModel):
+    """Ordered versions of ``root``, oldest first; they are labelled ``1``..``N`` in the output."""
+
+    root: str
+    headers: List[str] = []
+    # Digests from PUT /headers, in place of ``headers``.
+    header_refs: List[str] = []
+    backend: str = "openai"
+    model: str = "gpt-5"
+    temperature: float = 0.0
+    return_zip: bool = True
+    engine: str = "auto"
+
+
+class BatchJob(GenerateRequest):
+    """Header refs may also name entries of the batch's ``headers`` table."""
+
+
+class BatchRequest(BaseModel):
+    headers: Dict[str, str] = {}
+    jobs: List[BatchJob]
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    result: Optional[GenerateResponse] = None
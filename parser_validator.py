@@ -1,13 +1,17 @@
 import base64
 import io
+import os
 import re
 import zipfile
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from fastapi import HTTPException
 
 from models import FileOut
 
 FILE_RE = re.compile(r"// FILE: ([^\n]+)\n```(c|cpp)\n(.*?)\n```", re.DOTALL)
+BLOCK_HEADER_RE = re.compile(r"// FILE: ([^\n]+)\n```(c|cpp)\n")
+FILE_MARKER = "// FILE: "
+MAX_MARKER_LINE = 512
 
 
 def parse_llm_files(text: str) -> List[FileOut]:
@@ -18,26 +22,166 @@ def parse_llm_files(text: str) -> List[FileOut]:
     if len(matches) != 4 or FILE_RE.sub("", text).strip():
         raise HTTPException(status_code=422, detail="expected four file blocks")
     files = []
-    has_versioned = has_conv_h = has_conv_cpp = has_converters = False
+    roles = set()
     for m in matches:
         name, lang, body = m.group(1).strip(), m.group(2), m.group(3)
         files.append(FileOut(name=name, language=lang, content=body))
-        if name.endswith("_versioned.h"):
-            has_versioned = True
-        elif name.startswith("Converter_") and name.endswith(".h"):
-            has_conv_h = True
-        elif name.startswith("Converter_") and name.endswith(".cpp"):
-            has_conv_cpp = True
-        elif name == "converters.cpp":
-            has_converters = True
-    if not (has_versioned and has_conv_h and has_conv_cpp and has_converters):
+        roles.add(file_role(name))
+    if not roles.issuperset(FILE_ROLES):
         raise HTTPException(status_code=422, detail="missing expected files")
     return files
 
 
-def zip_base64(files: List[FileOut]) -> str:
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+FILE_ROLES = ("versioned", "converter_h", "converter_cpp", "converters")
+
+
+def file_role(name: str) -> Optional[str]:
+    if name.endswith("_versioned.h"):
+        return "versioned"
+    if name.startswith("Converter_") and name.endswith(".h"):
+        return "converter_h"
+    if name.startswith("Converter_") and name.endswith(".cpp"):
+        return "converter_cpp"
+    if name == "converters.cpp":
+        return "converters"
+    return None
+
+
+def role_file_name(role: str, root: str) -> str:
+    return {
+        "versioned": f"{root}_versioned.h",
+        "converter_h": f"Converter_{root}.h",
+        "converter_cpp": f"Converter_{root}.cpp",
+        "converters": "converters.cpp",
+    }[role]
+
+
+def salvage_llm_files(text: str) -> Dict[str, FileOut]:
+    """Well-formed file blocks in ``text`` by role; the first block of each role wins."""
+    found: Dict[str, FileOut] = {}
+    for m in FILE_RE.finditer(text):
+        name = m.group(1).strip()
+        role = file_role(name)
+        if role is not None and role not in found:
+            found[role] = FileOut(name=name, language=m.group(2), content=m.group(3))
+    return found
+
+
+def parse_fragment_files(
+    text: str, name: str, type_names: Iterable[str], helper_names: Iterable[str]
+) -> Tuple[str, str]:
+    text = text.strip()
+    matches = list(FILE_RE.finditer(text))
+    if len(matches) != 2 or FILE_RE.sub("", text).strip():
+        raise HTTPException(status_code=422, detail=f"expected two file blocks for {name}")
+    blocks = {m.group(1).strip(): m.group(3) for m in matches}
+    types = blocks.get(f"{name}_types.h")
+    helpers = blocks.get(f"{name}_convert.c")
+    if types is None or helpers is None:
+        raise HTTPException(status_code=422, detail=f"missing expected files for {name}")
+    missing = [t for t in type_names if not re.search(rf"\b{re.escape(t)}\s*;", types)]
+    missing += [h for h in helper_names if not re.search(rf"\bstatic\s+void\s+{re.escape(h)}\s*\(", helpers)]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"fragment for {name} is missing {', '.join(missing)}")
+    return types, helpers
+
+
+class FileBlockParser:
+    """Incremental counterpart of ``parse_llm_files`` for streamed completions.
+
+    ``feed`` returns each file block as soon as its closing fence arrives and
+    raises ``HTTPException`` as soon as the text can no longer satisfy the
+    output protocol; ``close`` applies the full ``parse_llm_files`` checks.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self.files: List[FileOut] = []
+        self._comment = False
+
+    @property
+    def text(self) -> str:
+        return self._buf
+
+    def feed(self, chunk: str) -> List[FileOut]:
+        self._buf += chunk
+        out = []
+        while not self._comment:
+            start = self._pos
+            while start < len(self._buf) and self._buf[start].isspace():
+                start += 1
+            rest = self._buf[start : start + len(FILE_MARKER)]
+            if not rest:
+                break
+            if not self.files and rest.startswith("/*"):
+                self._comment = True  # single error comment; judged in close()
+                break
+            if not FILE_MARKER.startswith(rest[: len(FILE_MARKER)]):
+                raise HTTPException(status_code=422, detail="unexpected text outside file blocks")
+            if len(self.files) == 4:
+                raise HTTPException(status_code=422, detail="expected four file blocks")
+            header = BLOCK_HEADER_RE.match(self._buf, start)
+            if header is None:
+                line_end = self._buf.find("\n", start)
+                fence_end = self._buf.find("\n", line_end + 1) if line_end >= 0 else -1
+                if fence_end >= 0 or len(self._buf) - start > MAX_MARKER_LINE:
+                    raise HTTPException(status_code=422, detail="malformed file block header")
+                break
+            m = FILE_RE.match(self._buf, start)
+            if m is None:
+                break
+            f = FileOut(name=m.group(1).strip(), language=m.group(2), content=m.group(3))
+            self.files.append(f)
+            out.append(f)
+            self._pos = m.end()
+        return out
+
+    def close(self) -> List[FileOut]:
+        return parse_llm_files(self._buf)
+
+
+def format_file_blocks(files: List[FileOut]) -> str:
+    return "\n\n".join(f"// FILE: {f.name}\n```{f.language}\n{f.content}\n```" for f in files)
+
+
+ZIP_COMPRESSION_LEVEL = int(os.getenv("ZIP_COMPRESSION_LEVEL", "6"))
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target; zipfile falls back to data descriptors for it."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self._chunks = self._chunks, []
+        if chunks:
+            yield b"".join(chunks)
+
+
+def iter_zip(files: List[FileOut], compresslevel: Optional[int] = None) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``files`` piece by piece without building it in memory."""
+    level = ZIP_COMPRESSION_LEVEL if compresslevel is None else compresslevel
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
         for f in files:
-            zf.writestr(f.name, f.content)
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+            data = f.content.encode("utf-8")
+            with zf.open(f.name, "w") as dst:
+                for start in range(0, len(data), ZIP_CHUNK_SIZE):
+                    dst.write(data[start : start + ZIP_CHUNK_SIZE])
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def zip_base64(files: List[FileOut], compresslevel: Optional[int] = None) -> str:
+    return base64.b64encode(b"".join(iter_zip(files, compresslevel))).decode("utf-8")
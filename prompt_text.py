@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 SYSTEM_PROMPT = """You are a deterministic code generator. The repository is empty. Given two preprocessed C headers (OLD and NEW) and a Root struct name, output exactly four files that preserve version history and enable conversion via a generic superset. No prose. No external tools.
 Root selection (resilient):
 
@@ -68,3 +70,74 @@ NEW header:
 {new_header}
 ------------------- END NEW -------------------
 """
+
+
+REPAIR_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+Repair mode: part of this adapter was already generated. Return ONLY the files listed in the request, using the same output protocol, so that they fit the files that already exist. This overrides the four-file requirement."""
+
+
+def build_repair_prompt(root: str, missing: List[str], versioned_h: Optional[str], user_prompt: str) -> str:
+    request = f"Return only these files: {', '.join(missing)}\n"
+    if versioned_h is None:
+        # Without the versioned types the model needs the original headers.
+        return user_prompt + "\n" + request
+    return (
+        f"Task: Complete a partially generated adapter.\n\nRoot struct name: {root}\n\n{request}\n"
+        f"Already generated {root}_versioned.h:\n"
+        f"------------------ BEGIN {root}_versioned.h ------------------\n{versioned_h}\n"
+        f"------------------- END {root}_versioned.h -------------------\n"
+    )
+
+
+FRAGMENT_SYSTEM_PROMPT = """You are a deterministic code generator working on ONE changed C struct of a larger adapter. No prose.
+Given the struct's definition in each version, emit its versioned types and static converter helpers.
+
+Versioning rules:
+
+Emit one typedef per version named <Name>_V_<VERSION> with that version's fields, then <Name>_V_Gen (superset = union of fields).
+
+_V_Gen order: fields of the first version in order, then fields first seen in later versions in their order (skip duplicates).
+
+Renames: if a field is missing in a later version but a very similar name (normalized similarity >= 0.90) exists -> treat as rename; include both names in _V_Gen.
+
+Type conflicts: prefer wider/safer scalar; if ambiguous, keep both with suffixes __old/__new.
+
+Defaults: bool->false; ints/floats->0; pointers->NULL; enums->first enumerator. Targets are already zero-initialised.
+
+Sub-structs listed as changed must be referenced by their variant names (<Sub>_V_<VERSION>, <Sub>_V_Gen) and converted by calling copy_<Sub>_V_<FROM>_to_V_<TO>(&src->field, &dst->field). Other types are copied verbatim.
+
+Helpers: for every version implement exactly
+static void copy_<Name>_V_<VERSION>_to_V_Gen(const <Name>_V_<VERSION>* src, <Name>_V_Gen* dst);
+static void copy_<Name>_V_Gen_to_V_<VERSION>(const <Name>_V_Gen* src, <Name>_V_<VERSION>* dst);
+VERSION->GEN copies fields and mirrors rename pairs into both names; GEN->VERSION prefers the target's canonical name, falling back to the rename partner. No NULL checks, no heap, no includes.
+
+Output protocol (strict): Return exactly two code blocks, each preceded by a filename marker:
+
+// FILE: <Name>_types.h
+```c
+...typedefs...
+```
+
+// FILE: <Name>_convert.c
+```c
+...helpers...
+```"""
+
+
+def build_fragment_prompt(
+    name: str, versions: Dict[str, str], changed_subs: List[str], context: List[str]
+) -> str:
+    blocks = [
+        f"Struct name: {name}",
+        f"Versions in order: {', '.join(versions)}",
+        f"Changed sub-structs: {', '.join(changed_subs) if changed_subs else 'none'}",
+    ]
+    if context:
+        blocks.append("Unchanged types it uses:\n" + "\n\n".join(context))
+    for label, text in versions.items():
+        blocks.append(
+            f"{label} definition:\n------------------ BEGIN {label} ------------------\n"
+            f"{text}\n------------------- END {label} -------------------"
+        )
+    return "Task: Generate the versioned types and helpers for one struct.\n\n" + "\n\n".join(blocks) + "\n"
@@ -0,0 +1,75 @@
+"""Targeted repair of whole-adapter output that fails ``parse_llm_files``.
+
+Valid file blocks are kept and only the missing or malformed files are
+requested again, with ``<Root>_versioned.h`` as context, instead of
+regenerating the whole adapter.
+"""
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from metrics import stage
+from models import FileOut
+from parser_validator import (
+    FILE_ROLES,
+    format_file_blocks,
+    parse_llm_files,
+    role_file_name,
+    salvage_llm_files,
+)
+from prompt_text import REPAIR_SYSTEM_PROMPT, build_repair_prompt
+
+REPAIR_MAX_ATTEMPTS = int(os.getenv("REPAIR_MAX_ATTEMPTS", "2"))
+
+LLMCall = Callable[[str, str], Awaitable[str]]
+
+
+async def repair_files(
+    llm: LLMCall,
+    root: str,
+    user_prompt: str,
+    found: Dict[str, FileOut],
+    max_attempts: int = REPAIR_MAX_ATTEMPTS,
+) -> Tuple[List[FileOut], int]:
+    """Complete ``found`` (file blocks by role) and return the files plus the repair calls made."""
+    found = dict(found)
+    calls = 0
+    while True:
+        missing = [role for role in FILE_ROLES if role not in found]
+        if not missing:
+            with stage("parse"):
+                return parse_llm_files(format_file_blocks([found[role] for role in FILE_ROLES])), calls
+        if calls >= max_attempts:
+            raise HTTPException(status_code=422, detail="missing expected files after repair")
+        versioned = found.get("versioned")
+        # Keep the root spelling the model chose, which may differ after auto-discovery.
+        name = versioned.name[: -len("_versioned.h")] if versioned else root
+        prompt = build_repair_prompt(
+            name,
+            [role_file_name(role, name) for role in missing],
+            versioned.content if versioned else None,
+            user_prompt,
+        )
+        with stage("repair"):
+            reply = await llm(REPAIR_SYSTEM_PROMPT, prompt)
+        calls += 1
+        for role, f in salvage_llm_files(reply).items():
+            if role in missing:
+                found[role] = f
+
+
+async def generate_with_repair(
+    llm: LLMCall, system: str, user: str, root: str, max_attempts: int = REPAIR_MAX_ATTEMPTS
+) -> Tuple[List[FileOut], int]:
+    with stage("generate"):
+        text = await llm(system, user)
+    try:
+        with stage("parse"):
+            return parse_llm_files(text), 0
+    except HTTPException as e:
+        found = salvage_llm_files(text)
+        # Error comments (409) are answers, and with nothing salvageable a repair is a full regeneration.
+        if e.status_code != 422 or not found or max_attempts <= 0:
+            raise
+    return await repair_files(llm, root, user, found, max_attempts)
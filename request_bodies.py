@@ -0,0 +1,121 @@
+"""Compressed and multipart request bodies."""
+import email.parser
+import email.policy
+import io
+import zlib
+from typing import Callable, Dict
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def _zlib(wbits: int) -> Callable[[bytes, int], bytes]:
+    def decode(data: bytes, limit: int) -> bytes:
+        decoder = zlib.decompressobj(wbits)
+        try:
+            out = decoder.decompress(data, limit + 1)
+        except zlib.error as e:
+            raise HTTPException(status_code=400, detail=f"invalid compressed body: {e}")
+        if len(out) > limit:
+            raise HTTPException(status_code=413, detail="request body too large")
+        if not decoder.eof:
+            raise HTTPException(status_code=400, detail="invalid compressed body: truncated")
+        return out
+
+    return decode
+
+
+def _zstd(data: bytes, limit: int) -> bytes:
+    try:
+        import zstandard  # type: ignore
+    except ImportError:
+        raise HTTPException(status_code=415, detail="zstd bodies need the zstandard package on the server")
+    try:
+        out = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read(limit + 1)
+    except zstandard.ZstdError as e:
+        raise HTTPException(status_code=400, detail=f"invalid compressed body: {e}")
+    if len(out) > limit:
+        raise HTTPException(status_code=413, detail="request body too large")
+    return out
+
+
+DECODERS: Dict[str, Callable[[bytes, int], bytes]] = {
+    "gzip": _zlib(16 + zlib.MAX_WBITS),
+    "x-gzip": _zlib(16 + zlib.MAX_WBITS),
+    "deflate": _zlib(zlib.MAX_WBITS),
+    "zstd": _zstd,
+}
+
+
+class DecompressMiddleware:
+    """Decode ``Content-Encoding: gzip|deflate|zstd`` request bodies before routing.
+
+    Decoded bodies larger than ``max_size`` bytes are rejected with 413 so a
+    small compressed upload cannot expand without bound.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        encoding = dict(scope["headers"]).get(b"content-encoding", b"").decode("latin-1").strip().lower()
+        if encoding in ("", "identity"):
+            return await self.app(scope, receive, send)
+        try:
+            if encoding not in DECODERS:
+                raise HTTPException(status_code=415, detail=f"unsupported content encoding: {encoding}")
+            chunks = []
+            size = 0
+            more = True
+            while more:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_size:
+                    raise HTTPException(status_code=413, detail="request body too large")
+                chunks.append(chunk)
+                more = message.get("more_body", False)
+            body = await run_in_threadpool(DECODERS[encoding], b"".join(chunks), self.max_size)
+        except HTTPException as e:
+            return await JSONResponse({"detail": e.detail}, status_code=e.status_code)(scope, receive, send)
+
+        sent = False
+
+        async def decoded() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        headers.append((b"content-length", str(len(body)).encode()))
+        await self.app({**scope, "headers": headers}, decoded, send)
+
+
+def parse_form(content_type: str, body: bytes) -> Dict[str, str]:
+    """Text of each ``multipart/form-data`` part by field name; files are decoded as UTF-8."""
+    if not content_type.lower().startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="expected multipart/form-data")
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise HTTPException(status_code=400, detail="malformed multipart body")
+    fields: Dict[str, str] = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if not name:
+            continue
+        try:
+            fields[name] = (part.get_payload(decode=True) or b"").decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail=f"field {name} is not UTF-8 text")
+    return fields
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_backends import backend_identity
+from models import FileOut
+
+
+def normalize_prompt(text: str) -> str:
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(system: str, user: str, backend: str, model: Optional[str], temperature: float) -> str:
+    # Keyed on the model that answers (e.g. the resolved GGUF file), not on what the client asked for.
+    identity = repr(backend_identity(backend, model))
+    h = hashlib.sha256()
+    for part in (system, normalize_prompt(user), identity, repr(float(temperature))):
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def is_cacheable(temperature: float) -> bool:
+    return temperature == 0.0
+
+
+def _encode(files: List[FileOut]) -> bytes:
+    return json.dumps([f.model_dump() for f in files], separators=(",", ":")).encode("utf-8")
+
+
+def _decode(data: bytes) -> List[FileOut]:
+    return [FileOut(**item) for item in json.loads(data.decode("utf-8"))]
+
+
+def result_id(files: List[FileOut]) -> str:
+    return hashlib.sha256(_encode(files)).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional directory) cache of parsed generation results."""
+
+    SUFFIX = ".json"
+    _encode = staticmethod(_encode)
+    _decode = staticmethod(_decode)
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir).expanduser() if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def get(self, key: str) -> Optional[List[FileOut]]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._decode(data)
+        data = self._disk_read(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, data)
+        return self._decode(data)
+
+    def put(self, key: str, files: List[FileOut]) -> None:
+        data = self._encode(files)
+        with self._lock:
+            self._remember(key, data)
+        self._disk_write(key, data)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.disk_dir is not None
+        return self.disk_dir / key[:2] / f"{key}{self.SUFFIX}"
+
+    def _disk_entries(self) -> List[Tuple[Path, int, float]]:
+        assert self.disk_dir is not None
+        entries = []
+        for path in self.disk_dir.glob(f"*/*{self.SUFFIX}"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _disk_read(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _disk_write(self, key: str, data: bytes) -> None:
+        if self.disk_dir is None or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            existing = path.stat().st_size if path.exists() else 0
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - existing
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = sorted(self._disk_entries(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.disk_evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+            self.evictions = self.disk_evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_enabled": self.disk_dir is not None,
+                "disk_bytes": self._disk_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+result_cache = ResultCache(
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    disk_dir=os.getenv("RESULT_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))),
+)
+
+# Generated file sets by content id, for downloads via GET /results/{id}.zip.
+result_store = ResultCache(
+    max_bytes=int(os.getenv("RESULT_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+    disk_dir=os.getenv("RESULT_STORE_DIR") or None,
+    disk_max_bytes=int(os.getenv("RESULT_STORE_DISK_MAX_BYTES", str(512 * 1024 * 1024))),
+)
@@ -0,0 +1,233 @@
+"""Prompt-size estimation and the ``auto`` backend that routes by size and load.
+
+Token counts come from ``tiktoken`` (OpenAI's tokenizer) when it is installed
+and otherwise from a deliberately pessimistic characters-per-token ratio (C
+headers tokenize densely). Local llama.cpp models use their own tokenizers,
+which can split the same text into more tokens, so their context is checked
+with a safety margin on top of the estimate.
+"""
+import asyncio
+import functools
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from admission import admission
+from llm_backends import (
+    LOCAL_BACKEND_NAMES,
+    LLMClient,
+    LLMError,
+    backend_identity,
+    get_backend,
+    llama_context_tokens,
+    parse_target,
+    register_backend,
+)
+
+CHARS_PER_TOKEN = float(os.getenv("ROUTE_CHARS_PER_TOKEN", "3.0"))
+# Generated files are roughly as large as the headers they are built from.
+OUTPUT_TOKENS_RATIO = float(os.getenv("ROUTE_OUTPUT_TOKENS_RATIO", "1.0"))
+MIN_OUTPUT_TOKENS = int(os.getenv("ROUTE_MIN_OUTPUT_TOKENS", "1024"))
+LOCAL_TOKEN_MARGIN = float(os.getenv("ROUTE_LOCAL_TOKEN_MARGIN", "1.25"))
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding() -> Any:
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(os.getenv("ROUTE_TOKENIZER", "o200k_base"))
+
+
+@functools.lru_cache(maxsize=16)
+def estimate_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def context_tokens(name: str) -> Optional[int]:
+    """Context window of backend ``name``, or ``None`` when it is unknown."""
+    if name in LOCAL_BACKEND_NAMES:
+        return llama_context_tokens()
+    limit = os.getenv(f"{name.upper().replace('-', '_')}_CONTEXT_TOKENS")
+    if limit:
+        return int(limit)
+    if name == "openai":
+        return 400_000
+    return None
+
+
+def needed_tokens(system: str, user: str) -> Tuple[int, int]:
+    """Estimated prompt tokens and prompt plus expected output tokens."""
+    prompt = estimate_tokens(system) + estimate_tokens(user)
+    return prompt, prompt + max(MIN_OUTPUT_TOKENS, int(estimate_tokens(user) * OUTPUT_TOKENS_RATIO))
+
+
+def fits(name: str, total_tokens: int) -> bool:
+    limit = context_tokens(name)
+    if limit is not None and name in LOCAL_BACKEND_NAMES:
+        # The estimate is not in the local model's tokens.
+        total_tokens = math.ceil(total_tokens * LOCAL_TOKEN_MARGIN)
+    return limit is None or total_tokens <= limit
+
+
+def check_prompt(name: str, system: str, user: str) -> int:
+    """Reject a prompt that cannot fit the backend's context; return its estimated tokens."""
+    prompt, total = needed_tokens(system, user)
+    if name == "auto":
+        ok = any(fits(target.name, total) for target in auto_targets())
+    else:
+        ok = fits(name, total)
+    if not ok:
+        raise HTTPException(
+            status_code=413,
+            detail=f"prompt needs ~{total} tokens with output, more than the {name} backend's context",
+        )
+    return prompt
+
+
+class _Target:
+    def __init__(self, spec: str):
+        spec, _, max_tokens = spec.strip().partition("@")
+        self.name, self.model = parse_target(spec)
+        # Above this many prompt tokens the target is only used when nothing else fits.
+        self.max_prompt_tokens = int(max_tokens) if max_tokens else None
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}:{self.model}" if self.model else self.name
+
+
+def auto_targets() -> List[_Target]:
+    """``ROUTE_BACKENDS``: ``backend[:model][@max_prompt_tokens]`` entries, cheapest first."""
+    return [_Target(spec) for spec in os.getenv("ROUTE_BACKENDS", "local@6000,openai").split(",") if spec.strip()]
+
+
+class RouteStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.in_flight: Dict[str, int] = {}
+            self.routed: Dict[str, int] = {}
+            self.rejected = 0
+            # Routed calls still loading their backend, by admission name; not yet visible to admission.
+            self.pending: Dict[str, int] = {}
+
+    def enter(self, label: str) -> None:
+        with self._lock:
+            self.in_flight[label] = self.in_flight.get(label, 0) + 1
+            self.routed[label] = self.routed.get(label, 0) + 1
+
+    def exit(self, label: str) -> None:
+        with self._lock:
+            self.in_flight[label] -= 1
+
+    def depth(self, label: str) -> int:
+        with self._lock:
+            return self.in_flight.get(label, 0)
+
+    def add_pending(self, name: str, delta: int) -> None:
+        with self._lock:
+            self.pending[name] = self.pending.get(name, 0) + delta
+
+    def pending_calls(self, name: str) -> int:
+        with self._lock:
+            return self.pending.get(name, 0)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": dict(self.in_flight), "routed": dict(self.routed), "rejected": self.rejected}
+
+
+route_stats = RouteStats()
+
+
+class AutoLLM(LLMClient):
+    """Sends each prompt to the first target, cheapest first, that fits and is not overloaded.
+
+    A target is skipped when the prompt plus expected output exceeds its
+    context, when the prompt is above its ``@max_prompt_tokens`` preference,
+    or when it already has ``max_in_flight`` calls running or queued, whether
+    they came through ``auto`` or not. If every target that fits is skipped for
+    size or load, the least loaded one that fits is used.
+    """
+
+    composite = True
+
+    def __init__(self, targets: List[_Target], max_in_flight: int = 2, stats: RouteStats = route_stats):
+        super().__init__("auto")
+        self.targets = targets
+        self.max_in_flight = max_in_flight
+        self.stats = stats
+        self.routed: Optional[str] = None
+
+    def choose(self, system: str, user: str) -> _Target:
+        prompt, total = needed_tokens(system, user)
+        fitting = [t for t in self.targets if fits(t.name, total)]
+        if not fitting:
+            self.stats.reject()
+            raise LLMError(f"prompt needs ~{total} tokens, more than any routed backend's context")
+        for target in fitting:
+            if target.max_prompt_tokens is not None and prompt > target.max_prompt_tokens:
+                continue
+            if self.load(target) < self.max_in_flight:
+                return target
+        return min(fitting, key=self.load)
+
+    def load(self, target: _Target) -> int:
+        limiter = admission.limiter(target.name)
+        stats = limiter.stats()
+        return stats["in_flight"] + stats["queue_depth"] + self.stats.pending_calls(limiter.name)
+
+    async def agenerate(self, system: str, user: str) -> str:
+        target = self.choose(system, user)
+        name = admission.limiter(target.name).name
+        self.routed = target.label
+        self.stats.enter(target.label)
+        self.stats.add_pending(name, 1)
+        try:
+            try:
+                backend = await asyncio.get_running_loop().run_in_executor(
+                    None, get_backend, target.name, target.model, self.temperature
+                )
+            finally:
+                # Taking the slot below does not yield before the call shows up in the limiter's stats.
+                self.stats.add_pending(name, -1)
+            async with admission.slot(target.name):
+                text = await backend.agenerate(system, user)
+        finally:
+            self.stats.exit(target.label)
+        self.last_usage = backend.last_usage
+        return text
+
+    def generate(self, system: str, user: str) -> str:
+        return asyncio.run(self.agenerate(system, user))
+
+    def with_temperature(self, temperature: float) -> "LLMClient":
+        clone = super().with_temperature(temperature)
+        clone.routed = None
+        return clone
+
+
+def _auto_from_env(model: Optional[str]) -> AutoLLM:
+    return AutoLLM(auto_targets(), max_in_flight=int(os.getenv("ROUTE_MAX_IN_FLIGHT", "2")))
+
+
+def _auto_identity(model: Optional[str]) -> Tuple[Any, ...]:
+    return tuple(backend_identity(t.name, t.model) for t in auto_targets())
+
+
+register_backend("auto", _auto_from_env, identity=_auto_identity)
@@ -8,14 +8,17 @@ checks operate on the exact same payload and response expectations.
 from __future__ import annotations
 
 import argparse
+import gzip
+import hashlib
 import json
 import os
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping
 
 import requests
 
 DEFAULT_API_URL = "http://localhost:8000/generate"
+DEFAULT_BATCH_URL = "http://localhost:8000/generate/batch"
 
 
 def build_payload(
@@ -51,14 +54,78 @@ def build_payload(
     return payload
 
 
-def call_generator(url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Invoke the generator endpoint and return the parsed JSON body."""
+def call_generator(url: str, payload: Dict[str, Any], *, compress: bool = False) -> Dict[str, Any]:
+    """Invoke the generator endpoint and return the parsed JSON body.
 
-    response = requests.post(url, json=payload, timeout=120)
+    With ``compress`` the JSON body is sent gzip-encoded, which shrinks large
+    headers several times over on slow links.
+    """
+
+    if compress:
+        body = gzip.compress(json.dumps(payload).encode("utf-8"))
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        response = requests.post(url, data=body, headers=headers, timeout=120)
+    else:
+        response = requests.post(url, json=payload, timeout=120)
     response.raise_for_status()
     return response.json()
 
 
+def upload_header(base_url: str, path: Path | str) -> str:
+    """Store a header with ``PUT /headers`` unless the server already has it.
+
+    Returns the ref to send as ``old_header_ref``/``new_header_ref``.  The ref
+    is the SHA-256 of the file bytes, so an unchanged header is never sent
+    twice.
+    """
+
+    data = Path(path).expanduser().resolve().read_bytes()
+    ref = hashlib.sha256(data).hexdigest()
+    base_url = base_url.rstrip("/")
+    if requests.get(f"{base_url}/headers/{ref}", timeout=30).status_code == 200:
+        return ref
+    response = requests.put(f"{base_url}/headers", data=data, timeout=120)
+    response.raise_for_status()
+    return response.json()["ref"]
+
+
+def build_batch_payload(payloads: Iterable[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Bundle single-request payloads into one ``/generate/batch`` body.
+
+    Header texts are sent once in the batch-level ``headers`` table and jobs
+    refer to them by name, so hundreds of roots sharing a header pair do not
+    re-upload it for every job.
+    """
+
+    headers: Dict[str, str] = {}
+    names: Dict[str, str] = {}
+    jobs: List[Dict[str, Any]] = []
+    for payload in payloads:
+        job = dict(payload)
+        for side in ("old", "new"):
+            text = job.pop(f"{side}_header")
+            if text not in names:
+                names[text] = f"h{len(names)}"
+                headers[names[text]] = text
+            job[f"{side}_header_ref"] = names[text]
+        jobs.append(job)
+    return {"headers": headers, "jobs": jobs}
+
+
+def call_generator_batch(url: str, payloads: Iterable[Mapping[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Invoke the batch endpoint and yield per-job results as they finish.
+
+    Each item carries the job ``index`` and ``status``; successful jobs hold the
+    usual response body under ``result`` and failed ones a ``detail`` message.
+    """
+
+    with requests.post(url, json=build_batch_payload(payloads), timeout=None, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
 def format_response_summary(data: Dict[str, Any]) -> Iterable[str]:
     """Yield human-readable lines that describe the generator result."""
 
@@ -132,6 +199,11 @@ def build_cli_parser(
         action="store_true",
         help="Skip requesting the base64 zip payload in the response",
     )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Send the request body gzip-compressed",
+    )
     parser.add_argument(
         "--dump-json",
         type=Path,
@@ -177,7 +249,7 @@ def main(
         return 1
 
     try:
-        data = call_generator(args.url, payload)
+        data = call_generator(args.url, payload, compress=args.gzip)
     except Exception as exc:
         print(f"[error] generator request failed: {exc}")
         return 1
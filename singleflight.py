@@ -0,0 +1,68 @@
+"""Coalescing of identical concurrent calls onto one in-flight task."""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Call:
+    task: "asyncio.Future[Any]"
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key share it.
+
+    Every waiter gets the shared result or exception. A waiter that is
+    cancelled only detaches; the shared call is cancelled once nobody waits.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.peak_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self.leaders += 1
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        self.peak_waiters = max(self.peak_waiters, call.waiters)
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+                # Let the cancellation reach the backend call before the last waiter returns.
+                await asyncio.gather(call.task, return_exceptions=True)
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def clear(self) -> None:
+        self.leaders = self.coalesced = self.peak_waiters = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "waiters": sum(call.waiters for call in self._calls.values()),
+            "calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / total if total else 0.0,
+            "peak_waiters": self.peak_waiters,
+        }
+
+
+generation_flight = SingleFlight()
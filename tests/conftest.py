@@ -0,0 +1,64 @@
+import pytest
+
+from admission import admission
+from deadlines import cancel_stats
+from header_store import header_store
+from hedging import hedge_stats
+from incremental import fragment_cache
+from llm_backends import registry
+from metrics import clear_metrics
+from result_cache import result_cache, result_store
+from routing import route_stats
+from singleflight import generation_flight
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared_state():
+    registry.clear()
+    result_cache.clear()
+    result_store.clear()
+    fragment_cache.clear()
+    generation_flight.clear()
+    header_store.clear()
+    clear_metrics()
+    hedge_stats.clear()
+    route_stats.clear()
+    admission.clear()
+    cancel_stats.clear()
+    yield
+    registry.clear()
+    result_cache.clear()
+    result_store.clear()
+    fragment_cache.clear()
+    generation_flight.clear()
+    header_store.clear()
+    clear_metrics()
+    hedge_stats.clear()
+    route_stats.clear()
+    admission.clear()
+    cancel_stats.clear()
+
+
+@pytest.fixture(autouse=True)
+def _job_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+
+
+@pytest.fixture
+def fake_cloud(monkeypatch):
+    """Replace CloudLLM's network calls with sync fakes on both the sync and async paths."""
+    from llm_backends import CloudLLM, LLMClient, stream_in_thread
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    def install(generate=None, stream=None):
+        if generate is not None:
+            monkeypatch.setattr(CloudLLM, "generate", generate)
+            monkeypatch.setattr(CloudLLM, "agenerate", LLMClient.agenerate)
+        if stream is not None:
+            monkeypatch.setattr(CloudLLM, "stream", stream)
+            monkeypatch.setattr(
+                CloudLLM, "astream", lambda self, system, user: stream_in_thread(None, lambda: self.stream(system, user))
+            )
+
+    return install
@@ -0,0 +1,116 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from adapter_engine import AdapterPlan, Ambiguity, generate_native
+from app import app
+
+FIXTURES = Path(__file__).parent / "fixtures"
+OLD = (FIXTURES / "old_header.h").read_text()
+NEW = (FIXTURES / "new_header.h").read_text()
+
+ENUM_HEADER = """
+typedef enum { MODE_A = 2, MODE_B } Mode;
+typedef struct Leaf { unsigned char data[4]; } Leaf;
+typedef struct { Leaf leaves[2]; char *name; union { int i; float f; } u; } Root;
+"""
+ENUM_HEADER_NEW = ENUM_HEADER.replace("unsigned char data[4];", "unsigned char data[4]; Mode mode;")
+
+
+def test_fixture_pair_is_mechanical():
+    files = {f.name: f.content for f in generate_native("ExamplePort", OLD, NEW)}
+    assert list(files) == [
+        "ExamplePort_versioned.h",
+        "Converter_ExamplePort.h",
+        "Converter_ExamplePort.cpp",
+        "converters.cpp",
+    ]
+    header = files["ExamplePort_versioned.h"]
+    assert "#ifndef EXAMPLEPORT_VERSIONED_H" in header
+    gen = header.split("typedef struct SampleInner_V_Gen {")[1].split("}")[0]
+    assert [line.strip() for line in gen.strip().splitlines()] == ["int value;", "int count;", "int total;"]
+    assert "SampleInner_V_Gen inner;" in header
+    converter_h = files["Converter_ExamplePort.h"]
+    for signature in (
+        "int convert_ExamplePort_V_Gen_to_V_OLD(const ExamplePort_V_Gen* src, ExamplePort_V_OLD* dst);",
+        "int convert_ExamplePort_V_Gen_to_V_NEW(const ExamplePort_V_Gen* src, ExamplePort_V_NEW* dst);",
+        "int convert_ExamplePort_V_OLD_to_V_Gen(const ExamplePort_V_OLD* src, ExamplePort_V_Gen* dst);",
+        "int convert_ExamplePort_V_NEW_to_V_Gen(const ExamplePort_V_NEW* src, ExamplePort_V_Gen* dst);",
+    ):
+        assert signature in converter_h
+    assert "return -1;" in files["Converter_ExamplePort.cpp"]
+
+
+def test_unchanged_types_are_emitted_once_and_enums_defaulted():
+    files = {f.name: f.content for f in generate_native("Root", ENUM_HEADER, ENUM_HEADER_NEW)}
+    header = files["Root_versioned.h"]
+    assert header.count("typedef enum { MODE_A = 2, MODE_B } Mode;") == 1
+    assert "Leaf_V_Gen leaves[2];" in header
+    assert "dst->mode = MODE_A;" in files["Converter_Root.cpp"]
+
+
+@pytest.mark.parametrize(
+    "old, new, reason",
+    [
+        ("typedef struct { int speed_limit; } R;", "typedef struct { int speedlimit; } R;", "rename"),
+        ("typedef struct { int x; } R;", "typedef struct { float x; } R;", "type conflict"),
+        (
+            "typedef enum { A, B } E; typedef struct { E e; } R;",
+            "typedef enum { A, C, B } E; typedef struct { E e; } R;",
+            "enum E",
+        ),
+        ("typedef struct { int x; } Other;", "typedef struct { int x; } R;", "not found in OLD"),
+    ],
+)
+def test_judgment_calls_are_reported(old, new, reason):
+    with pytest.raises(Ambiguity) as exc:
+        generate_native("R", old, new)
+    assert reason in str(exc.value)
+
+
+def test_ambiguity_is_scoped_to_struct():
+    old = "typedef struct { int speed_limit; } A; typedef struct { int x; } B; typedef struct { A a; B b; } R;"
+    new = "typedef struct { int speedlimit; } A; typedef struct { int y; } B; typedef struct { A a; B b; } R;"
+    plan = AdapterPlan("R", [("OLD", old), ("NEW", new)])
+    assert plan.ambiguous_structs() == ["A"]
+    assert not plan.blockers
+
+
+@pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not available")
+def test_native_output_compiles(tmp_path):
+    for f in generate_native("Root", ENUM_HEADER, ENUM_HEADER_NEW):
+        (tmp_path / f.name).write_text(f.content)
+    for source in ("Converter_Root.cpp", "converters.cpp"):
+        subprocess.run(["g++", "-Wall", "-Werror", "-c", source], cwd=tmp_path, check=True)
+
+
+def test_api_engine_selection(fake_cloud):
+    calls = []
+
+    def fake_generate(self, system, user):
+        calls.append(user)
+        return (
+            "// FILE: R_versioned.h\n```c\nv1\n```\n"
+            "// FILE: Converter_R.h\n```c\nv2\n```\n"
+            "// FILE: Converter_R.cpp\n```cpp\nv3\n```\n"
+            "// FILE: converters.cpp\n```cpp\nv4\n```"
+        )
+
+    fake_cloud(generate=fake_generate)
+    client = TestClient(app)
+    payload = {"root": "ExamplePort", "old_header": OLD, "new_header": NEW}
+    data = client.post("/generate", json=payload).json()
+    assert data["engine"] == "native" and not calls
+
+    rename = {
+        "root": "R",
+        "old_header": "typedef struct { int speed_limit; } R;",
+        "new_header": "typedef struct { int speedlimit; } R;",
+    }
+    resp = client.post("/generate", json={**rename, "engine": "native"})
+    assert resp.status_code == 422 and "rename" in resp.json()["detail"]
+    data = client.post("/generate", json=rename).json()
+    assert data["engine"] == "llm" and len(calls) == 1
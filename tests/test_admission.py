@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from admission import AdaptiveLimiter, Overloaded, admission
+from app import app
+from llm_backends import BackendBusy
+
+FIXTURES = Path(__file__).parent / "fixtures"
+FOUR_FILES = (
+    "// FILE: ExamplePort_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_ExamplePort.h\n```c\nv2\n```\n"
+    "// FILE: Converter_ExamplePort.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+def test_limit_grows_when_saturated_and_halves_on_overload():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=2, max_limit=8)
+        for _ in range(8):
+            await limiter.acquire()
+            await limiter.acquire()
+            limiter.release(0.1)
+            limiter.release(0.1)
+        grown = limiter.limit
+        assert grown > 2
+        await limiter.acquire()
+        limiter.release(None, overloaded=True)
+        return grown, limiter.limit
+
+    grown, shrunk = asyncio.run(scenario())
+    assert shrunk == pytest.approx(grown / 2)
+
+
+def test_slot_wait_is_bounded_by_timeout():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1, queue_timeout=5)
+        await limiter.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            async with limiter.slot(timeout=0.05):
+                pass
+        limiter.release(0.1)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+
+def test_interactive_waiters_go_first_and_full_queue_fails_fast():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1, queue_size=2, queue_timeout=5)
+        await limiter.acquire()
+        order = []
+
+        async def wait(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release(0.01)
+
+        batch = asyncio.create_task(wait("batch", 1))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(wait("interactive", 0))
+        await asyncio.sleep(0)
+        # The queue is full: another batch call is refused, an interactive one displaces the queued batch.
+        with pytest.raises(Overloaded):
+            await limiter.acquire(1)
+        late = asyncio.create_task(wait("late", 0))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await batch
+        limiter.release(0.01)
+        await asyncio.gather(interactive, late)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["interactive", "late"]
+    assert stats["rejected"] == 2 and stats["in_flight"] == 0
+
+
+def test_queue_timeout_is_a_fast_503(fake_cloud, monkeypatch):
+    monkeypatch.setenv("ADMISSION_QUEUE_TIMEOUT", "0.05")
+    fake_cloud(generate=lambda self, system, user: pytest.fail("backend should not be called"))
+    limiter = admission.limiter("openai")
+    limiter.in_flight = int(limiter.limit)  # every slot is taken
+    payload = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+    client = TestClient(app)
+    resp = client.post("/generate", json=payload)
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert client.get("/backends/stats").json()["admission"]["openai"]["timed_out"] == 1
+    assert client.post("/generate", json=payload, headers={"X-Priority": "urgent"}).status_code == 400
+
+
+def test_backend_overload_shrinks_the_limit(fake_cloud):
+    def busy(self, system, user):
+        raise BackendBusy("rate limited")
+
+    fake_cloud(generate=busy)
+    payload = {"root": "ExamplePort", "old_header": "typedef struct { int a; } ExamplePort;", "engine": "llm"}
+    payload["new_header"] = payload["old_header"].replace("int a;", "int a; int b;")
+    before = admission.limiter("openai").limit
+    resp = TestClient(app).post("/generate", json=payload)
+    assert resp.status_code == 503
+    stats = admission.stats()["openai"]
+    assert stats["overloads"] == 1 and stats["limit"] < before
+
+
+def test_batch_jobs_wait_for_a_busy_backend(fake_cloud, monkeypatch):
+    monkeypatch.setenv("ADMISSION_QUEUE_TIMEOUT", "0.05")
+    monkeypatch.setenv("OPENAI_MAX_CONCURRENCY", "1")
+
+    def slow(self, system, user):
+        time.sleep(0.3)
+        return FOUR_FILES
+
+    fake_cloud(generate=slow)
+    job = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+    body = {"jobs": [{**job, "temperature": 0.5}, {**job, "temperature": 0.6}]}
+    resp = TestClient(app).post("/generate/batch", json=body)
+    assert [json.loads(line)["status"] for line in resp.text.splitlines()] == [200, 200]
+    assert admission.stats()["openai"]["timed_out"] == 0
@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+
+from app import app
+from llm_backends import CloudLLM, stream_in_thread
+
+FOUR_FILES = (
+    "// FILE: Root_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_Root.h\n```c\nv2\n```\n"
+    "// FILE: Converter_Root.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+def test_generations_overlap_on_one_worker(monkeypatch):
+    active = []
+    peak = []
+
+    async def fake_agenerate(self, system, user):
+        active.append(user)
+        peak.append(len(active))
+        await asyncio.sleep(0.05)
+        active.pop()
+        return FOUR_FILES
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(CloudLLM, "agenerate", fake_agenerate)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payloads = [
+                {"root": "Root", "old_header": f"struct Root {{ int a{i}; }};", "new_header": "struct Root { int b; };",
+                 "engine": "llm"}
+                for i in range(4)
+            ]
+            return await asyncio.gather(*(client.post("/generate", json=p) for p in payloads))
+
+    responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 4
+    assert max(peak) == 4
+
+
+def test_stream_in_thread_propagates_errors():
+    def produce():
+        yield "a"
+        raise RuntimeError("boom")
+
+    async def run():
+        chunks = []
+        try:
+            async for chunk in stream_in_thread(None, produce):
+                chunks.append(chunk)
+        except RuntimeError as e:
+            return chunks, str(e)
+
+    assert asyncio.run(run()) == (["a"], "boom")
@@ -0,0 +1,112 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+import pytest
+
+from llm_backends import BackendRegistry, CloudLLM, LLMError, LocalLlamaLLM, get_backend, registry
+
+
+class _FakeLlama:
+    instances = 0
+
+    def __init__(self, model_path, **kwargs):
+        type(self).instances += 1
+        self.model_path = model_path
+
+
+@pytest.fixture
+def fake_llama(monkeypatch):
+    module = ModuleType("llama_cpp")
+    _FakeLlama.instances = 0
+    module.Llama = _FakeLlama
+    monkeypatch.setitem(sys.modules, "llama_cpp", module)
+    return _FakeLlama
+
+
+def test_local_model_is_loaded_once_across_requests(tmp_path, fake_llama):
+    model = tmp_path / "model.gguf"
+    model.write_text("dummy")
+    first = get_backend("local", str(model), 0.0)
+    second = get_backend("local-llama", str(model), 0.7)
+    assert fake_llama.instances == 1
+    assert first._client is second._client
+    assert (first.temperature, second.temperature) == (0.0, 0.7)
+    stats = registry.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["loads"] == 1
+
+
+def test_cloud_client_is_shared(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    first = get_backend("openai", "gpt-5", 0.0)
+    second = get_backend("openai", "gpt-5", 0.2)
+    assert isinstance(first, CloudLLM)
+    assert first.client is second.client
+    assert first is not second
+
+
+def test_registry_evicts_least_recently_used(tmp_path, fake_llama):
+    reg = BackendRegistry(max_resident=2)
+    paths = []
+    for idx in range(3):
+        path = tmp_path / f"m{idx}.gguf"
+        path.write_text("dummy")
+        paths.append(str(path))
+    reg.get("local", paths[0], 0.0)
+    reg.get("local", paths[1], 0.0)
+    reg.get("local", paths[0], 0.0)
+    reg.get("local", paths[2], 0.0)
+    assert reg.stats()["evictions"] == 1
+    reg.get("local", paths[0], 0.0)
+    assert fake_llama.instances == 3
+    reg.get("local", paths[1], 0.0)
+    assert fake_llama.instances == 4
+
+
+def test_failed_construction_is_not_cached(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(LLMError):
+        get_backend("openai", "gpt-5", 0.0)
+    assert registry.stats()["resident"] == 0
+    with pytest.raises(ValueError):
+        get_backend("bogus", None, 0.0)
+
+
+def test_direct_construction_stays_lazy(tmp_path, fake_llama):
+    model = tmp_path / "model.gguf"
+    model.write_text("dummy")
+    llm = LocalLlamaLLM(model=str(model))
+    assert llm._client is None
+    assert fake_llama.instances == 0
+
+
+def test_failed_loads_leave_no_key_locks(tmp_path, fake_llama):
+    reg = BackendRegistry(max_resident=2)
+    for idx in range(3):
+        with pytest.raises(LLMError):
+            reg.get("local", str(tmp_path / f"missing{idx}.gguf"), 0.0)
+    assert reg._key_locks == {}
+
+
+def test_shared_local_model_runs_one_generation_at_a_time(tmp_path, monkeypatch):
+    class _Counting(_FakeLlama):
+        active = peak = 0
+
+        def create_chat_completion(self, messages, temperature, **kwargs):
+            type(self).active += 1
+            type(self).peak = max(type(self).peak, type(self).active)
+            time.sleep(0.02)
+            type(self).active -= 1
+            return {"choices": [{"message": {"content": "ok"}}]}
+
+    module = ModuleType("llama_cpp")
+    module.Llama = _Counting
+    monkeypatch.setitem(sys.modules, "llama_cpp", module)
+    monkeypatch.setenv("LLAMA_PREFIX_CACHE", "0")
+    model = tmp_path / "model.gguf"
+    model.write_text("dummy")
+    reg = BackendRegistry()
+    with ThreadPoolExecutor(4) as pool:
+        texts = list(pool.map(lambda t: reg.get("local", str(model), t).generate("s", "u"), [0.0, 0.1, 0.2, 0.3]))
+    assert texts == ["ok"] * 4 and _Counting.peak == 1
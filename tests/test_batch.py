@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import app
+from scripts.run_generator import build_batch_payload
+
+FIXTURES = Path(__file__).parent / "fixtures"
+FOUR_FILES = (
+    "// FILE: ExamplePort_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_ExamplePort.h\n```c\nv2\n```\n"
+    "// FILE: Converter_ExamplePort.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+def _job(**overrides):
+    job = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+    }
+    job.update(overrides)
+    return job
+
+
+def test_batch_payload_sends_each_header_once():
+    body = build_batch_payload([_job(), _job(root="Other"), _job(new_header="struct X { int a; };")])
+    assert len(body["headers"]) == 3
+    assert [j["old_header_ref"] for j in body["jobs"]] == ["h0", "h0", "h0"]
+    assert "old_header" not in body["jobs"][0]
+
+
+def test_batch_streams_per_job_results(fake_cloud):
+    calls = []
+
+    def fake_generate(self, system, user):
+        calls.append(user)
+        return FOUR_FILES
+
+    fake_cloud(generate=fake_generate)
+    jobs = [
+        _job(engine="llm", temperature=0.5),
+        _job(engine="native"),
+        _job(root="Missing", engine="native"),
+        _job(engine="llm", temperature=0.5),
+    ]
+    body = build_batch_payload(jobs)
+    body["jobs"].append({"root": "ExamplePort", "old_header_ref": "nope", "new_header_ref": "h1"})
+    resp = TestClient(app).post("/generate/batch", json=body)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted((json.loads(line) for line in resp.text.splitlines()), key=lambda item: item["index"])
+    assert [item["status"] for item in lines] == [200, 200, 422, 200, 400]
+    assert lines[0]["result"]["engine"] == "llm" and lines[1]["result"]["engine"] == "native"
+    assert lines[0]["result"] == lines[3]["result"]
+    # Identical jobs share one generation even without the result cache.
+    assert len(calls) == 1
+
+
+def test_batch_rejects_empty_input():
+    assert TestClient(app).post("/generate/batch", json={"jobs": []}).status_code == 400
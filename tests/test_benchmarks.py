@@ -0,0 +1,24 @@
+import asyncio
+
+from app import MAX_HEADER_LEN
+from benchmarks.run import percentile, run_benchmark
+from benchmarks.synthetic import synthetic_headers
+from c_decls import parse_header
+
+
+def test_synthetic_headers_respect_size_and_change_rate():
+    root, old, new = synthetic_headers(structs=2000, max_len=MAX_HEADER_LEN)
+    assert len(old) <= MAX_HEADER_LEN and len(new) <= MAX_HEADER_LEN
+    assert parse_header(old).find_struct(root) is not None
+    _, same_old, same_new = synthetic_headers(structs=5, change_rate=0.0)
+    assert same_old == same_new
+
+
+def test_benchmark_reports_latency_and_stages():
+    data = asyncio.run(run_benchmark(requests=6, concurrency=3, latency=0.001, structs=4))
+    results = data["results"]
+    assert results["errors"] == 0 and results["engines"] == {"llm": 6}
+    assert results["throughput_rps"] > 0
+    assert set(results["latency_ms"]) == {"p50", "p95", "p99", "mean", "max"}
+    assert "generate" in results["stages_ms"] and "load" in results["peak_rss_kb"]
+    assert percentile([1, 2, 3, 4], 0.5) == 2
@@ -0,0 +1,88 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import app
+from c_decls import normalize_header, parse_header, prune_header
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+NOISY_HEADER = """
+# 1 "/usr/include/stdint.h" 1 3 4
+typedef unsigned int uint32_t;
+typedef unsigned long size_t;
+extern void *memcpy(void *dest, const void *src, size_t n);
+static inline int clamp(int v) { return v < 0 ? 0 : v; }
+typedef struct { int unrelated; } Other;
+typedef enum { MODE_OFF, MODE_ON = 3 } Mode; /* comment */
+struct Node { struct Node *next; };
+typedef struct Node Node;
+typedef struct Inner {
+    uint32_t a, *b, c[2];
+    Mode mode;
+} __attribute__((packed)) Inner;
+typedef struct {
+    Inner inner; // trailing comment
+    Node *head;
+} Root;
+"""
+
+
+def test_parse_fields_and_closure():
+    header = parse_header(NOISY_HEADER)
+    inner = header.find_struct("Inner")
+    assert [(f.name, f.type, f.array) for f in inner.fields] == [
+        ("a", "uint32_t", ""),
+        ("b", "uint32_t *", ""),
+        ("c", "uint32_t", "[2]"),
+        ("mode", "Mode", ""),
+    ]
+    names = [d.name for d in header.closure("Root")]
+    assert names == ["uint32_t", "Mode", "Node", "Node", "Inner", "Root"]
+
+
+def test_prune_drops_unreachable_declarations():
+    pruned = prune_header(NOISY_HEADER, "Root")
+    assert "Other" not in pruned
+    assert "memcpy" not in pruned and "clamp" not in pruned and "size_t" not in pruned
+    assert "struct Node { struct Node *next; };" in pruned
+    assert prune_header(NOISY_HEADER, "Missing") is None
+
+
+def test_generate_reports_pruned_sizes(fake_cloud):
+    prompts = []
+
+    def fake_generate(self, system, user):
+        prompts.append(user)
+        return (
+            "// FILE: Root_versioned.h\n```c\nv1\n```\n"
+            "// FILE: Converter_Root.h\n```c\nv2\n```\n"
+            "// FILE: Converter_Root.cpp\n```cpp\nv3\n```\n"
+            "// FILE: converters.cpp\n```cpp\nv4\n```"
+        )
+
+    fake_cloud(generate=fake_generate)
+    client = TestClient(app)
+    payload = {"root": "Root", "old_header": NOISY_HEADER, "new_header": NOISY_HEADER, "engine": "llm"}
+    stats = client.post("/generate", json=payload).json()["header_stats"]
+    assert stats["pruned"] is True
+    assert stats["old_pruned"] < stats["old_original"] == len(normalize_header(NOISY_HEADER))
+    assert "memcpy" not in prompts[-1]
+
+    payload["prune_headers"] = False
+    stats = client.post("/generate", json=payload).json()["header_stats"]
+    assert stats["pruned"] is False and stats["old_pruned"] == stats["old_original"]
+    assert "memcpy" in prompts[-1]
+
+
+def test_fixture_headers_keep_every_struct():
+    for name in ("old_header.h", "new_header.h"):
+        text = (FIXTURES / name).read_text()
+        pruned = prune_header(text, "ExamplePort")
+        assert "SampleInner" in pruned and "ExamplePort" in pruned
+
+
+def test_normalize_header_drops_noise_but_keeps_literals():
+    text = '# 1 "a.h"\n/* doc\n   block */\ntypedef  struct {   // x\n\n\n    int   a;\n    const char *s = "a  /* b */";\n} R;\n'
+    assert normalize_header(text) == 'typedef struct {\nint a;\nconst char *s = "a  /* b */";\n} R;\n'
+    assert normalize_header("/* only a comment */\n") == ""
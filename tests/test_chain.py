@@ -0,0 +1,89 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from app import app
+
+V1 = """
+typedef struct { int value; int count; } SampleInner;
+typedef struct { SampleInner inner; int flag; } ExamplePort;
+"""
+V2 = """
+typedef struct { int value; int total; } SampleInner;
+typedef struct { SampleInner inner; int flag; bool active; } ExamplePort;
+"""
+V3 = """
+typedef struct { int value; int total; int max; } SampleInner;
+typedef struct { SampleInner inner; bool active; } ExamplePort;
+"""
+
+
+def test_chain_builds_one_superset_for_all_versions():
+    resp = TestClient(app).post("/generate/chain", json={"root": "ExamplePort", "headers": [V1, V2, V3]})
+    assert resp.status_code == 200
+    assert resp.headers["X-Versions"] == "3"
+    data = resp.json()
+    assert data["engine"] == "native"
+    files = {f["name"]: f["content"] for f in data["files"]}
+    gen = re.search(r"typedef struct SampleInner_V_Gen \{(.*?)\}", files["ExamplePort_versioned.h"], re.S).group(1)
+    assert [line.strip() for line in gen.strip().splitlines()] == [
+        "int value;",
+        "int count;",
+        "int total;",
+        "int max;",
+    ]
+    header = files["Converter_ExamplePort.h"]
+    labels = ("V1", "V2", "V3", "V_Gen")
+    for src in labels:
+        for dst in labels:
+            if src != dst:
+                assert f"convert_ExamplePort_{src}_to_{dst}(" in header
+
+
+def test_chain_sends_each_ambiguous_struct_once(fake_cloud):
+    calls = []
+
+    def fragment(self, system, user):
+        calls.append(user)
+        name = re.search(r"Struct name: (\w+)", user).group(1)
+        labels = re.search(r"Versions in order: (.*)", user).group(1).split(", ")
+        types = [f"typedef struct {name}_V{l} {{ int v; }} {name}_V{l};" for l in labels + ["_Gen"]]
+        helpers = []
+        for l in labels:
+            for src, dst in (("V_Gen", f"V{l}"), (f"V{l}", "V_Gen")):
+                helpers.append(
+                    f"static void copy_{name}_{src}_to_{dst}(const {name}_{src}* src, {name}_{dst}* dst)"
+                    " { dst->v = src->v; }"
+                )
+        return (
+            f"// FILE: {name}_types.h\n```c\n" + "\n".join(types) + "\n```\n"
+            f"// FILE: {name}_convert.c\n```c\n" + "\n".join(helpers) + "\n```"
+        )
+
+    fake_cloud(generate=fragment)
+    versions = [
+        "typedef struct { int speed_limit; } Limits; typedef struct { Limits l; } Root;",
+        "typedef struct { int speedlimit; } Limits; typedef struct { Limits l; } Root;",
+        "typedef struct { int speedlimit; int unit; } Limits; typedef struct { Limits l; int x; } Root;",
+    ]
+    resp = TestClient(app).post("/generate/chain", json={"root": "Root", "headers": versions})
+    assert resp.status_code == 200
+    assert resp.json()["engine"] == "incremental"
+    assert resp.headers["X-Fragments"] == "native=1;llm=1;cached=0"
+    assert len(calls) == 1 and "Versions in order: 1, 2, 3" in calls[0]
+
+    resp = TestClient(app).post("/generate/chain", json={"root": "Root", "headers": versions, "engine": "native"})
+    assert resp.status_code == 422
+
+
+def test_chain_validation():
+    client = TestClient(app)
+    assert client.post("/generate/chain", json={"root": "ExamplePort", "headers": [V1]}).status_code == 400
+    resp = client.post("/generate/chain", json={"root": "ExamplePort", "headers": [V1, V2], "engine": "llm"})
+    assert resp.status_code == 400
+    resp = client.post("/generate/chain", json={"root": "Missing", "headers": [V1, V2]})
+    assert resp.status_code == 422
+
+    refs = [client.put("/headers", content=text.encode()).json()["ref"] for text in (V1, V2, V3)]
+    resp = client.post("/generate/chain", json={"root": "ExamplePort", "header_refs": refs})
+    assert resp.status_code == 200 and resp.headers["X-Versions"] == "3"
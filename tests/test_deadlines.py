@@ -0,0 +1,148 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import app
+from deadlines import cancel_stats, run_bounded
+from llm_backends import get_backend
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class _StoppingCriteriaList(list):
+    def __call__(self, input_ids, logits):
+        return any(criterion(input_ids, logits) for criterion in self)
+
+
+class _SlowLlama:
+    """Decodes one token every 10 ms for up to 500 tokens, checking the stopping criteria like llama.cpp."""
+
+    decoded = 0
+    finished = threading.Event()
+
+    def __init__(self, model_path, **kwargs):
+        pass
+
+    def create_chat_completion(self, messages, temperature, stream=False, stopping_criteria=None):
+        try:
+            for _ in range(500):
+                _SlowLlama.decoded += 1
+                time.sleep(0.01)
+                if stopping_criteria is not None and stopping_criteria([], [0.0]):
+                    break
+        finally:
+            _SlowLlama.finished.set()
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+def test_cancelling_a_local_generation_stops_decoding(tmp_path, monkeypatch):
+    module = ModuleType("llama_cpp")
+    module.Llama = _SlowLlama
+    module.StoppingCriteriaList = _StoppingCriteriaList
+    monkeypatch.setitem(sys.modules, "llama_cpp", module)
+    model = tmp_path / "model.gguf"
+    model.write_text("dummy")
+    _SlowLlama.decoded = 0
+    _SlowLlama.finished.clear()
+
+    async def scenario():
+        task = asyncio.create_task(get_backend("local", str(model), 0.0).agenerate("s", "u"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert _SlowLlama.finished.wait(5)
+    assert _SlowLlama.decoded < 100
+
+
+def test_deadline_cancels_the_backend_call(fake_cloud, monkeypatch):
+    from llm_backends import CloudLLM
+
+    stopped = threading.Event()
+
+    def slow(self, system, user, cancelled):
+        deadline = time.monotonic() + 5
+        while not cancelled() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stopped.set()
+        return "never read"
+
+    fake_cloud(generate=lambda self, system, user: "unused")
+    monkeypatch.setattr(CloudLLM, "generate_until", slow)
+    payload = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+    client = TestClient(app)
+    get_backend("openai", "gpt-5", 0.0)  # keep client construction out of the budget
+    started = time.perf_counter()
+    resp = client.post("/generate", json=payload, headers={"X-Request-Timeout": "0.2"})
+    assert resp.status_code == 504
+    assert stopped.is_set() and time.perf_counter() - started < 2
+    stats = client.get("/backends/stats").json()["cancellation"]
+    assert stats["cancelled_requests"] == {"deadline": 1}
+    assert stats["cancelled_backend_calls"] == {"openai": 1}
+    assert client.post("/generate", json=payload, headers={"X-Request-Timeout": "soon"}).status_code == 400
+
+
+def test_stalled_stream_ends_at_the_deadline(fake_cloud, monkeypatch):
+    from llm_backends import CloudLLM, LLMClient
+
+    stopped = threading.Event()
+
+    def stalled(self, system, user, cancelled):
+        deadline = time.monotonic() + 5
+        while not cancelled() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stopped.set()
+        return "never read"
+
+    fake_cloud(generate=lambda self, system, user: "unused")
+    monkeypatch.setattr(CloudLLM, "generate_until", stalled)
+    monkeypatch.setattr(CloudLLM, "astream", LLMClient.astream)
+    payload = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+    get_backend("openai", "gpt-5", 0.0)
+    started = time.perf_counter()
+    resp = TestClient(app).post("/generate/stream", json=payload, headers={"X-Request-Timeout": "0.3"})
+    assert '"status": 504' in resp.text and time.perf_counter() - started < 2
+    assert stopped.wait(1)
+    assert cancel_stats.stats()["cancelled_requests"] == {"deadline": 1}
+
+
+def test_disconnect_cancels_the_work():
+    class Gone:
+        async def is_disconnected(self):
+            return True
+
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(HTTPException) as e:
+            await run_bounded(Gone(), 10, work)
+        return e.value.status_code, cancelled.is_set()
+
+    assert asyncio.run(scenario()) == (499, True)
+    assert cancel_stats.stats()["cancelled_requests"] == {"disconnect": 1}
@@ -49,6 +49,30 @@ def test_generate_ok(monkeypatch):
     assert resp.status_code == 200
     data = resp.json()
     assert_success_response(data)
+    # The fixtures are mechanical, so the default engine builds them without the backend.
+    assert data["engine"] == "native"
+
+
+def test_generate_llm_ok(fake_cloud):
+    calls = []
+
+    def generate(self, system, user):
+        calls.append(user)
+        return mock_generate(self, system, user)
+
+    fake_cloud(generate=generate)
+    fixtures = Path(__file__).parent / "fixtures"
+    payload = build_payload(
+        root="ExamplePort",
+        old_header_path=fixtures / "old_header.h",
+        new_header_path=fixtures / "new_header.h",
+    )
+    resp = TestClient(app).post("/generate", json={**payload, "engine": "llm"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert_success_response(data)
+    assert data["engine"] == "llm" and len(calls) == 1
+    assert [f["content"].strip() for f in data["files"]] == ["v1", "v2", "v3", "v4"]
 
 
 def test_call_generator_matches_cli(monkeypatch):
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import app
+from c_decls import normalize_header, parse_header
+from header_store import HeaderStore, header_digest, header_store
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _upload(client, name):
+    data = (FIXTURES / name).read_bytes()
+    resp = client.put("/headers", content=data)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["ref"] == header_digest(data)
+    assert body["bytes"] == len(data)
+    return body["ref"]
+
+
+def test_generate_by_ref_matches_inline():
+    client = TestClient(app)
+    old_ref, new_ref = _upload(client, "old_header.h"), _upload(client, "new_header.h")
+    assert client.get(f"/headers/{old_ref}").status_code == 200
+
+    by_ref = client.post("/generate", json={"root": "ExamplePort", "old_header_ref": old_ref, "new_header_ref": new_ref})
+    inline = client.post(
+        "/generate",
+        json={
+            "root": "ExamplePort",
+            "old_header": (FIXTURES / "old_header.h").read_text(),
+            "new_header": (FIXTURES / "new_header.h").read_text(),
+        },
+    )
+    assert by_ref.status_code == inline.status_code == 200
+    assert by_ref.json()["files"] == inline.json()["files"]
+    assert client.get("/cache/stats").json()["headers"]["entries"] == 2
+
+
+def test_unknown_and_bad_refs():
+    client = TestClient(app)
+    missing = header_digest(b"never uploaded")
+    assert client.get(f"/headers/{missing}").status_code == 404
+    resp = client.post("/generate", json={"root": "X", "old_header_ref": missing, "new_header": "int f(void);"})
+    assert resp.status_code == 400
+    assert client.put("/headers", content=b"/* only a comment */\n").status_code == 400
+    assert client.put("/headers", content=b"\xff\xfe").status_code == 400
+
+
+def test_store_persists_and_keeps_parsed_headers(tmp_path):
+    text = normalize_header((FIXTURES / "old_header.h").read_text())
+    ref = header_digest(text.encode())
+    store = HeaderStore(max_bytes=1 << 20, disk_dir=str(tmp_path), parsed_entries=1)
+    store.put(ref, text)
+    assert store.get(ref) is text
+    assert parse_header(store.get(ref)) is parse_header(text)
+    assert store.get("../etc/passwd") is None
+
+    reopened = HeaderStore(max_bytes=1 << 20, disk_dir=str(tmp_path))
+    assert reopened.get(ref) == text
+    assert header_store.get(ref) is None
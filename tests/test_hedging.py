@@ -0,0 +1,88 @@
+import asyncio
+
+from hedging import HedgedLLM, hedge_stats
+from llm_backends import LLMClient, register_backend
+from prompt_text import SYSTEM_PROMPT
+
+FOUR_FILES = (
+    "// FILE: R_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_R.h\n```c\nv2\n```\n"
+    "// FILE: Converter_R.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+class _Timed(LLMClient):
+    cancelled = 0
+
+    def __init__(self, latency, text):
+        super().__init__()
+        self.latency = latency
+        self.text = text
+
+    def generate(self, system, user):
+        raise NotImplementedError
+
+    async def agenerate(self, system, user):
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            _Timed.cancelled += 1
+            raise
+        return self.text
+
+
+register_backend("test-slow", lambda model: _Timed(0.2, FOUR_FILES))
+register_backend("test-fast", lambda model: _Timed(0.01, FOUR_FILES))
+register_backend("test-broken", lambda model: _Timed(0.0, "no files here"))
+
+
+def test_secondary_wins_when_primary_stalls():
+    async def run():
+        hedged = HedgedLLM("test-slow", "test-fast", delay=0.02)
+        started = asyncio.get_running_loop().time()
+        text = await hedged.agenerate(SYSTEM_PROMPT, "user")
+        return text, asyncio.get_running_loop().time() - started
+
+    hedge_stats.observe("test-slow", 0.2)
+    _Timed.cancelled = 0
+    text, elapsed = asyncio.run(run())
+    assert text == FOUR_FILES and elapsed < 0.15
+    assert _Timed.cancelled == 1
+    stats = hedge_stats.stats()
+    assert stats["wins"] == {"test-fast": 1} and stats["hedged"] == 1
+    assert stats["losers_cancelled"] == 1 and stats["latency_saved_seconds"] > 0.1
+
+
+def test_unparseable_primary_output_hedges_immediately():
+    hedged = HedgedLLM("test-broken", "test-fast", delay=10)
+    assert hedged.generate(SYSTEM_PROMPT, "user") == FOUR_FILES
+    stats = hedge_stats.stats()
+    assert stats["failures"] == {"test-broken": 1} and stats["win_rates"] == {"test-fast": 1.0}
+
+
+def test_fast_primary_is_not_hedged():
+    hedged = HedgedLLM("test-fast", "test-slow", delay=1)
+    assert hedged.generate(SYSTEM_PROMPT, "user") == FOUR_FILES
+    assert hedge_stats.stats()["hedged"] == 0
+
+
+def test_no_common_root_answer_is_passed_through():
+    register_backend("test-no-root", lambda model: _Timed(0.0, "/* no common root */"))
+    hedged = HedgedLLM("test-no-root", "test-slow", delay=10)
+    assert hedged.generate(SYSTEM_PROMPT, "user") == "/* no common root */"
+    stats = hedge_stats.stats()
+    assert stats["wins"] == {"test-no-root": 1} and stats["hedged"] == 0
+
+
+def test_cancelling_the_caller_cancels_every_attempt():
+    async def run():
+        hedged = HedgedLLM("test-slow", "test-slow", delay=0.01)
+        task = asyncio.ensure_future(hedged.agenerate(SYSTEM_PROMPT, "user"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    _Timed.cancelled = 0
+    asyncio.run(run())
+    assert _Timed.cancelled == 2
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_pool import HTTPPool
+
+
+class _Server:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.connections = 0
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                server.requests += 1
+                status = server.statuses.pop(0) if server.statuses else 200
+                body = json.dumps({"content": "ok"}).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/generate"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(statuses=()):
+        servers.append(_Server(statuses))
+        return servers[-1]
+
+    yield start
+    for s in servers:
+        s.close()
+
+
+def test_connections_are_reused_and_transient_errors_retried(server):
+    srv = server([503, 429])
+    pool = HTTPPool(pool_size=2, backoff_base=0.001)
+    assert pool.post_json(srv.url, {"prompt": "a"}) == {"content": "ok"}
+    assert pool.post_json(srv.url, {"prompt": "b"}) == {"content": "ok"}
+    assert srv.requests == 4 and srv.connections == 1
+    stats = pool.stats()
+    assert stats["retries"] == 2 and stats["failures"] == 0 and stats["in_flight"] == 0
+
+
+def test_retries_are_bounded(server):
+    srv = server([503] * 10)
+    pool = HTTPPool(max_retries=2, backoff_base=0.001)
+    with pytest.raises(Exception):
+        asyncio.run(pool.apost_json(srv.url, {"prompt": "a"}))
+    assert srv.requests == 3
+    assert pool.stats()["failures"] == 1
+
+
+def test_client_errors_are_not_retried(server):
+    srv = server([400])
+    pool = HTTPPool(backoff_base=0.001)
+    with pytest.raises(Exception):
+        pool.post_json(srv.url, {"prompt": "a"})
+    assert srv.requests == 1
@@ -0,0 +1,91 @@
+import re
+import shutil
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+
+OLD = """
+typedef struct { int speed_limit; } Limits;
+typedef struct { int x; } Pos;
+typedef struct { int unchanged; } Meta;
+typedef struct { Limits limits; Pos pos; Meta meta; } Root;
+"""
+NEW = """
+typedef struct { int speedlimit; } Limits;
+typedef struct { int x; int y; } Pos;
+typedef struct { int unchanged; } Meta;
+typedef struct { Limits limits; Pos pos; Meta meta; } Root;
+"""
+
+
+def fake_fragment(self, system, user):
+    name = re.search(r"Struct name: (\w+)", user).group(1)
+    return (
+        f"// FILE: {name}_types.h\n```c\n"
+        f"typedef struct {name}_V_OLD {{ int speed_limit; }} {name}_V_OLD;\n"
+        f"typedef struct {name}_V_NEW {{ int speedlimit; }} {name}_V_NEW;\n"
+        f"typedef struct {name}_V_Gen {{ int speed_limit; int speedlimit; }} {name}_V_Gen;\n```\n"
+        f"// FILE: {name}_convert.c\n```c\n"
+        f"static void copy_{name}_V_Gen_to_V_OLD(const {name}_V_Gen* src, {name}_V_OLD* dst)"
+        " { dst->speed_limit = src->speed_limit; }\n"
+        f"static void copy_{name}_V_Gen_to_V_NEW(const {name}_V_Gen* src, {name}_V_NEW* dst)"
+        " { dst->speedlimit = src->speedlimit; }\n"
+        f"static void copy_{name}_V_OLD_to_V_Gen(const {name}_V_OLD* src, {name}_V_Gen* dst)"
+        " { dst->speed_limit = src->speed_limit; dst->speedlimit = src->speed_limit; }\n"
+        f"static void copy_{name}_V_NEW_to_V_Gen(const {name}_V_NEW* src, {name}_V_Gen* dst)"
+        " { dst->speedlimit = src->speedlimit; dst->speed_limit = src->speedlimit; }\n```"
+    )
+
+
+@pytest.fixture
+def client(fake_cloud):
+    calls = []
+
+    def recording(self, system, user):
+        calls.append(user)
+        return fake_fragment(self, system, user)
+
+    fake_cloud(generate=recording)
+    test_client = TestClient(app)
+    test_client.calls = calls
+    return test_client
+
+
+def test_only_ambiguous_struct_reaches_backend(client, tmp_path):
+    resp = client.post("/generate", json={"root": "Root", "old_header": OLD, "new_header": NEW, "engine": "incremental"})
+    assert resp.status_code == 200
+    assert resp.json()["engine"] == "incremental"
+    assert resp.headers["X-Fragments"] == "native=2;llm=1;cached=0"
+    assert len(client.calls) == 1
+    prompt = client.calls[0]
+    assert "Struct name: Limits" in prompt and "Pos" not in prompt
+    files = {f["name"]: f["content"] for f in resp.json()["files"]}
+    assert "typedef struct { int unchanged; } Meta;" in files["Root_versioned.h"]
+    assert "copy_Limits_V_OLD_to_V_Gen(&src->limits, &dst->limits);" in files["Converter_Root.cpp"]
+    if shutil.which("g++"):
+        for f in resp.json()["files"]:
+            (tmp_path / f["name"]).write_text(f["content"])
+        subprocess.run(["g++", "-Wall", "-Werror", "-c", "Converter_Root.cpp"], cwd=tmp_path, check=True)
+
+
+def test_fragments_are_reused_across_roots(client):
+    client.post("/generate", json={"root": "Root", "old_header": OLD, "new_header": NEW, "engine": "incremental"})
+    other_old = OLD.replace("Root;", "Root;\ntypedef struct { Limits limits; int tag; } Other;")
+    other_new = NEW.replace("Root;", "Root;\ntypedef struct { Limits limits; int tag; int v; } Other;")
+    resp = client.post(
+        "/generate", json={"root": "Other", "old_header": other_old, "new_header": other_new, "engine": "incremental"}
+    )
+    assert resp.status_code == 200
+    assert resp.headers["X-Fragments"] == "native=1;llm=0;cached=1"
+    assert len(client.calls) == 1
+
+
+def test_malformed_fragment_is_rejected(fake_cloud):
+    fake_cloud(generate=lambda self, system, user: "// FILE: Limits_types.h\n```c\nx\n```")
+    resp = TestClient(app).post(
+        "/generate", json={"root": "Root", "old_header": OLD, "new_header": NEW, "engine": "incremental"}
+    )
+    assert resp.status_code == 422
@@ -0,0 +1,68 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app import app
+from jobs import JobStore
+from models import GenerateRequest
+
+FOUR_FILES = (
+    "// FILE: Root_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_Root.h\n```c\nv2\n```\n"
+    "// FILE: Converter_Root.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+PAYLOAD = {"root": "Root", "old_header": "struct Root { int a; };", "new_header": "struct Root { int b; };"}
+
+
+def _wait(client, job_id):
+    for _ in range(200):
+        data = client.get(f"/jobs/{job_id}").json()
+        if data["status"] in ("done", "failed"):
+            return data
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_runs_in_background(fake_cloud):
+    fake_cloud(generate=lambda self, system, user: FOUR_FILES)
+    with TestClient(app) as client:
+        resp = client.post("/jobs", json={**PAYLOAD, "engine": "llm"})
+        assert resp.status_code == 202
+        assert resp.json()["status"] == "queued"
+        assert resp.headers["Location"] == f"/jobs/{resp.json()['id']}"
+        data = _wait(client, resp.json()["id"])
+        assert data["status"] == "done" and data["status_code"] == 200
+        assert data["result"]["engine"] == "llm" and len(data["result"]["files"]) == 4
+
+        failed = _wait(client, client.post("/jobs", json={**PAYLOAD, "root": "Nope", "engine": "native"}).json()["id"])
+        assert failed["status"] == "failed" and failed["status_code"] == 422
+
+        stats = client.get("/jobs/stats").json()
+        assert stats["jobs"]["done"] == 1 and stats["jobs"]["failed"] == 1 and stats["queue_depth"] == 0
+        assert client.get("/jobs/missing").status_code == 404
+        assert client.post("/jobs", json={**PAYLOAD, "engine": "bogus"}).status_code == 400
+
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job_id = store.create(GenerateRequest(**PAYLOAD))
+    assert store.claim()["id"] == job_id
+    store.close()
+
+    reopened = JobStore(path)
+    assert reopened.requeue_running() == 1
+    assert reopened.claim()["id"] == job_id
+
+
+def test_finished_jobs_are_purged_after_retention(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    done = store.create(GenerateRequest(**PAYLOAD))
+    queued = store.create(GenerateRequest(**PAYLOAD))
+    store.claim()
+    store.fail(done, 422, "no")
+    assert store.purge_finished(time.time() - 60) == 0
+    assert store.purge_finished(time.time() + 1) == 1
+    assert store.get(done) is None and store.get(queued)["status"] == "queued"
+    store.close()
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from llama_pool import LlamaPoolLLM, LLMProcessPool, cpu_slices
+from llm_backends import BackendBusy, LLMClient, LLMError, register_backend
+
+
+class _Sleepy(LLMClient):
+    """Runs in the pool workers; ``user`` selects the behaviour."""
+
+    def generate(self, system, user):
+        if user == "crash":
+            os._exit(3)
+        time.sleep(float(user))
+        self.last_usage = {"completion_tokens": 5}
+        return str(os.getpid())
+
+    def stream(self, system, user):
+        for _ in range(3):
+            yield str(os.getpid())
+
+
+def sleepy(model=None):
+    return _Sleepy(model)
+
+
+@pytest.fixture
+def pool():
+    pool = LLMProcessPool(sleepy, workers=2, max_queue=0, pin=False)
+    pool.wait_ready(timeout=30)
+    yield pool
+    pool.close()
+
+
+def test_cpu_slices_are_contiguous():
+    assert cpu_slices(2, range(8)) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert cpu_slices(3, [0, 1]) == [[0], [1], [0]]
+
+
+def test_workers_run_in_parallel(pool):
+    async def run():
+        return await asyncio.gather(pool.agenerate("s", "0.5", 0.0), pool.agenerate("s", "0.5", 0.0))
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    assert time.perf_counter() - started < 0.9
+    assert len({text for text, _ in results}) == 2
+    assert pool.stats()["completion_tokens"] == 10
+
+
+def test_full_pool_rejects(pool):
+    async def run():
+        first = asyncio.gather(pool.agenerate("s", "0.3", 0.0), pool.agenerate("s", "0.3", 0.0))
+        await asyncio.sleep(0)
+        with pytest.raises(BackendBusy):
+            await pool.agenerate("s", "0", 0.0)
+        await first
+
+    asyncio.run(run())
+    assert pool.stats()["rejected"] == 1
+
+
+def test_crashed_worker_is_restarted(pool):
+    with pytest.raises(LLMError, match="exited"):
+        pool.generate("s", "crash", 0.0)
+    assert list(pool.stream("s", "0", 0.0))
+    pool.wait_ready(timeout=30)
+    assert pool.stats()["restarts"] == 1 and pool.stats()["alive"] == 2
+
+
+def test_busy_pool_answers_503():
+    busy = LlamaPoolLLM(workers=1, max_queue=0, pin=False, factory=sleepy)
+    register_backend("test-pool", lambda model: busy)
+    payload = {"root": "R", "old_header": "struct R { int a; };", "new_header": "struct R { int b; };"}
+    try:
+        busy.warm()
+        busy.pool.submit("generate", "s", "1", 0.0)  # occupies the only worker
+        resp = TestClient(app).post("/generate", json={**payload, "backend": "test-pool", "engine": "llm"})
+        assert resp.status_code == 503 and resp.headers["Retry-After"] == "1"
+    finally:
+        busy.close()
+
+
+def test_retired_pool_finishes_running_jobs():
+    pooled = LlamaPoolLLM(workers=1, max_queue=1, pin=False, factory=sleepy)
+    pooled.warm()
+    pool = pooled.pool
+
+    view = pooled.with_temperature(0.0)
+
+    async def run():
+        running = asyncio.ensure_future(pool.agenerate("s", "0.3", 0.0))
+        await asyncio.sleep(0.05)
+        pooled.retire()
+        # A view that reaches the backend while the pool drains still uses it.
+        assert view.pool is pool
+        return await running
+
+    text, _ = asyncio.run(run())
+    assert text.isdigit()
+    deadline = time.monotonic() + 10
+    while pool.stats()["alive"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.stats()["alive"] == 0
+    # Once it has closed, late views are turned away instead of starting an unowned pool.
+    with pytest.raises(BackendBusy):
+        view.generate("s", "0")
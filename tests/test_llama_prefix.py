@@ -0,0 +1,80 @@
+import sys
+from types import ModuleType
+
+import pytest
+
+from llm_backends import get_backend, registry
+
+
+class _PrefixLlama:
+    """Mimics llama.cpp prefix matching: only tokens past the shared prefix are evaluated."""
+
+    def __init__(self, model_path, **kwargs):
+        self._input_ids = []
+        self.evaluated = []
+
+    def _tokens(self, text):
+        return [ord(c) for c in text]
+
+    def reset(self):
+        self._input_ids = []
+
+    def eval(self, tokens):
+        self.evaluated.append(len(tokens))
+        self._input_ids = self._input_ids + list(tokens)
+
+    def save_state(self):
+        return list(self._input_ids)
+
+    def load_state(self, state):
+        self._input_ids = list(state)
+
+    def create_chat_completion(self, messages, temperature, stream=False):
+        prompt = self._tokens(messages[0]["content"] + "|" + messages[1]["content"])
+        shared = 0
+        for a, b in zip(self._input_ids, prompt):
+            if a != b:
+                break
+            shared += 1
+        self._input_ids = self._input_ids[:shared]
+        self.eval(prompt[shared:])
+        self._input_ids = self._input_ids + self._tokens("ok")
+        return {"choices": [{"message": {"content": "ok"}}], "usage": {"prompt_tokens": len(prompt)}}
+
+
+@pytest.fixture
+def llama_model(tmp_path, monkeypatch):
+    module = ModuleType("llama_cpp")
+    module.Llama = _PrefixLlama
+    monkeypatch.setitem(sys.modules, "llama_cpp", module)
+    monkeypatch.setenv("LLAMA_PREFIX_MIN_TOKENS", "8")
+    model = tmp_path / "model.gguf"
+    model.write_text("dummy")
+    return str(model)
+
+
+def test_system_prefix_is_restored_after_other_prompts(llama_model):
+    system = "S" * 100
+    backend = get_backend("local", llama_model, 0.0)
+    backend.generate(system, "first")
+    backend.generate(system, "second")
+    # A different system prompt evicts the prefix from the live context.
+    backend.generate("other system prompt", "x")
+    view = get_backend("local", llama_model, 0.0)
+    view.generate(system, "third")
+    assert view.last_usage["prefix_tokens_saved"] == 101
+    assert view._client.evaluated[-1] == len("third")
+
+
+def test_prefix_state_persists_on_disk(llama_model, tmp_path, monkeypatch):
+    monkeypatch.setenv("LLAMA_PREFIX_CACHE_DIR", str(tmp_path / "prefix"))
+    system = "S" * 100
+    backend = get_backend("local", llama_model, 0.0)
+    backend.generate(system, "first")
+    backend.generate(system, "second")
+    assert list((tmp_path / "prefix").glob("*.state"))
+
+    registry.clear()
+    cold = get_backend("local", llama_model, 0.0)
+    cold.generate(system, "third")
+    assert cold.last_usage["prefix_tokens_saved"] == 101
@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+from app import app
+from metrics import metric_labels
+
+FOUR_FILES = (
+    "// FILE: Root_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_Root.h\n```c\nv2\n```\n"
+    "// FILE: Converter_Root.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+class _Usage:
+    prompt_tokens = 120
+    completion_tokens = 30
+
+
+def test_stages_are_timed_and_exported(fake_cloud):
+    def fake_generate(self, system, user):
+        self._record_usage(type("Resp", (), {"usage": _Usage()})())
+        return FOUR_FILES
+
+    fake_cloud(generate=fake_generate)
+    client = TestClient(app)
+    payload = {
+        "root": "Root",
+        "old_header": "struct Root { int a; };",
+        "new_header": "struct Root { int b; };",
+        "engine": "llm",
+    }
+    resp = client.post("/generate", json=payload)
+    timing = resp.headers["Server-Timing"]
+    for name in ("validate", "prompt", "cache", "backend", "generate", "parse", "zip", "total"):
+        assert f"{name};dur=" in timing
+
+    text = client.get("/metrics").text
+    assert '# TYPE gia_stage_seconds histogram' in text
+    assert 'gia_stage_seconds_count{stage="generate",backend="openai",model="gpt-5"} 1' in text
+    assert 'gia_tokens_total{kind="prompt",backend="openai",model="gpt-5"} 120' in text
+    assert 'gia_tokens_total{kind="completion",backend="openai",model="gpt-5"} 30' in text
+
+
+def test_client_supplied_labels_are_bounded():
+    assert metric_labels("openai", "gpt-5") == ("openai", "gpt-5")
+    assert metric_labels("nonsense-1", "model-xyz") == ("other", "other")
+    assert metric_labels("llama", "/tmp/any/path.gguf") == ("local", "other")
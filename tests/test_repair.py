@@ -0,0 +1,87 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import app
+from prompt_text import REPAIR_SYSTEM_PROMPT
+from repair import generate_with_repair
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+THREE_FILES = (
+    "// FILE: ExamplePort_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_ExamplePort.h\n```c\nv2\n```\n"
+    "// FILE: Converter_ExamplePort.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4"  # truncated before the closing fence
+)
+MISSING = "// FILE: converters.cpp\n```cpp\nv4\n```"
+
+
+def _payload():
+    return {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+
+
+def _fake(replies, calls):
+    def generate(self, system, user):
+        calls.append((system, user))
+        return replies[len(calls) - 1]
+
+    return generate
+
+
+def test_generate_repairs_only_missing_file(fake_cloud):
+    calls = []
+    fake_cloud(generate=_fake([THREE_FILES, MISSING], calls))
+    resp = TestClient(app).post("/generate", json=_payload())
+    assert resp.status_code == 200
+    assert resp.headers["X-Repairs"] == "1"
+    assert [f["content"] for f in resp.json()["files"]] == ["v1", "v2", "v3", "v4"]
+    system, user = calls[1]
+    assert system == REPAIR_SYSTEM_PROMPT
+    assert "Return only these files: converters.cpp" in user and "v1" in user
+    assert "OLD header" not in user
+
+
+def test_repair_gives_up_after_max_attempts():
+    calls = []
+
+    async def llm(system, user):
+        calls.append(system)
+        return THREE_FILES
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(generate_with_repair(llm, "sys", "user", "ExamplePort", max_attempts=2))
+    assert exc.value.status_code == 422 and len(calls) == 3
+
+
+def test_unsalvageable_output_is_not_repaired():
+    async def llm(system, user):
+        return "no files at all"
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(generate_with_repair(llm, "sys", "user", "ExamplePort"))
+    assert exc.value.status_code == 422
+
+
+def test_stream_endpoint_repairs_truncated_output(fake_cloud):
+    calls = []
+
+    def fake_stream(self, system, user):
+        yield THREE_FILES
+
+    fake_cloud(generate=_fake([MISSING], calls), stream=fake_stream)
+    resp = TestClient(app).post("/generate/stream", json=_payload())
+    events = [block.split("\n") for block in resp.text.strip().split("\n\n")]
+    names = [e[0][len("event: ") :] for e in events]
+    assert names == ["file"] * 3 + ["repair", "file", "done"]
+    assert json.loads(events[3][1][len("data: ") :]) == {"missing": ["converters"]}
+    assert len(json.loads(events[-1][1][len("data: ") :])["files"]) == 4
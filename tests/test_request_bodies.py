@@ -0,0 +1,74 @@
+import gzip
+import json
+import zlib
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse
+
+from app import MAX_HEADER_LEN, app
+from request_bodies import DecompressMiddleware
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _payload(**overrides):
+    payload = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+    }
+    payload.update(overrides)
+    return payload
+
+
+def test_gzip_body_is_decoded():
+    body = gzip.compress(json.dumps(_payload()).encode())
+    resp = TestClient(app).post(
+        "/generate", content=body, headers={"Content-Encoding": "gzip", "Content-Type": "application/json"}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["engine"] == "native"
+
+
+def test_bad_encodings_are_rejected():
+    client = TestClient(app)
+    headers = {"Content-Type": "application/json"}
+    assert client.post("/generate", content=b"x", headers={**headers, "Content-Encoding": "br"}).status_code == 415
+    resp = client.post("/generate", content=b"not gzip", headers={**headers, "Content-Encoding": "gzip"})
+    assert resp.status_code == 400
+
+
+def test_decompressed_size_is_capped():
+    async def echo(scope, receive, send):
+        body = (await receive())["body"]
+        await PlainTextResponse(str(len(body)))(scope, receive, send)
+
+    client = TestClient(DecompressMiddleware(echo, max_size=1024))
+    assert client.post("/", content=zlib.compress(b" " * 1024), headers={"Content-Encoding": "deflate"}).text == "1024"
+    resp = client.post("/", content=zlib.compress(b" " * 4096), headers={"Content-Encoding": "deflate"})
+    assert resp.status_code == 413
+
+
+def test_size_limit_applies_to_normalized_headers():
+    old = (FIXTURES / "old_header.h").read_text()
+    comment = "/* " + "x" * MAX_HEADER_LEN + " */\n"
+    resp = TestClient(app).post("/generate", json=_payload(old_header=comment + old))
+    assert resp.status_code == 200
+
+
+def test_multipart_upload():
+    payload = _payload()
+    files = {
+        "old_header": ("old.h", payload["old_header"].encode(), "text/plain"),
+        "new_header": ("new.h", payload["new_header"].encode(), "text/plain"),
+    }
+    resp = TestClient(app).post(
+        "/generate/upload", data={"root": "ExamplePort", "return_zip": "false"}, files=files
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["engine"] == "native" and "zip_base64" not in data
+
+    resp = TestClient(app).post("/generate/upload", data={"root": "ExamplePort"}, files={"x": ("x", b"", "text/plain")})
+    assert resp.status_code == 400
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import app
+from models import FileOut
+from result_cache import ResultCache, cache_key
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+FOUR_FILES = (
+    "// FILE: ExamplePort_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_ExamplePort.h\n```c\nv2\n```\n"
+    "// FILE: Converter_ExamplePort.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+def _payload(**overrides):
+    payload = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _counting_generate(calls):
+    def fake(self, system, user):
+        calls.append(user)
+        return FOUR_FILES
+
+    return fake
+
+
+def test_identical_requests_hit_cache(fake_cloud):
+    calls = []
+    fake_cloud(generate=_counting_generate(calls))
+    client = TestClient(app)
+    first = client.post("/generate", json=_payload())
+    second = client.post("/generate", json=_payload())
+    assert first.status_code == second.status_code == 200
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert first.json() == second.json()
+    assert len(calls) == 1
+
+
+def test_nonzero_temperature_bypasses_cache(fake_cloud):
+    calls = []
+    fake_cloud(generate=_counting_generate(calls))
+    client = TestClient(app)
+    for _ in range(2):
+        resp = client.post("/generate", json=_payload(temperature=0.5))
+        assert resp.headers["X-Cache"] == "BYPASS"
+    assert len(calls) == 2
+
+
+def test_key_ignores_trailing_whitespace_but_not_model():
+    base = cache_key("sys", "a\nb", "openai", "gpt-5", 0.0)
+    assert cache_key("sys", "a  \r\nb\n", "openai", "gpt-5", 0.0) == base
+    assert cache_key("sys", "a\nb", "openai", "gpt-4o", 0.0) != base
+    assert cache_key("sys", "a\nb", "llama", None, 0.0) == cache_key("sys", "a\nb", "local", None, 0.0)
+
+
+def test_key_follows_the_model_that_answers(tmp_path, monkeypatch):
+    import routing  # noqa: F401 - registers the auto backend
+
+    model = tmp_path / "model.gguf"
+    model.write_text("old")
+    monkeypatch.setenv("LLAMA_MODEL_PATH", str(model))
+    monkeypatch.setenv("ROUTE_BACKENDS", "local,openai")
+    local = cache_key("sys", "u", "local", "gpt-5", 0.0)
+    auto = cache_key("sys", "u", "auto", None, 0.0)
+    assert cache_key("sys", "u", "local", str(model), 0.0) == local
+    model.write_text("a different checkpoint")
+    assert cache_key("sys", "u", "local", "gpt-5", 0.0) != local
+    assert cache_key("sys", "u", "auto", None, 0.0) != auto
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    files = [FileOut(name="a.h", language="c", content="x")]
+    ResultCache(disk_dir=str(tmp_path)).put("k" * 64, files)
+    fresh = ResultCache(disk_dir=str(tmp_path))
+    assert fresh.get("k" * 64) == files
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_size_based_eviction(tmp_path):
+    cache = ResultCache(max_bytes=200, disk_dir=str(tmp_path), disk_max_bytes=200)
+    for idx in range(4):
+        cache.put(f"{idx:064d}", [FileOut(name="a.h", language="c", content="x" * 60)])
+    stats = cache.stats()
+    assert stats["bytes"] <= 200 and stats["evictions"] >= 1
+    assert stats["disk_bytes"] <= 200 and stats["disk_evictions"] >= 1
+    assert cache.get(f"{3:064d}") is not None
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import app
+from llm_backends import LLMClient, LLMError, register_backend
+from prompt_text import SYSTEM_PROMPT
+from routing import AutoLLM, _Target, check_prompt, estimate_tokens, route_stats
+
+FOUR_FILES = (
+    "// FILE: R_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_R.h\n```c\nv2\n```\n"
+    "// FILE: Converter_R.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+class _Named(LLMClient):
+    def __init__(self, name, latency=0.0):
+        super().__init__(name)
+        self.latency = latency
+
+    def generate(self, system, user):
+        raise NotImplementedError
+
+    async def agenerate(self, system, user):
+        await asyncio.sleep(self.latency)
+        return FOUR_FILES
+
+
+register_backend("test-small", lambda model: _Named("small", 0.05))
+register_backend("test-big", lambda model: _Named("big"))
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setenv("TEST_SMALL_CONTEXT_TOKENS", "3000")
+    monkeypatch.setenv("TEST_BIG_CONTEXT_TOKENS", "100000")
+    monkeypatch.setenv("ROUTE_BACKENDS", "test-small@1000,test-big")
+
+
+def _auto():
+    return AutoLLM([_Target("test-small@1000"), _Target("test-big")], max_in_flight=1)
+
+
+def test_estimate_is_pessimistic_for_c():
+    text = "typedef struct { uint32_t a; } R;\n" * 100
+    assert estimate_tokens(text) >= len(text) / 4
+
+
+def test_small_prompts_go_to_the_cheap_backend(limits):
+    assert _auto().choose("sys", "x" * 300).name == "test-small"
+    # Over its preferred size, or over its context.
+    assert _auto().choose("sys", "x" * 6000).name == "test-big"
+    assert _auto().choose("sys", "x" * 30000).name == "test-big"
+
+
+def test_busy_backend_is_skipped(limits):
+    async def run():
+        auto = _auto()
+        return await asyncio.gather(auto.agenerate("sys", "a"), auto.agenerate("sys", "b"))
+
+    asyncio.run(run())
+    assert route_stats.stats()["routed"] == {"test-small": 1, "test-big": 1}
+
+
+def test_prompt_that_fits_nowhere(limits):
+    with pytest.raises(LLMError):
+        _auto().choose("sys", "x" * 400_000)
+    with pytest.raises(HTTPException) as exc:
+        check_prompt("auto", SYSTEM_PROMPT, "x" * 400_000)
+    assert exc.value.status_code == 413
+
+
+def test_generate_rejects_oversized_prompt_up_front(monkeypatch):
+    calls = []
+    monkeypatch.setenv("LLAMA_N_CTX", "2048")
+    register_backend("test-never", lambda model: calls.append(model) or _Named("never"))
+    monkeypatch.setenv("TEST_NEVER_CONTEXT_TOKENS", "2048")
+    header = "".join(f"typedef struct S{i} {{ int a; }} S{i};\n" for i in range(400))
+    payload = {"root": "S0", "old_header": header, "new_header": header, "engine": "llm", "prune_headers": False}
+    resp = TestClient(app).post("/generate", json={**payload, "backend": "test-never"})
+    assert resp.status_code == 413
+    assert calls == []
+
+
+def test_auto_backend_reports_route(limits):
+    header = "typedef struct R { int a; } R;\n"
+    payload = {"root": "R", "old_header": header, "new_header": header, "engine": "llm", "backend": "auto"}
+    resp = TestClient(app).post("/generate", json=payload)
+    assert resp.status_code == 200
+    assert resp.headers["X-Routed-Backend"] == "test-small"
+    assert 0 < int(resp.headers["X-Prompt-Tokens"]) <= 1000
+
+
+def test_routed_calls_are_admitted_against_the_target(limits):
+    from admission import admission
+
+    header = "typedef struct R { int a; } R;\n"
+    payload = {"root": "R", "old_header": header, "new_header": header, "engine": "llm", "backend": "auto"}
+    assert TestClient(app).post("/generate", json=payload).status_code == 200
+    stats = admission.stats()
+    assert "auto" not in stats and stats["test-small"]["admitted"] == 1
+
+
+def test_direct_traffic_counts_as_load(limits):
+    from admission import admission
+
+    async def run():
+        await admission.limiter("test-small").acquire()
+        return _auto().choose("sys", "a").name
+
+    assert asyncio.run(run()) == "test-big"
+
+
+def test_local_context_keeps_a_tokenizer_margin(monkeypatch):
+    from routing import fits
+
+    monkeypatch.setenv("LLAMA_N_CTX", "1000")
+    monkeypatch.setenv("TEST_BIG_CONTEXT_TOKENS", "1000")
+    assert fits("test-big", 900)
+    assert not fits("local", 900) and fits("local", 800)
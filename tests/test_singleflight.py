@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import app
+from llm_backends import CloudLLM
+from singleflight import SingleFlight
+
+FOUR_FILES = (
+    "// FILE: Root_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_Root.h\n```c\nv2\n```\n"
+    "// FILE: Converter_Root.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+def test_identical_concurrent_requests_share_one_call(monkeypatch):
+    calls = []
+
+    async def fake_agenerate(self, system, user):
+        calls.append(user)
+        await asyncio.sleep(0.05)
+        self.last_usage = {"prefix_tokens_saved": 7}
+        return FOUR_FILES
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(CloudLLM, "agenerate", fake_agenerate)
+    payload = {
+        "root": "Root",
+        "old_header": "struct Root { int a; };",
+        "new_header": "struct Root { int b; };",
+        "engine": "llm",
+        "temperature": 0.7,
+    }
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post("/generate", json=payload) for _ in range(5)))
+            stats = (await client.get("/cache/stats")).json()["in_flight"]
+            return responses, stats
+
+    responses, stats = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 5
+    # Every caller gets the shared call's headers, not just the one that made it.
+    assert [r.headers.get("X-Prefix-Tokens-Saved") for r in responses] == ["7"] * 5
+    assert len(calls) == 1
+    assert stats["calls"] == 1 and stats["coalesced"] == 4 and stats["coalesced_ratio"] == 0.8
+
+
+def test_errors_reach_every_waiter_and_abandoned_calls_are_cancelled():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+        assert [str(r) for r in results] == ["boom"] * 3
+        waiter = asyncio.ensure_future(flight.do("s", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [True]
+    assert flight.stats()["in_flight"] == 0
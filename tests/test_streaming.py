@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import app
+from parser_validator import FileBlockParser
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+FOUR_FILES = (
+    "// FILE: ExamplePort_versioned.h\n```c\nv1\n```\n"
+    "// FILE: Converter_ExamplePort.h\n```c\nv2\n```\n"
+    "// FILE: Converter_ExamplePort.cpp\n```cpp\nv3\n```\n"
+    "// FILE: converters.cpp\n```cpp\nv4\n```"
+)
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.parametrize("step", [1, 5, 64, len(FOUR_FILES)])
+def test_parser_emits_blocks_as_fences_close(step):
+    parser = FileBlockParser()
+    seen = []
+    for idx in range(0, len(FOUR_FILES), step):
+        seen.extend(f.name for f in parser.feed(FOUR_FILES[idx : idx + step]))
+    assert seen == [f.name for f in parser.close()]
+
+
+def test_parser_reports_first_block_before_the_rest():
+    parser = FileBlockParser()
+    first = parser.feed(FOUR_FILES[: FOUR_FILES.index("// FILE: Converter_ExamplePort.h")])
+    assert [f.content for f in first] == ["v1"]
+
+
+@pytest.mark.parametrize("text", ["Sure, here are the files", "// FILE: a.h\n```python\n"])
+def test_parser_aborts_on_protocol_violation(text):
+    with pytest.raises(HTTPException) as exc:
+        FileBlockParser().feed(text)
+    assert exc.value.status_code == 422
+
+
+def _payload(**overrides):
+    payload = {
+        "root": "ExamplePort",
+        "old_header": (FIXTURES / "old_header.h").read_text(),
+        "new_header": (FIXTURES / "new_header.h").read_text(),
+        "engine": "llm",
+    }
+    payload.update(overrides)
+    return payload
+
+
+def test_stream_endpoint_emits_files_then_done(fake_cloud):
+    def fake_stream(self, system, user):
+        for idx in range(0, len(FOUR_FILES), 7):
+            yield FOUR_FILES[idx : idx + 7]
+
+    fake_cloud(stream=fake_stream)
+    resp = TestClient(app).post("/generate/stream", json=_payload())
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _events(resp.text)
+    assert [e for e, _ in events] == ["file"] * 4 + ["done"]
+    assert events[0][1]["name"] == "ExamplePort_versioned.h"
+    assert events[-1][1]["zip_base64"]
+
+
+def test_stream_endpoint_stops_on_broken_output(fake_cloud):
+    consumed = []
+
+    def fake_stream(self, system, user):
+        for chunk in ["I think"] + [" and so on"] * 100:
+            consumed.append(chunk)
+            yield chunk
+
+    fake_cloud(stream=fake_stream)
+    events = _events(TestClient(app).post("/generate/stream", json=_payload()).text)
+    assert events == [("error", {"status": 422, "detail": "unexpected text outside file blocks"})]
+    # The producer runs in a worker thread but may only stay a few chunks ahead.
+    assert len(consumed) < 10
+
+
+def test_stream_endpoint_serves_native_results():
+    events = _events(TestClient(app).post("/generate/stream", json=_payload(engine="auto")).text)
+    assert [e for e, _ in events] == ["file"] * 4 + ["done"]
+    assert events[-1][1]["engine"] == "native"
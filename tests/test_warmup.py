@@ -0,0 +1,60 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import app
+from llm_backends import LLMClient, LLMError, register_backend, registry
+
+
+class _Counting(LLMClient):
+    calls = []
+
+    def generate(self, system, user):
+        _Counting.calls.append(user)
+        return "ok"
+
+
+def _broken(model):
+    raise LLMError("model file missing")
+
+
+register_backend("test-warm", lambda model: _Counting(model))
+register_backend("test-warm-broken", _broken)
+
+
+def _wait_ready(client):
+    for _ in range(100):
+        resp = client.get("/ready")
+        if resp.json()["state"] not in ("pending", "running"):
+            return resp
+        time.sleep(0.05)
+    raise AssertionError("warm-up did not finish")
+
+
+def test_ready_after_warmup(monkeypatch):
+    monkeypatch.setenv("WARMUP_BACKENDS", "test-warm:m1")
+    _Counting.calls.clear()
+    with TestClient(app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        resp = _wait_ready(client)
+        assert resp.status_code == 200
+        assert "generate_seconds" in resp.json()["backends"]["test-warm:m1"]
+    assert len(_Counting.calls) == 1
+    assert registry.stats()["loads"] == 1
+
+
+def test_failed_warmup_is_not_ready(monkeypatch):
+    monkeypatch.setenv("WARMUP_BACKENDS", "test-warm-broken")
+    with TestClient(app) as client:
+        resp = _wait_ready(client)
+        assert resp.status_code == 503
+        assert resp.json()["backends"]["test-warm-broken"]["error"] == "model file missing"
+
+
+def test_app_import_does_not_load_http_clients():
+    code = "import sys, app; print(sorted(m for m in ('openai', 'httpx', 'requests') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,39 @@
+import io
+import zipfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import app
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAYLOAD = {
+    "root": "ExamplePort",
+    "old_header": (FIXTURES / "old_header.h").read_text(),
+    "new_header": (FIXTURES / "new_header.h").read_text(),
+}
+
+
+def _names(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        return sorted(zf.namelist())
+
+
+def test_result_zip_is_downloadable_without_base64():
+    client = TestClient(app)
+    data = client.post("/generate", json={**PAYLOAD, "return_zip": False}).json()
+    assert "zip_base64" not in data
+    resp = client.get(f"/results/{data['result_id']}.zip", params={"level": 9})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+    assert _names(resp.content) == sorted(f["name"] for f in data["files"])
+    assert client.get("/results/unknown.zip").status_code == 404
+
+
+def test_generate_answers_with_zip_when_accepted():
+    resp = TestClient(app).post("/generate", json=PAYLOAD, headers={"Accept": "application/zip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-disposition"] == 'attachment; filename="ExamplePort.zip"'
+    assert "Converter_ExamplePort.cpp" in _names(resp.content)
+    assert resp.headers["X-Result-Id"]
@@ -0,0 +1,63 @@
+"""Startup warm-up: load configured backends and prime them before taking traffic."""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from llm_backends import get_backend, parse_target
+from prompt_text import SYSTEM_PROMPT, build_user_prompt
+
+# Small enough to answer quickly, but it goes through the real system prompt,
+# so llama.cpp caches the shared prefix state for the first real request.
+WARMUP_USER_PROMPT = build_user_prompt(
+    "WarmUp",
+    "typedef struct WarmUp { int a; } WarmUp;\n",
+    "typedef struct WarmUp { int a; int b; } WarmUp;\n",
+)
+
+
+class WarmUp:
+    """Loads each ``backend[:model]`` target and optionally runs one generation on it."""
+
+    def __init__(self, targets: List[Tuple[str, Optional[str]]], generate: bool = True):
+        self.targets = targets
+        self.generate = generate
+        self.state = "pending"
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_env(cls) -> "WarmUp":
+        specs = [spec for spec in os.getenv("WARMUP_BACKENDS", "").split(",") if spec.strip()]
+        return cls(
+            [parse_target(spec) for spec in specs],
+            generate=os.getenv("WARMUP_GENERATE", "1").lower() not in {"0", "false", "no"},
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def run(self) -> None:
+        self.state = "running"
+        for name, model in self.targets:
+            label = f"{name}:{model}" if model else name
+            result: Dict[str, Any] = {}
+            started = time.perf_counter()
+            try:
+                backend = await run_in_threadpool(get_backend, name, model, 0.0)
+                result["load_seconds"] = round(time.perf_counter() - started, 6)
+                if self.generate:
+                    started = time.perf_counter()
+                    await backend.agenerate(SYSTEM_PROMPT, WARMUP_USER_PROMPT)
+                    result["generate_seconds"] = round(time.perf_counter() - started, 6)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # reported by /ready; the pod stays out of rotation
+                result["error"] = str(e)
+            self.results[label] = result
+        self.state = "failed" if any("error" in r for r in self.results.values()) else "ready"
+
+    def status(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "state": self.state, "backends": dict(self.results)}